@@ -1,13 +1,17 @@
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Accedent_alert.settings')
+
+# Django must be set up before the consumers (and their models) are imported
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import Alert_system.routing
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Accedent_alert.settings')
-
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             Alert_system.routing.websocket_urlpatterns
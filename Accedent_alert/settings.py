@@ -47,21 +47,31 @@ INSTALLED_APPS = [
     
 ]
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
+# The in-memory layer only reaches clients of the same process; set
+# REDIS_URL so the dispatch worker can push to the web server's sockets
+if os.getenv("REDIS_URL"):
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [os.getenv("REDIS_URL")]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
     }
-}
 
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Alert_system.actors.ActorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +94,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Accedent_alert.wsgi.application'
+ASGI_APPLICATION = 'Accedent_alert.asgi.application'
 
 
 # Database
@@ -94,6 +105,14 @@ if DEBUG:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': 60,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before giving up
+                'timeout': 20,
+                # Take the write lock up front instead of failing on upgrade
+                'transaction_mode': 'IMMEDIATE',
+            },
         }
     }
 else:
@@ -106,9 +125,21 @@ else:
             'PASSWORD': os.getenv('DB_PASSWORD'),
             'HOST': os.getenv('DB_HOST'),
             'PORT': os.getenv('DB_PORT', '3306'),
+            'CONN_MAX_AGE': 60,
+            'CONN_HEALTH_CHECKS': True,
         }
     }
 
+# Applied to each new SQLite connection (see Alert_system/db.py)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 268435456,   # 256 MB
+    "cache_size": -65536,     # 64 MB
+    "temp_store": "MEMORY",
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -150,9 +181,41 @@ STATICFILES_DIRS = [
 ]
 
 STATIC_ROOT = os.path.join(BASE_DIR,'assets') #this is you assets folder.
+
+# collectstatic writes content-hashed copies plus .gz/.br (with Brotli
+# installed) next to them; WhiteNoise serves those with a far-future
+# Cache-Control. Under DEBUG files come straight from STATICFILES_DIRS.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+            else "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# Precached by the service worker (serviceworker.js) for repeat visits
+APP_SHELL_STATIC = [
+    "css/index.css",
+    "js/index.js",
+    "js/realtime.js",
+    "js/push.js",
+    "images/alert.png",
+    "sounds/emergency.mp3",
+]
 MEDIA_URL ='/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR,'media')
+
+# Media is served by Alert_system.media.serve_media. Set MEDIA_SENDFILE to
+# "x-accel-redirect" behind nginx (with an `internal` location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or "x-sendfile" behind
+# Apache/lighttpd to hand the bytes to the front server.
+MEDIA_SENDFILE = os.getenv("MEDIA_SENDFILE", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+MEDIA_MAX_AGE = 60 * 60                        # seconds, files without a content hash
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365   # content-addressed files
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
@@ -172,5 +235,121 @@ CSRF_USE_SESSIONS = False
 
 
 
+# Rows per INSERT when fanning notifications out to nearby users
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", 500))
+
+# Notifications shown per page (the JSON API accepts ?limit= up to 100)
+NOTIFICATIONS_PAGE_SIZE = 20
+
+# Police broadcast text is stored once, with a narrow (broadcast, user) row
+# per recipient instead of a full Notification row per recipient
+BROADCAST_FAN_OUT_ON_READ = True
+# Unread broadcasts count towards UserProfile.unread_notifications until
+# read or cleared; run rebuild_unread_counts daily to drop the ones that
+# have aged out of the lookback window
+BROADCAST_LOOKBACK_DAYS = 30
+
+# Location pings are coalesced in memory and bulk-upserted in the background.
+# The buffer belongs to one process: other web workers and the dispatch
+# worker only see a ping once it is flushed, up to LOCATION_FLUSH_INTERVAL_MS
+# later
+LOCATION_BUFFER_ENABLED = True
+LOCATION_FLUSH_INTERVAL_MS = 500
+LOCATION_FLUSH_MAX_ENTRIES = 500
+
+# Live map: individual users from LIVE_MAP_POINTS_ZOOM up, grid clusters
+# below it (or when a viewport holds more than LIVE_MAP_MAX_POINTS users)
+LIVE_MAP_POINTS_ZOOM = 15
+LIVE_MAP_MAX_POINTS = 500
+LIVE_MAP_MAX_TILES = 64
+LIVE_MAP_CLUSTER_TTL = 15   # seconds, per map tile
+
+# Delta feeds (?since=<cursor>) for alerts and live locations
+ALERTS_FEED_SIZE = 50
+FEED_TOMBSTONE_RETENTION_DAYS = 7   # older cursors get a full resync
+FEED_WATERMARK_LAG = 5              # seconds an updated_at watermark trails the clock
+
+# request.actor (role + linked station/hospital) cache lifetime, seconds
+ACTOR_CACHE_TTL = 300
+
+# Police/hospital dashboards
+DASHBOARD_PAGE_SIZE = 25
+DASHBOARD_CHANGES_LIMIT = 100       # more changes than this -> client reloads
+
+# Reverse geocoding: any class with reverse(lat, lon) -> address works as
+# a backend; GEOCODER_URL can point at a local stub in tests
+GEOCODER_BACKEND = "Alert_system.geocoding.NominatimGeocoder"
+GEOCODER_URL = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/reverse")
+GEOCODER_TIMEOUT = 5
+GEOCODE_PRECISION = 4                   # decimals, ~11 m
+GEOCODE_CACHE_SIZE = 4096               # in-process LRU entries
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30   # seconds
+
+# Nearby police/hospitals: Overpass results cached per map tile, or the
+# local table filled by `python manage.py import_emergency_services`
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+OVERPASS_TIMEOUT = 15
+EMERGENCY_TILE_ZOOM = 13                    # ~5 km tiles
+EMERGENCY_TILE_CACHE_SIZE = 1024            # in-process tiles
+EMERGENCY_TILE_TTL = 60 * 60 * 24 * 3       # serve as fresh (seconds)
+EMERGENCY_TILE_STALE = 60 * 60 * 24 * 7     # then serve stale while refreshing
+
+# Outbound HTTP (Alert_system.outbound): per-host policy, "default" fills gaps.
+# timeout is (connect, read) seconds; max_concurrency caps in-flight calls
+# per host and callers wait up to queue_timeout for a slot; the breaker
+# opens after failure_threshold consecutive failures for reset_timeout s.
+OUTBOUND_USER_AGENT = "AccidentAlertSystem/1.0 (contact@example.com)"
+OUTBOUND_HTTP_POOL_SIZE = 10
+OUTBOUND_HTTP = {
+    "default": {
+        "timeout": (3.05, 10),
+        "max_concurrency": 8,
+        "queue_timeout": 2,
+        "retries": 2,
+        "backoff": 0.2,
+        "failure_threshold": 5,
+        "reset_timeout": 30,
+    },
+    "nominatim.openstreetmap.org": {"max_concurrency": 2},   # 1 req/s usage policy
+    "overpass-api.de": {"max_concurrency": 2, "retries": 1},
+}
+
+# Alert dispatch queue (see `python manage.py run_dispatch_worker`)
+DISPATCH_MAX_ATTEMPTS = 3
+DISPATCH_POLL_INTERVAL = 1.0
+DISPATCH_STALE_SECONDS = 300
+DISPATCH_RETRY_DELAY = 5            # seconds before the first retry, doubled after each failure
+DISPATCH_RETRY_MAX_DELAY = 300
+DISPATCH_NO_FACILITY_DELAY = 60     # recheck for a registered station/hospital
+
+# Web Push to closed tabs (see `python manage.py run_push_worker`). Keys
+# come from generate_vapid_keys.py. Sends go through the outbound client,
+# so each push service host also gets an OUTBOUND_HTTP policy; keep
+# PUSH_WORKER_THREADS within its max_concurrency and the pool size.
+VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "")
+VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "")
+VAPID_CLAIMS_SUB = os.getenv("VAPID_CLAIMS_SUB", "mailto:contact@example.com")
+PUSH_WORKER_THREADS = 8
+PUSH_BATCH_SIZE = 500               # subscriptions loaded per batch
+PUSH_TTL = 60 * 60                  # seconds a push service holds an undelivered message
+PUSH_VAPID_TTL = 60 * 60 * 12       # VAPID JWT lifetime, re-signed at half-life
+PUSH_MAX_ATTEMPTS = 3
+PUSH_RETRY_DELAY = 5                # seconds before the first retry, doubled after each failure
+PUSH_RETRY_MAX_DELAY = 300
+PUSH_POLL_INTERVAL = 1.0
+PUSH_STALE_SECONDS = 300
+
+# Uploaded photos: stored once per content hash, resized in the background
+# to these max sides (px), each as WebP and JPEG. Catch up on missed ones
+# with `python manage.py build_image_variants`.
+IMAGE_VARIANTS = {
+    "thumb": 320,     # notification list, shown at 160 CSS px
+    "mobile": 1080,   # full view on a phone
+}
+IMAGE_WEBP_QUALITY = 75
+IMAGE_JPEG_QUALITY = 80
+IMAGE_WORKER_THREADS = 2
+
+
 POLICE_SECRET_CODE = os.getenv("POLICE_SECRET_CODE")
 HOSPITAL_SECRET_CODE = os.getenv("HOSPITAL_SECRET_CODE")
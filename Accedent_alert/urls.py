@@ -1,26 +1,56 @@
+import hashlib
+import json
+from functools import lru_cache
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.http import HttpResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.template import Context, Engine
+from django.templatetags.static import static
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
 from pathlib import Path
-from django.conf.urls.static import static
 from . import settings
+from Alert_system.media import serve_media
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+SW_PATH = BASE_DIR / "serviceworker.js"
+
+
+@lru_cache(maxsize=1)
+def _serviceworker_script(mtime_ns):
+    """Render serviceworker.js once (per file version) -> (body, etag)."""
+    app_shell = [static(name) for name in settings.APP_SHELL_STATIC]
+    body = Engine.get_default().from_string(SW_PATH.read_text()).render(Context({
+        "app_shell": mark_safe(json.dumps(app_shell)),
+        "cache_version": hashlib.sha256("\n".join(app_shell).encode()).hexdigest()[:12],
+        "alert_icon": static("images/alert.png"),
+    }))
+    return body, '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32]
+
 
-@csrf_exempt
+def serviceworker_script():
+    return _serviceworker_script(SW_PATH.stat().st_mtime_ns)
+
+
+# Served from the root so its scope covers the whole site. Browsers
+# revalidate it (no-cache) and get a 304 while it is unchanged.
+@require_safe
+@cache_control(no_cache=True)
+@condition(etag_func=lambda request: serviceworker_script()[1])
 def serviceworker(request):
-    sw_path = BASE_DIR / "serviceworker.js"
-    return HttpResponse(
-        sw_path.read_text(),
-        content_type="application/javascript"
-    )
+    return HttpResponse(serviceworker_script()[0], content_type="application/javascript")
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("serviceworker.js", serviceworker, name="serviceworker"),
+
 
+    # uploaded files, with caching headers and byte ranges (see MEDIA_SENDFILE)
+    re_path(r"^%s(?P<path>.+)$" % settings.MEDIA_URL.lstrip("/"), serve_media, name="media"),
 
     # your app urls
     path("", include("Alert_system.urls")),
-]
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
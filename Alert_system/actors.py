@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+from .models import Hospital, PoliceStation, UserProfile
+
+FACILITY_MODELS = {
+    "police": PoliceStation,
+    "hospital": Hospital,
+}
+
+
+def actor_key(user_id):
+    return f"actor:{user_id}"
+
+
+class Actor:
+    """The signed-in account's role and linked facility, as read from the cache.
+
+    ``facility`` is the PoliceStation or Hospital row rebuilt from cached
+    field values (no query), or None for citizens and accounts whose
+    facility row is missing.
+    """
+
+    def __init__(self, user_id, role, facility_fields=None):
+        self.user_id = user_id
+        self.role = role
+        self.facility = None
+
+        model = FACILITY_MODELS.get(role)
+        if model is not None and facility_fields is not None:
+            names = list(facility_fields)
+            self.facility = model.from_db("default", names, [facility_fields[n] for n in names])
+
+    @property
+    def is_police(self):
+        return self.role == "police"
+
+    @property
+    def is_hospital(self):
+        return self.role == "hospital"
+
+    def __repr__(self):
+        return f"<Actor user={self.user_id} role={self.role}>"
+
+
+def _load(user_id):
+    role = UserProfile.objects.filter(user_id=user_id).values_list("role", flat=True).first() or "user"
+
+    facility_fields = None
+    model = FACILITY_MODELS.get(role)
+    if model is not None:
+        facility_fields = model.objects.filter(user_id=user_id).values().first()
+
+    return {"role": role, "facility": facility_fields}
+
+
+def get_actor(user):
+    """Actor for an authenticated user, from the cache or one or two queries."""
+    key = actor_key(user.pk)
+    state = cache.get(key)
+    if state is None:
+        state = _load(user.pk)
+        cache.set(key, state, settings.ACTOR_CACHE_TTL)
+    return Actor(user.pk, state["role"], state["facility"])
+
+
+def invalidate_actor(user_id):
+    cache.delete(actor_key(user_id))
+
+
+class ActorMiddleware:
+    """Sets ``request.actor``, resolved on first use (role None when anonymous).
+
+    Must come after AuthenticationMiddleware. Entries are dropped when the
+    profile or facility is saved or deleted; with a per-process cache other
+    processes see the change once ``ACTOR_CACHE_TTL`` expires.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.actor = SimpleLazyObject(
+            lambda: get_actor(request.user) if request.user.is_authenticated else Actor(None, None)
+        )
+        return self.get_response(request)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=PoliceStation)
+@receiver([post_save, post_delete], sender=Hospital)
+def drop_cached_actor(sender, instance, **kwargs):
+    invalidate_actor(instance.user_id)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class AlertSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Alert_system'
+
+    def ready(self):
+        from . import actors, db, facilities, feeds, versions  # noqa: F401  (connects signal receivers)
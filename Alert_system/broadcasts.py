@@ -0,0 +1,214 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.db.models.functions import Greatest
+
+from .images import store_image
+from .models import PolicePublicAlert, BroadcastReadState, BroadcastRecipient, UserProfile
+from .push import enqueue_push
+from .realtime import publish_to_area
+from .services import users_within, fan_out_notifications, notification_event, ALERT_RADIUS_KM
+from .versions import bump_versions, inbox_window_start, notifications_key
+
+
+def publish_broadcast(police, title, message, latitude, longitude, address,
+                      photo=None, radius_km=ALERT_RADIUS_KM):
+    """Store an area broadcast from a police station.
+
+    With ``BROADCAST_FAN_OUT_ON_READ`` the text is stored once on the
+    broadcast and each user in range gets a narrow BroadcastRecipient row,
+    so the write still grows with the number of recipients, just with much
+    smaller rows. Otherwise a full Notification row is copied to every
+    user in range.
+    Either way the inbox, the Web Push and the live event all go to the
+    users in range at send time. ``photo`` is an uploaded file; it goes
+    through ``store_image`` and raises InvalidImage if it isn't one.
+    """
+    image = store_image(photo) if photo else None
+    recipients = users_within(latitude, longitude, radius_km, exclude_user=police.user_id)
+
+    with transaction.atomic():
+        broadcast = PolicePublicAlert.objects.create(
+            police=police,
+            title=title,
+            message=message,
+            address=address,
+            photo=image.original.name if image else None,
+            image=image,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            fan_out_on_read=settings.BROADCAST_FAN_OUT_ON_READ
+        )
+
+        if broadcast.fan_out_on_read:
+            BroadcastRecipient.objects.bulk_create(
+                [BroadcastRecipient(broadcast=broadcast, user_id=user_id) for user_id in recipients],
+                batch_size=settings.NOTIFICATION_BATCH_SIZE
+            )
+            # Only the recipients' inbox ETags and badges change
+            bump_versions(notifications_key(user_id) for user_id in recipients)
+            batch_size = settings.NOTIFICATION_BATCH_SIZE
+            for start in range(0, len(recipients), batch_size):
+                UserProfile.objects.filter(user_id__in=recipients[start:start + batch_size]).update(
+                    unread_notifications=F("unread_notifications") + 1
+                )
+            # No Notification rows, but closed tabs still get a Web Push
+            enqueue_push(recipients, title, message)
+        else:
+            fan_out_notifications(
+                recipients,
+                title=title,
+                message=message,
+                latitude=latitude,
+                longitude=longitude,
+                address=address,
+                public_alert=broadcast,
+                push=False
+            )
+
+        publish_to_area(
+            latitude, longitude, radius_km,
+            notification_event(title, message, latitude, longitude, address, broadcast),
+            exclude_user=police.user_id
+        )
+
+    return broadcast
+
+
+def get_read_state(user):
+    state = BroadcastReadState.objects.filter(user=user).first()
+    return state or BroadcastReadState(user=user)
+
+
+def broadcasts_for(user, state=None, older_than=None, limit=None):
+    """Fan-out-on-read broadcasts sent to the user, newest first.
+
+    Recipients are fixed when the broadcast is published, so moving later
+    neither adds nor removes one. Each returned broadcast gets the user's
+    ``is_read`` flag from its recipient row. ``older_than`` is an optional
+    Q and ``limit`` a row count, both applied in SQL.
+    """
+    state = state or get_read_state(user)
+    since = inbox_window_start()
+
+    broadcasts = PolicePublicAlert.objects.select_related("image").filter(
+        recipients__user=user,
+        id__gt=state.cleared_through,
+        created_at__gte=since,
+    ).annotate(is_read=F("recipients__is_read"))
+    if older_than is not None:
+        broadcasts = broadcasts.filter(older_than)
+
+    broadcasts = broadcasts.order_by("-created_at", "-id")
+    if limit is not None:
+        broadcasts = broadcasts[:limit]
+
+    return list(broadcasts)
+
+
+def mark_broadcasts_read(user, broadcasts):
+    """Mark exactly the given broadcasts as read for the user.
+
+    Only the rows shown count; older broadcasts on later pages stay unread.
+    """
+    if not broadcasts:
+        return 0
+
+    with transaction.atomic():
+        updated = BroadcastRecipient.objects.filter(
+            user=user, broadcast_id__in=[b.id for b in broadcasts], is_read=False
+        ).update(is_read=True)
+        if updated:
+            _uncount(user, updated)
+    return updated
+
+
+def clear_broadcasts(user):
+    newest = PolicePublicAlert.objects.aggregate(newest=Max("id"))["newest"] or 0
+    with transaction.atomic():
+        BroadcastReadState.objects.update_or_create(
+            user=user,
+            defaults={"cleared_through": newest}
+        )
+        # Hidden rows no longer count towards the badge either
+        updated = BroadcastRecipient.objects.filter(
+            user=user, broadcast_id__lte=newest, is_read=False
+        ).update(is_read=True)
+        _uncount(user, updated)
+
+
+def _uncount(user, read):
+    UserProfile.objects.filter(user=user).update(
+        unread_notifications=Greatest(F("unread_notifications") - read, 0)
+    )
+    bump_versions([notifications_key(user.id)])
+
+
+# Inbox items sort by (created_at, kind, id); kinds rank so that ties on
+# created_at between the two tables still have a total order
+NOTIFICATION_RANK = 1
+BROADCAST_RANK = 0
+
+
+def encode_cursor(item):
+    rank = BROADCAST_RANK if isinstance(item, PolicePublicAlert) else NOTIFICATION_RANK
+    raw = json.dumps([item.created_at.isoformat(), rank, item.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; raises ValueError for a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, rank, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(rank), int(item_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _older_than(cursor, rank):
+    """Q matching rows of the given kind that sort after ``cursor``."""
+    created_at, cursor_rank, cursor_id = cursor
+    q = Q(created_at__lt=created_at)
+    if rank < cursor_rank:
+        q |= Q(created_at=created_at)
+    elif rank == cursor_rank:
+        q |= Q(created_at=created_at, id__lt=cursor_id)
+    return q
+
+
+def _sort_key(item):
+    rank = BROADCAST_RANK if isinstance(item, PolicePublicAlert) else NOTIFICATION_RANK
+    return item.created_at, rank, item.id
+
+
+def inbox_page(user, cursor=None, limit=20):
+    """One page of personal notifications merged with covering broadcasts.
+
+    Keyset pagination on ``(created_at, kind, id)``, newest first. Returns
+    ``(items, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    notes = user.notifications.select_related("public_alert__image")
+    if position:
+        notes = notes.filter(_older_than(position, NOTIFICATION_RANK))
+    notes = list(notes.order_by("-created_at", "-id")[:limit + 1])
+
+    broadcasts = broadcasts_for(
+        user,
+        older_than=_older_than(position, BROADCAST_RANK) if position else None,
+        limit=limit + 1
+    )
+
+    items = sorted(notes + broadcasts, key=_sort_key, reverse=True)
+    page = items[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(items) > limit else None
+
+    return page, next_cursor
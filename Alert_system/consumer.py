@@ -1,19 +1,66 @@
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 import json
 
+from .models import UserLocation
+from .realtime import ALERTS_GROUP, user_group, cell_group
+from .utils import grid_cell
+
+
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
+        self.cell_group_name = None
 
         if self.user.is_anonymous:
             await self.close()
         else:
-            self.group_name = f"user_{self.user.id}"
+            self.group_name = user_group(self.user.id)
             await self.channel_layer.group_add(self.group_name, self.channel_name)
+            await self.channel_layer.group_add(ALERTS_GROUP, self.channel_name)
+            await self.join_cell(await self.stored_cell())
             await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await self.channel_layer.group_discard(ALERTS_GROUP, self.channel_name)
+            await self.join_cell("")
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or "")
+        except ValueError:
+            return
+
+        # Clients report their position so area broadcasts find them
+        if data.get("type") == "location":
+            try:
+                cell = grid_cell(float(data["lat"]), float(data["lon"]))
+            except (KeyError, TypeError, ValueError):
+                return
+            await self.join_cell(cell)
+
+    async def join_cell(self, cell):
+        group = cell_group(cell) if cell else None
+        if group == self.cell_group_name:
+            return
+
+        if self.cell_group_name:
+            await self.channel_layer.group_discard(self.cell_group_name, self.channel_name)
+        if group:
+            await self.channel_layer.group_add(group, self.channel_name)
+
+        self.cell_group_name = group
+
+    @database_sync_to_async
+    def stored_cell(self):
+        return UserLocation.objects.filter(user=self.user).values_list("cell", flat=True).first() or ""
 
     async def send_notification(self, event):
         await self.send(text_data=json.dumps(event["data"]))
+
+    async def send_area_notification(self, event):
+        if event.get("exclude_user") == self.user.id:
+            return
+        await self.send(text_data=json.dumps(event["data"]))
@@ -0,0 +1,139 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .feeds import decode_feed_cursor, encode_feed_cursor
+from .models import AlertAssignment
+
+STATUSES = tuple(value for value, _ in AlertAssignment.STATUS_CHOICES)
+ACTIVE_STATUSES = ("assigned", "in_progress")
+
+# ?status= values a dashboard understands, mapped to the statuses they cover
+STATUS_FILTERS = {
+    "active": ACTIVE_STATUSES,
+    "all": STATUSES,
+    **{status: (status,) for status in STATUSES},
+}
+
+
+def assignments_for(role, facility):
+    """Every assignment a dashboard may show: the station's plus unassigned ones for police."""
+    assignments = AlertAssignment.objects.select_related("alert", "alert__user")
+    if role == "police":
+        return assignments.filter(Q(police=facility) | Q(police__isnull=True))
+    return assignments.filter(hospital=facility)
+
+
+def parse_filters(params):
+    """``status``, ``from`` and ``to`` (YYYY-MM-DD) query parameters; raises ValueError."""
+    status = params.get("status") or "active"
+    if status not in STATUS_FILTERS:
+        raise ValueError("Unknown status")
+
+    date_from = params.get("from") or None
+    date_to = params.get("to") or None
+    return {
+        "status": status,
+        "statuses": STATUS_FILTERS[status],
+        "from": date.fromisoformat(date_from) if date_from else None,
+        "to": date.fromisoformat(date_to) if date_to else None,
+    }
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def apply_filters(assignments, filters):
+    assignments = assignments.filter(status__in=filters["statuses"])
+    if filters["from"]:
+        assignments = assignments.filter(created_at__gte=_start_of(filters["from"]))
+    if filters["to"]:
+        assignments = assignments.filter(created_at__lt=_start_of(filters["to"] + timedelta(days=1)))
+    return assignments
+
+
+def matches_filters(assignment, filters):
+    day = timezone.localdate(assignment.created_at)
+    return (
+        assignment.status in filters["statuses"]
+        and (filters["from"] is None or day >= filters["from"])
+        and (filters["to"] is None or day <= filters["to"])
+    )
+
+
+def encode_page_cursor(assignment):
+    raw = json.dumps([assignment.created_at.isoformat(), assignment.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_page_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, assignment_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(assignment_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def dashboard_page(assignments, cursor=None, limit=None):
+    """One page, newest first, plus the cursor of the next (older) page or None."""
+    limit = limit or settings.DASHBOARD_PAGE_SIZE
+
+    if cursor:
+        created_at, assignment_id = decode_page_cursor(cursor)
+        assignments = assignments.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=assignment_id)
+        )
+
+    page = list(assignments.order_by("-created_at", "-id")[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], encode_page_cursor(page[limit - 1])
+    return page, None
+
+
+def dashboard_stats(assignments):
+    """Counts that stay cheap however much resolved history piles up."""
+    today = _start_of(timezone.localdate())
+    return {
+        "active": assignments.filter(status__in=ACTIVE_STATUSES).count(),
+        "today": assignments.filter(status__in=STATUSES, created_at__gte=today).count(),
+        "resolved_today": assignments.filter(status="resolved", created_at__gte=today).count(),
+    }
+
+
+def changes_cursor():
+    watermark = timezone.now() - timedelta(seconds=settings.FEED_WATERMARK_LAG)
+    return encode_feed_cursor(u=watermark.isoformat())
+
+
+def changes_since(assignments, cursor):
+    """Assignments updated since ``cursor``: ``(assignments, next_cursor, reset)``.
+
+    ``reset`` asks the client to reload the page, either because the cursor
+    is unusable or because more than ``DASHBOARD_CHANGES_LIMIT`` rows changed.
+    An idle poll returns the cursor it was given.
+    """
+    state = decode_feed_cursor(cursor)
+    if state is None:
+        return [], changes_cursor(), True
+
+    try:
+        watermark = datetime.fromisoformat(state["u"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    next_cursor = changes_cursor()  # before the read, so nothing slips between
+    limit = settings.DASHBOARD_CHANGES_LIMIT
+    changed = list(assignments.filter(updated_at__gt=watermark).order_by("updated_at")[:limit + 1])
+
+    if len(changed) > limit:
+        return [], next_cursor, True
+    if not changed:
+        return [], cursor, False
+    return changed, next_cursor, False
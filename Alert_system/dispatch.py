@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Alert, AlertAssignment, DispatchJob
+from .facilities import NoFacilityAvailable, get_nearest_police_and_hospital
+from .realtime import publish_alert, publish_to_area
+from .services import users_within, fan_out_notifications, notify_user, notification_event, ALERT_RADIUS_KM
+
+
+def enqueue_alert(user, latitude, longitude, address="", description=""):
+    """Commit the alert together with a pending dispatch job."""
+    with transaction.atomic():
+        alert = Alert.objects.create(
+            user=user,
+            latitude=latitude,
+            longitude=longitude,
+            address=address,
+            description=description
+        )
+        job = DispatchJob.objects.create(alert=alert)
+        publish_alert(alert)
+
+    return alert, job
+
+
+def requeue_stale_jobs():
+    # A job stuck in "running" means its worker died mid-way
+    cutoff = timezone.now() - timedelta(seconds=settings.DISPATCH_STALE_SECONDS)
+    DispatchJob.objects.filter(status="running", updated_at__lt=cutoff).update(
+        status="pending", updated_at=timezone.now()
+    )
+
+
+def claim_next_job():
+    """Atomically move the oldest due pending job to "running" and return it."""
+    requeue_stale_jobs()
+
+    pending = DispatchJob.objects.filter(status="pending", available_at__lte=timezone.now()).order_by("id")
+    for job_id in pending.values_list("id", flat=True)[:10]:
+        claimed = DispatchJob.objects.filter(id=job_id, status="pending").update(
+            status="running",
+            attempts=F("attempts") + 1,
+            updated_at=timezone.now()
+        )
+        if claimed:
+            return DispatchJob.objects.select_related("alert").get(id=job_id)
+
+    return None
+
+
+def _assign(job):
+    alert = job.alert
+    police, hospital = get_nearest_police_and_hospital(alert.latitude, alert.longitude)
+
+    with transaction.atomic():
+        AlertAssignment.objects.create(
+            alert=alert,
+            police=police,
+            hospital=hospital,
+            status="assigned"
+        )
+        job.assignment_status = "done"
+        job.save(update_fields=["assignment_status", "updated_at"])
+
+
+def _notify_facilities(job):
+    alert = job.alert
+    assignment = AlertAssignment.objects.select_related("police", "hospital").filter(alert=alert).first()
+
+    with transaction.atomic():
+        if assignment and assignment.police:
+            notify_user(
+                assignment.police.user_id,
+                title="🚨 New Emergency Alert",
+                message=alert.description or "Emergency reported nearby",
+                latitude=alert.latitude,
+                longitude=alert.longitude,
+                address=alert.address
+            )
+
+        if assignment and assignment.hospital:
+            notify_user(
+                assignment.hospital.user_id,
+                title="🏥 Emergency Case Nearby",
+                message="Medical assistance required",
+                latitude=alert.latitude,
+                longitude=alert.longitude,
+                address=alert.address
+            )
+
+        job.facility_status = "done"
+        job.save(update_fields=["facility_status", "updated_at"])
+
+
+def _fan_out(job):
+    alert = job.alert
+
+    title = "🚨 Emergency Nearby"
+    message = "An emergency occurred within 5 km of your location"
+
+    with transaction.atomic():
+        job.recipients = fan_out_notifications(
+            users_within(alert.latitude, alert.longitude, ALERT_RADIUS_KM, exclude_user=alert.user_id),
+            title=title,
+            message=message,
+            latitude=alert.latitude,
+            longitude=alert.longitude,
+            address=alert.address,
+            push=False
+        )
+        publish_to_area(
+            alert.latitude, alert.longitude, ALERT_RADIUS_KM,
+            notification_event(title, message, alert.latitude, alert.longitude, alert.address),
+            exclude_user=alert.user_id
+        )
+        job.fanout_status = "done"
+        job.save(update_fields=["recipients", "fanout_status", "updated_at"])
+
+
+STAGES = [
+    ("assignment_status", _assign),
+    ("facility_status", _notify_facilities),
+    ("fanout_status", _fan_out),
+]
+
+
+def retry_delay(attempts):
+    """Exponential backoff before retrying a job that failed ``attempts`` times."""
+    return min(settings.DISPATCH_RETRY_DELAY * 2 ** (attempts - 1), settings.DISPATCH_RETRY_MAX_DELAY)
+
+
+def process_job(job):
+    """Run every unfinished stage of a claimed job.
+
+    Each stage commits on its own, so a failure leaves earlier stages done
+    and the job is retried from the failed stage, after an exponential
+    backoff, until it runs out of attempts. With no police station or
+    hospital registered yet the job is deferred by
+    DISPATCH_NO_FACILITY_DELAY without using up an attempt. Returns True
+    when the job completed.
+    """
+    for field, stage in STAGES:
+        if getattr(job, field) == "done":
+            continue
+
+        try:
+            stage(job)
+        except NoFacilityAvailable as e:
+            # Nothing to retry until someone registers; don't burn attempts on it
+            job.error = f"{field.replace('_status', '')}: {e}"
+            job.status = "pending"
+            job.attempts -= 1
+            job.available_at = timezone.now() + timedelta(seconds=settings.DISPATCH_NO_FACILITY_DELAY)
+            job.save(update_fields=["error", "status", "attempts", "available_at", "updated_at"])
+            return False
+        except Exception as e:
+            setattr(job, field, "failed")
+            job.error = f"{field.replace('_status', '')}: {e}"
+            job.status = "failed" if job.attempts >= settings.DISPATCH_MAX_ATTEMPTS else "pending"
+            job.available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            job.save(update_fields=[field, "error", "status", "available_at", "updated_at"])
+            return False
+
+    job.status = "done"
+    job.error = ""
+    job.save(update_fields=["status", "error", "updated_at"])
+    return True
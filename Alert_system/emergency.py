@@ -0,0 +1,238 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import EmergencyCoverage, EmergencyService, EmergencyTile
+from .outbound import outbound
+from .utils import bounding_box, cells_covering, tile_bounds, tile_for, within_radius
+
+SERVICE_RADIUS_KM = 5
+SERVICE_KINDS = ("police", "hospital")
+
+
+class OverpassError(Exception):
+    def __init__(self, message, status=None, body=""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+def service_from_element(element):
+    """Overpass/OSM JSON element -> the dict shape the frontend expects."""
+    tags = element.get("tags", {})
+    center = element.get("center", {})
+    return {
+        "name": tags.get("name", "Unknown"),
+        "type": tags.get("amenity"),
+        "latitude": element.get("lat", center.get("lat")),
+        "longitude": element.get("lon", center.get("lon")),
+        "address": tags.get("addr:full", "")
+    }
+
+
+class OverpassClient:
+    def __init__(self, url=None, timeout=None):
+        self.url = url or settings.OVERPASS_URL
+        self.timeout = timeout or (3.05, settings.OVERPASS_TIMEOUT)
+
+    def fetch(self, lat_min, lat_max, lon_min, lon_max):
+        """Police and hospital nodes inside the box."""
+        box = f"{lat_min:.6f},{lon_min:.6f},{lat_max:.6f},{lon_max:.6f}"
+        query = f"""
+        [out:json];
+        (
+          node["amenity"="police"]({box});
+          node["amenity"="hospital"]({box});
+        );
+        out body;
+        """
+
+        # Read-only query, safe to retry
+        response = outbound.post(self.url, data=query, timeout=self.timeout, idempotent=True)
+        if response.status_code != 200:
+            raise OverpassError("Overpass API failed", response.status_code, response.text[:500])
+
+        try:
+            data = response.json()
+        except ValueError:
+            raise OverpassError("Invalid JSON from Overpass API", response.status_code, response.text[:500])
+
+        return [service_from_element(item) for item in data.get("elements", [])]
+
+
+def services_within(services, lat, lon, radius_km=SERVICE_RADIUS_KM):
+    services = [s for s in services if s["latitude"] is not None and s["longitude"] is not None]
+    if not services:
+        return []
+
+    lats = np.array([s["latitude"] for s in services], dtype=float)
+    lons = np.array([s["longitude"] for s in services], dtype=float)
+    mask = within_radius(lat, lon, lats, lons, radius_km)
+    return [service for service, keep in zip(services, mask) if keep]
+
+
+class TileCache:
+    """Overpass results cached per slippy-map tile at ``EMERGENCY_TILE_ZOOM``.
+
+    Each tile is fetched with a margin of ``SERVICE_RADIUS_KM`` so it holds
+    everything any point inside it can reach; the radius filter then runs
+    locally. Tiles live in a process-local LRU backed by the EmergencyTile
+    table. Within ``EMERGENCY_TILE_TTL`` a tile is served as is; up to
+    ``EMERGENCY_TILE_STALE`` seconds past that it is still served while one
+    background thread refreshes it, and older tiles are still served when
+    the refresh fails.
+    """
+
+    def __init__(self):
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = OverpassClient()
+        return self._client
+
+    def set_client(self, client):
+        self._client = client
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    def tile_key(self, lat, lon):
+        zoom = settings.EMERGENCY_TILE_ZOOM
+        x, y = tile_for(lat, lon, zoom)
+        return f"{zoom}/{x}/{y}"
+
+    def services(self, lat, lon):
+        """Every cached service the tile around the point can reach."""
+        key = self.tile_key(lat, lon)
+        entry = self._from_memory(key)
+
+        if entry is None:
+            row = EmergencyTile.objects.filter(key=key).first()
+            if row is not None:
+                entry = (row.services, row.fetched_at.timestamp())
+                self._remember(key, *entry)
+
+        if entry is not None:
+            services, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < settings.EMERGENCY_TILE_TTL:
+                return services
+            if age < settings.EMERGENCY_TILE_TTL + settings.EMERGENCY_TILE_STALE:
+                self._refresh_in_background(key)
+                return services
+
+        try:
+            return self._refresh(key)
+        except (OverpassError, requests.RequestException):
+            if entry is None:
+                raise
+            # Upstream is unhealthy: an expired tile beats no answer
+            return entry[0]
+
+    def _from_memory(self, key):
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None:
+                self._tiles.move_to_end(key)
+            return entry
+
+    def _remember(self, key, services, fetched_at):
+        with self._lock:
+            self._tiles[key] = (services, fetched_at)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > settings.EMERGENCY_TILE_CACHE_SIZE:
+                self._tiles.popitem(last=False)
+
+    def _refresh(self, key):
+        zoom, x, y = (int(part) for part in key.split("/"))
+        lat_min, lat_max, lon_min, lon_max = tile_bounds(x, y, zoom)
+
+        # Widen by the search radius, measured at the tile edge nearest the pole
+        poleward = max(abs(lat_min), abs(lat_max))
+        _, dlat, _, dlon = bounding_box(poleward, 0, SERVICE_RADIUS_KM)
+        dlat -= poleward
+
+        services = self.client.fetch(lat_min - dlat, lat_max + dlat, lon_min - dlon, lon_max + dlon)
+
+        now = timezone.now()
+        EmergencyTile.objects.update_or_create(
+            key=key, defaults={"services": services, "fetched_at": now}
+        )
+        self._remember(key, services, now.timestamp())
+        return services
+
+    def _refresh_in_background(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._refresh(key)
+            except Exception as e:
+                print("TILE REFRESH ERROR:", e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+                close_old_connections()
+
+        threading.Thread(target=run, name=f"tile-refresh-{key}", daemon=True).start()
+
+
+tile_cache = TileCache()
+
+
+def services_from_table(lat, lon, radius_km=SERVICE_RADIUS_KM):
+    rows = EmergencyService.objects.filter(
+        cell__in=cells_covering(lat, lon, radius_km)
+    ).values("name", "kind", "latitude", "longitude", "address")
+
+    services = [
+        {
+            "name": row["name"],
+            "type": row["kind"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "address": row["address"]
+        }
+        for row in rows
+    ]
+    return services_within(services, lat, lon, radius_km)
+
+
+def table_covers(lat, lon, radius_km=SERVICE_RADIUS_KM):
+    """True when one imported extract contains the whole search circle."""
+    lat_min, lat_max, lon_min, lon_max = bounding_box(lat, lon, radius_km)
+    return EmergencyCoverage.objects.filter(
+        lat_min__lte=lat_min,
+        lat_max__gte=lat_max,
+        lon_min__lte=lon_min,
+        lon_max__gte=lon_max
+    ).exists()
+
+
+def nearby_services(lat, lon, radius_km=SERVICE_RADIUS_KM):
+    """Police stations and hospitals within ``radius_km`` of the point.
+
+    Answered from the imported EmergencyService table when an imported
+    extract covers the search circle, otherwise from the Overpass tile
+    cache. Raises OverpassError (or a requests exception) only when no copy
+    of the tile exists and Overpass cannot be reached.
+    """
+    if table_covers(lat, lon, radius_km):
+        return services_from_table(lat, lon, radius_km)
+
+    return services_within(tile_cache.services(lat, lon), lat, lon, radius_km)
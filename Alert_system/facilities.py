@@ -0,0 +1,177 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import PoliceStation, Hospital, ResourceVersion
+from .utils import EARTH_RADIUS_KM
+from .versions import bump_versions
+
+
+class NoFacilityAvailable(Exception):
+    """No police station or hospital is registered to assign an alert to."""
+
+
+def to_unit_vectors(lats, lons):
+    """Project lat/lon degrees onto the unit sphere as ``(n, 3)`` xyz points."""
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lats)
+    return np.column_stack((cos_lat * np.cos(lons), cos_lat * np.sin(lons), np.sin(lats)))
+
+
+def chord_to_km(chord):
+    # Straight-line distance through the sphere -> great-circle distance
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class KDTree:
+    """Minimal static KD-tree over 3D points, enough for k-nearest lookups."""
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=float)
+        self.root = self._build(np.arange(len(self.points)), 0)
+
+    def _build(self, indices, depth):
+        if len(indices) == 0:
+            return None
+
+        axis = depth % 3
+        indices = indices[np.argsort(self.points[indices, axis], kind="stable")]
+        mid = len(indices) // 2
+
+        return (
+            int(indices[mid]),
+            axis,
+            self._build(indices[:mid], depth + 1),
+            self._build(indices[mid + 1:], depth + 1),
+        )
+
+    def query(self, point, k=1):
+        """Return ``[(distance, index), ...]`` for the ``k`` closest points."""
+        point = np.asarray(point, dtype=float)
+        best = []  # max-heap of (-distance, index)
+
+        def visit(node):
+            if node is None:
+                return
+
+            index, axis, left, right = node
+            dist = float(np.linalg.norm(self.points[index] - point))
+
+            if len(best) < k:
+                heapq.heappush(best, (-dist, index))
+            elif dist < -best[0][0]:
+                heapq.heapreplace(best, (-dist, index))
+
+            diff = point[axis] - self.points[index, axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+
+            visit(near)
+            if len(best) < k or abs(diff) < -best[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-d, i) for d, i in best)
+
+
+class FacilityIndex:
+    """Process-local spatial index of one facility model.
+
+    Every save or delete of the model bumps its ResourceVersion row, in
+    whichever process makes it. Each lookup reads that version (one
+    primary-key query) and rebuilds the tree when it has moved, so the
+    dispatch worker sees stations registered through the web server.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f"facilities:{model._meta.model_name}"
+        self._lock = threading.Lock()
+        self._ids = None
+        self._tree = None
+        self._version = None
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+            self._tree = None
+
+    def current_version(self):
+        return ResourceVersion.objects.filter(key=self.version_key).values_list(
+            "version", flat=True
+        ).first() or 0
+
+    def _load(self):
+        # Read before the rows: a change in between just rebuilds again next time
+        version = self.current_version()
+
+        with self._lock:
+            if self._ids is None or version != self._version:
+                rows = list(self.model.objects.values_list("id", "latitude", "longitude"))
+                self._ids = [row[0] for row in rows]
+                self._tree = KDTree(to_unit_vectors(
+                    [row[1] for row in rows],
+                    [row[2] for row in rows]
+                )) if rows else None
+                self._version = version
+
+            return self._ids, self._tree
+
+    def nearest(self, lat, lon, k=1):
+        """Return ``[(id, distance_km), ...]`` for the ``k`` closest facilities."""
+        ids, tree = self._load()
+        if tree is None:
+            return []
+
+        point = to_unit_vectors([lat], [lon])[0]
+        return [(ids[i], chord_to_km(chord)) for chord, i in tree.query(point, k)]
+
+    def nearest_instance(self, lat, lon, k=3):
+        """Closest facility row, falling back to the next-closest ones.
+
+        Candidates that have disappeared from the database since the index
+        was built are skipped; if none of them survive, the index is rebuilt
+        once and the lookup retried.
+        """
+        for attempt in range(2):
+            candidates = [pk for pk, _ in self.nearest(lat, lon, k)]
+            if not candidates:
+                return None
+
+            found = self.model.objects.select_related("user").in_bulk(candidates)
+            for pk in candidates:
+                if pk in found:
+                    return found[pk]
+
+            self.invalidate()
+
+        return None
+
+
+police_index = FacilityIndex(PoliceStation)
+hospital_index = FacilityIndex(Hospital)
+
+
+def get_nearest_police_and_hospital(lat, lon):
+    """Closest police station and hospital; raises NoFacilityAvailable."""
+    nearest_police = police_index.nearest_instance(lat, lon)
+    nearest_hospital = hospital_index.nearest_instance(lat, lon)
+
+    if nearest_police is None or nearest_hospital is None:
+        raise NoFacilityAvailable("No police or hospital registered")
+
+    return nearest_police, nearest_hospital
+
+
+@receiver([post_save, post_delete], sender=PoliceStation)
+def bump_police_index(sender, **kwargs):
+    bump_versions([police_index.version_key])
+
+
+@receiver([post_save, post_delete], sender=Hospital)
+def bump_hospital_index(sender, **kwargs):
+    bump_versions([hospital_index.version_key])
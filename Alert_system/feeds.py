@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Alert, Tombstone, UserLocation
+from .locations import location_buffer
+
+ALERT = "alert"
+LOCATION = "location"
+
+
+def encode_feed_cursor(**state):
+    state["at"] = int(time.time())
+    raw = json.dumps(state, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_feed_cursor(cursor):
+    """State stored by ``encode_feed_cursor``, or None when a full resync is needed.
+
+    A cursor older than the tombstone retention may have missed deletions,
+    so it is treated like no cursor at all. Raises ValueError when malformed.
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded))
+        issued_at = int(state["at"])
+    except (TypeError, KeyError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if time.time() - issued_at > settings.FEED_TOMBSTONE_RETENTION_DAYS * 86400:
+        return None
+    return state
+
+
+def _last_tombstone(kind):
+    return Tombstone.objects.filter(kind=kind).aggregate(last=Max("id"))["last"] or 0
+
+
+def _tombstones_since(kind, tombstone_id):
+    rows = list(
+        Tombstone.objects.filter(kind=kind, id__gt=tombstone_id)
+        .order_by("id").values_list("id", "object_id")
+    )
+    last = rows[-1][0] if rows else tombstone_id
+    return [object_id for _, object_id in rows], last
+
+
+def alerts_feed(cursor=None):
+    """Newest alerts, or only what changed since ``cursor``.
+
+    Returns ``(alerts, removed_ids, next_cursor, reset)``. Without a usable
+    cursor ``reset`` is True and the latest ``ALERTS_FEED_SIZE`` alerts are
+    returned. With one, alerts with a higher id (at most ``ALERTS_FEED_SIZE``,
+    oldest first, so a backlog is drained over several polls) and ids
+    deleted since are returned.
+    """
+    state = decode_feed_cursor(cursor)
+    size = settings.ALERTS_FEED_SIZE
+    fields = ("id", "latitude", "longitude", "address")
+
+    if state is None:
+        tombstone_id = _last_tombstone(ALERT)
+        alerts = list(Alert.objects.order_by("-created_at").values(*fields)[:size])
+        last_id = max((a["id"] for a in alerts), default=0)
+        return alerts, [], encode_feed_cursor(a=last_id, t=tombstone_id), True
+
+    removed, tombstone_id = _tombstones_since(ALERT, int(state.get("t", 0)))
+    alerts = list(Alert.objects.filter(id__gt=int(state.get("a", 0))).order_by("id").values(*fields)[:size])
+    if not alerts and not removed:
+        # Same cursor back, so an idle client keeps polling one URL and gets 304s
+        return [], [], cursor, False
+
+    last_id = alerts[-1]["id"] if alerts else int(state.get("a", 0))
+
+    alerts.reverse()  # newest first, like the full feed
+    return alerts, removed, encode_feed_cursor(a=last_id, t=tombstone_id), False
+
+
+def locations_feed(south, west, north, east, cursor, limit):
+    """Users that moved inside or out of the box since ``cursor``.
+
+    Returns ``(locations, removed_user_ids, next_cursor)``, or None when
+    the cursor is unusable or more than ``limit`` users changed, in which
+    case the caller sends a full snapshot instead.
+
+    Only changes inside the box widened by its own size on every side are
+    read, so the cost follows the local rate of change. Users who moved
+    from the box into that margin are reported as removed; one who leaves
+    the margin within a single poll keeps a stale marker until the client's
+    next full snapshot (it drops its cursor whenever the viewport moves).
+    The watermark trails the clock by ``FEED_WATERMARK_LAG`` seconds so
+    rows stamped before a late commit (e.g. by the location write buffer)
+    are not skipped; clients may see such a user twice.
+    """
+    state = decode_feed_cursor(cursor)
+    if state is None:
+        return None
+
+    try:
+        watermark = datetime.fromisoformat(state["u"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    next_watermark = timezone.now() - timedelta(seconds=settings.FEED_WATERMARK_LAG)
+    removed, tombstone_id = _tombstones_since(LOCATION, int(state.get("t", 0)))
+
+    dlat, dlon = north - south, east - west
+    margin = (south - dlat, west - dlon, north + dlat, east + dlon)
+
+    def in_box(lat, lon, box):
+        return lat is not None and lon is not None and box[0] <= lat <= box[2] and box[1] <= lon <= box[3]
+
+    changed = {
+        user_id: (username, lat, lon)
+        for user_id, username, lat, lon in UserLocation.objects.filter(
+            updated_at__gt=watermark,
+            latitude__range=(margin[0], margin[2]),
+            longitude__range=(margin[1], margin[3])
+        ).values_list("user_id", "user__username", "latitude", "longitude")[:limit + 1]
+    }
+    if len(changed) > limit:
+        return None
+
+    # Pings still in the write buffer are newer than the table
+    pending = {
+        user_id: position
+        for user_id, position in location_buffer.snapshot().items()
+        if in_box(*position, margin)
+    }
+    if pending:
+        usernames = dict(
+            UserLocation.objects.filter(user_id__in=pending.keys())
+            .values_list("user_id", "user__username")
+        )
+        for user_id, (lat, lon) in pending.items():
+            if user_id in usernames:
+                changed[user_id] = (usernames[user_id], lat, lon)
+
+    locations = []
+    for user_id, (username, lat, lon) in changed.items():
+        if in_box(lat, lon, (south, west, north, east)):
+            locations.append({"id": user_id, "username": username, "latitude": lat, "longitude": lon})
+        else:
+            removed.append(user_id)
+
+    return locations, removed, location_cursor(next_watermark, tombstone_id)
+
+
+def location_cursor(watermark=None, tombstone_id=None):
+    if watermark is None:
+        watermark = timezone.now() - timedelta(seconds=settings.FEED_WATERMARK_LAG)
+    if tombstone_id is None:
+        tombstone_id = _last_tombstone(LOCATION)
+    return encode_feed_cursor(u=watermark.isoformat(), t=tombstone_id)
+
+
+def _bury(kind, object_id):
+    Tombstone.objects.create(kind=kind, object_id=object_id)
+    cutoff = timezone.now() - timedelta(days=settings.FEED_TOMBSTONE_RETENTION_DAYS)
+    Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+
+
+@receiver(post_delete, sender=Alert)
+def bury_alert(sender, instance, **kwargs):
+    _bury(ALERT, instance.pk)
+
+
+@receiver(post_delete, sender=UserLocation)
+def bury_location(sender, instance, **kwargs):
+    _bury(LOCATION, instance.user_id)
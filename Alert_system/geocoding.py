@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import GeocodeCache
+from .outbound import outbound
+
+
+class NominatimGeocoder:
+    """Reverse geocoding against a Nominatim-compatible ``/reverse`` endpoint."""
+
+    def __init__(self, url=None, timeout=None):
+        self.url = url or settings.GEOCODER_URL
+        self.timeout = timeout or (3.05, settings.GEOCODER_TIMEOUT)
+
+    def reverse(self, lat, lon):
+        response = outbound.get(
+            self.url,
+            params={"format": "json", "lat": lat, "lon": lon},
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            return None
+        return response.json().get("display_name", "Unknown location")
+
+
+class GeocodeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_errors = 0
+        self.upstream_seconds = 0.0
+        self.upstream_max_seconds = 0.0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_upstream(self, seconds, ok):
+        with self._lock:
+            self.misses += 1
+            self.upstream_seconds += seconds
+            self.upstream_max_seconds = max(self.upstream_max_seconds, seconds)
+            if not ok:
+                self.upstream_errors += 1
+
+    def as_dict(self):
+        with self._lock:
+            hits = self.memory_hits + self.db_hits + self.coalesced
+            lookups = hits + self.misses
+            return {
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "coalesced": self.coalesced,
+                "stale_hits": self.stale_hits,
+                "upstream_calls": self.misses,
+                "upstream_errors": self.upstream_errors,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "upstream_avg_ms": round(self.upstream_seconds / self.misses * 1000, 1) if self.misses else None,
+                "upstream_max_ms": round(self.upstream_max_seconds * 1000, 1),
+            }
+
+
+class GeocodeCacheLookup:
+    """Two-tier reverse-geocode cache in front of a pluggable backend.
+
+    Coordinates are rounded to ``GEOCODE_PRECISION`` decimals (4 is about
+    11 m), looked up in a process-local LRU, then in the GeocodeCache table,
+    and only then sent upstream. Concurrent misses for the same cell wait
+    for one upstream call instead of issuing their own.
+    """
+
+    def __init__(self):
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._backend = None
+        self.stats = GeocodeStats()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(settings.GEOCODER_BACKEND)()
+        return self._backend
+
+    def set_backend(self, backend):
+        self._backend = backend
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def quantize(self, lat, lon):
+        precision = settings.GEOCODE_PRECISION
+        lat, lon = round(lat, precision), round(lon, precision)
+        return f"{lat:.{precision}f},{lon:.{precision}f}", lat, lon
+
+    def _remember(self, key, address, expires_at):
+        with self._lock:
+            self._lru[key] = (address, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > settings.GEOCODE_CACHE_SIZE:
+                self._lru.popitem(last=False)
+
+    def _from_memory(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= timezone.now():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return entry[0]
+
+    def lookup(self, lat, lon):
+        """Address for the coordinates, or None when the backend fails."""
+        key, lat, lon = self.quantize(lat, lon)
+
+        address = self._from_memory(key)
+        if address is not None:
+            self.stats.incr("memory_hits")
+            return address
+
+        row = GeocodeCache.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+        if row is not None:
+            self.stats.incr("db_hits")
+            self._remember(key, row.address, row.expires_at)
+            return row.address
+
+        address = self._single_flight(key, lat, lon)
+        if address is not None:
+            return address
+
+        # Upstream failed or its circuit is open: fall back to an expired entry
+        stale = GeocodeCache.objects.filter(key=key).values_list("address", flat=True).first()
+        if stale is not None:
+            self.stats.incr("stale_hits")
+        return stale
+
+    def _single_flight(self, key, lat, lon):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = {"done": threading.Event(), "address": None}
+
+        if not leader:
+            call["done"].wait(settings.GEOCODER_TIMEOUT * 2)
+            self.stats.incr("coalesced")
+            return call["address"]
+
+        try:
+            call["address"] = self._fetch(key, lat, lon)
+            return call["address"]
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call["done"].set()
+
+    def _fetch(self, key, lat, lon):
+        started = time.perf_counter()
+        try:
+            address = self.backend.reverse(lat, lon)
+        except Exception as e:
+            print("GEOCODER ERROR:", e)
+            address = None
+        self.stats.record_upstream(time.perf_counter() - started, address is not None)
+
+        if address is None:
+            return None
+
+        expires_at = timezone.now() + timedelta(seconds=settings.GEOCODE_CACHE_TTL)
+        GeocodeCache.objects.update_or_create(
+            key=key, defaults={"address": address, "expires_at": expires_at}
+        )
+        self._remember(key, address, expires_at)
+        return address
+
+
+geocoder = GeocodeCacheLookup()
@@ -0,0 +1,181 @@
+import hashlib
+import io
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import StoredImage
+
+# Pillow format -> file extension for stored originals
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def content_name(folder, sha256, suffix):
+    # Two-level fan-out keeps directories small: missing_persons/ab/abcdef....png
+    return f"{folder}/{sha256[:2]}/{sha256}{suffix}"
+
+
+# <sha256>.png, or <sha256>_<size>.<hash of the variant bytes>.webp
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{64}(_\w+\.[0-9a-f]{16})?\.\w+$")
+
+
+def is_content_addressed(name):
+    """True for names that change whenever the bytes do (safe to cache forever)."""
+    return bool(CONTENT_ADDRESSED.match(name.rsplit("/", 1)[-1]))
+
+
+def _save_variant(folder, sha256, size_name, ext, data):
+    # Named by their own bytes too, so re-encoding with other settings
+    # yields a new URL instead of changing a cached one
+    suffix = f"_{size_name}.{hashlib.sha256(data).hexdigest()[:16]}{ext}"
+    name = content_name(folder, sha256, suffix)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+def store_image(upload, folder="missing_persons", background=True):
+    """Store an uploaded image once per content hash.
+
+    Uploading the same bytes again returns the existing StoredImage and
+    writes nothing. New images are queued for ``build_variants`` once the
+    surrounding transaction commits, unless ``background`` is False.
+    Raises InvalidImage for anything Pillow can't read.
+    """
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    sha256 = digest.hexdigest()
+
+    existing = StoredImage.objects.filter(sha256=sha256).first()
+    if existing is not None:
+        return existing
+
+    upload.seek(0)
+    try:
+        with Image.open(upload) as img:
+            img.verify()
+            fmt, (width, height) = img.format, img.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise InvalidImage(f"Unsupported image: {e}") from e
+
+    if fmt not in EXTENSIONS:
+        raise InvalidImage(f"Unsupported image format: {fmt}")
+
+    name = content_name(folder, sha256, "." + EXTENSIONS[fmt])
+    if not default_storage.exists(name):
+        upload.seek(0)
+        name = default_storage.save(name, upload)
+
+    try:
+        # Savepoint, so losing a race doesn't break the caller's transaction
+        with transaction.atomic():
+            image = StoredImage.objects.create(sha256=sha256, original=name, width=width, height=height)
+    except IntegrityError:
+        return StoredImage.objects.get(sha256=sha256)
+
+    if background:
+        transaction.on_commit(lambda: build_in_background(image.id))
+    return image
+
+
+def photo_urls(broadcast):
+    """Original and variant URLs of a broadcast photo, or None without one."""
+    if not broadcast.photo:
+        return None
+
+    urls = {"original": broadcast.photo.url}
+    if broadcast.image and broadcast.image.is_ready:
+        urls.update(broadcast.image.urls)
+    return urls
+
+
+def _encode(img, fmt):
+    out = io.BytesIO()
+    if fmt == "webp":
+        img.save(out, "WEBP", quality=settings.IMAGE_WEBP_QUALITY, method=4)
+    else:
+        img.save(out, "JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def build_variants(image):
+    """Write the WebP and JPEG copies of every IMAGE_VARIANTS size.
+
+    Variants are only ever scaled down, follow the EXIF orientation and
+    drop any metadata (phone photos carry GPS tags).
+    """
+    folder = image.original.name.rsplit("/", 2)[0]
+
+    with default_storage.open(image.original.name, "rb") as f, Image.open(f) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha: flatten onto white
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        variants = {}
+        for size_name, max_side in settings.IMAGE_VARIANTS.items():
+            resized = img.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            variant = {"width": resized.width, "height": resized.height}
+            for fmt, ext in (("webp", ".webp"), ("jpeg", ".jpg")):
+                variant[fmt] = _save_variant(folder, image.sha256, size_name, ext, _encode(resized, fmt))
+            variants[size_name] = variant
+
+    # Files of an earlier build that this one replaced
+    current = {v[fmt] for v in variants.values() for fmt in ("webp", "jpeg")}
+    for old in image.variants.values():
+        for fmt in ("webp", "jpeg"):
+            if old.get(fmt) and old[fmt] not in current:
+                default_storage.delete(old[fmt])
+
+    image.variants = variants
+    image.status = "ready"
+    image.save(update_fields=["variants", "status"])
+    return image
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def build_in_background(image_id):
+    """Run ``build_variants`` on a small worker pool, off the request thread.
+
+    Rows left "pending" by a crash are picked up by
+    ``python manage.py build_image_variants``.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKER_THREADS, thread_name_prefix="image-variants"
+            )
+
+    def run():
+        try:
+            image = StoredImage.objects.get(id=image_id)
+            build_variants(image)
+        except Exception as e:
+            print("IMAGE VARIANT ERROR:", e)
+            StoredImage.objects.filter(id=image_id).update(status="failed")
+        finally:
+            close_old_connections()
+
+    _executor.submit(run)
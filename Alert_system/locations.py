@@ -0,0 +1,247 @@
+import atexit
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction, close_old_connections
+from django.utils import timezone
+
+from .models import UserLocation
+from .utils import grid_cell, tile_bounds, tile_for, tiles_for
+
+logger = logging.getLogger(__name__)
+
+# Clusters are computed on tiles this many zoom levels below the view
+# (2 -> a 4x4 grid of ~64 px clusters per 256 px map tile)
+CLUSTER_SUBDIVISION = 2
+
+
+class LocationBuffer:
+    """Coalesces location pings in memory and writes them in batches.
+
+    Each user's newest position replaces the previous one, so a burst of
+    pings costs one row in the next flush. A background thread flushes every
+    ``LOCATION_FLUSH_INTERVAL_MS`` or as soon as ``LOCATION_FLUSH_MAX_ENTRIES``
+    users are pending, with a single bulk upsert in one transaction.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def put(self, user_id, latitude, longitude):
+        with self._lock:
+            self._pending[user_id] = (latitude, longitude, timezone.now())
+            full = len(self._pending) >= settings.LOCATION_FLUSH_MAX_ENTRIES
+
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def get(self, user_id):
+        """Pending ``(latitude, longitude)`` for the user, or None."""
+        with self._lock:
+            entry = self._pending.get(user_id)
+        return entry[:2] if entry else None
+
+    def snapshot(self):
+        """Copy of every pending position as ``{user_id: (lat, lon)}``."""
+        with self._lock:
+            return {user_id: entry[:2] for user_id, entry in self._pending.items()}
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+
+        if not batch:
+            return 0
+
+        rows = [
+            UserLocation(
+                user_id=user_id,
+                latitude=lat,
+                longitude=lon,
+                cell=grid_cell(lat, lon),
+                updated_at=seen_at
+            )
+            for user_id, (lat, lon, seen_at) in batch.items()
+        ]
+
+        # MySQL picks the conflict target itself and rejects unique_fields
+        conflict_target = (
+            {"unique_fields": ["user"]}
+            if connection.features.supports_update_conflicts_with_target else {}
+        )
+
+        try:
+            with transaction.atomic():
+                UserLocation.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    update_fields=["latitude", "longitude", "cell", "updated_at"],
+                    **conflict_target
+                )
+        except Exception:
+            # Put the batch back unless a newer ping arrived meanwhile
+            with self._lock:
+                for user_id, entry in batch.items():
+                    self._pending.setdefault(user_id, entry)
+            raise
+
+        return len(rows)
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="location-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        interval = settings.LOCATION_FLUSH_INTERVAL_MS / 1000
+
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Location flush failed; retrying on the next interval")
+
+
+location_buffer = LocationBuffer()
+
+
+def viewport_tiles(south, west, north, east, zoom):
+    """Map tiles covering the box, zooming out until at most LIVE_MAP_MAX_TILES."""
+    while True:
+        x_min, y_min = tile_for(north, west, zoom)
+        x_max, y_max = tile_for(south, east, zoom)
+        count = (x_max - x_min + 1) * (y_max - y_min + 1)
+        if count <= settings.LIVE_MAP_MAX_TILES or zoom == 0:
+            break
+        zoom -= 1
+
+    tiles = [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+    return zoom, tiles
+
+
+def _in_box(south, west, north, east):
+    return UserLocation.objects.filter(
+        latitude__isnull=False,
+        longitude__isnull=False,
+        latitude__range=(south, north),
+        longitude__range=(west, east)
+    )
+
+
+def _cluster_tiles(zoom, tiles):
+    """Count + centroid per sub-tile for each tile, as ``{(x, y): [cluster, ...]}``."""
+    bounds = [tile_bounds(x, y, zoom) for x, y in tiles]
+    south = min(b[0] for b in bounds)
+    north = max(b[1] for b in bounds)
+    west = min(b[2] for b in bounds)
+    east = max(b[3] for b in bounds)
+
+    points = np.array(
+        list(_in_box(south, west, north, east).values_list("latitude", "longitude")),
+        dtype=float
+    ).reshape(-1, 2)
+
+    clusters = {tile: [] for tile in tiles}
+    if not len(points):
+        return clusters
+
+    sub_zoom = zoom + CLUSTER_SUBDIVISION
+    xs, ys = tiles_for(points[:, 0], points[:, 1], sub_zoom)
+    keys = xs * (2 ** sub_zoom) + ys
+    unique, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse)
+    lat_sums = np.bincount(inverse, weights=points[:, 0])
+    lon_sums = np.bincount(inverse, weights=points[:, 1])
+
+    for key, count, lat_sum, lon_sum in zip(unique, counts, lat_sums, lon_sums):
+        x, y = divmod(int(key), 2 ** sub_zoom)
+        tile = (x >> CLUSTER_SUBDIVISION, y >> CLUSTER_SUBDIVISION)
+        if tile in clusters:
+            clusters[tile].append({
+                "latitude": round(lat_sum / count, 6),
+                "longitude": round(lon_sum / count, 6),
+                "count": int(count)
+            })
+
+    return clusters
+
+
+def viewport_clusters(south, west, north, east, zoom):
+    """Grid aggregates for the viewport, cached per map tile.
+
+    Each tile's clusters are cached for ``LIVE_MAP_CLUSTER_TTL`` seconds, so
+    overlapping viewports from different clients share the work and only
+    uncached tiles are read from the database, in one query.
+    """
+    zoom, tiles = viewport_tiles(south, west, north, east, zoom)
+    keys = {tile: f"live-clusters:{zoom}/{tile[0]}/{tile[1]}" for tile in tiles}
+
+    cached = cache.get_many(keys.values())
+    missing = [tile for tile, key in keys.items() if key not in cached]
+
+    if missing:
+        fresh = _cluster_tiles(zoom, missing)
+        cache.set_many(
+            {keys[tile]: clusters for tile, clusters in fresh.items()},
+            settings.LIVE_MAP_CLUSTER_TTL
+        )
+        cached.update({keys[tile]: clusters for tile, clusters in fresh.items()})
+
+    return [cluster for key in keys.values() for cluster in cached[key]]
+
+
+def viewport_points(south, west, north, east, limit):
+    """Up to ``limit`` individual users in the box, or None when there are more."""
+    rows = {
+        user_id: (username, lat, lon)
+        for user_id, username, lat, lon in _in_box(south, west, north, east)
+        .values_list("user_id", "user__username", "latitude", "longitude")[:limit + 1]
+    }
+    if len(rows) > limit:
+        return None
+
+    # Pings still in the write buffer are newer than the table, and may
+    # have moved users stored elsewhere into the box
+    arrivals = {}
+    for user_id, (lat, lon) in location_buffer.snapshot().items():
+        if user_id in rows:
+            rows[user_id] = (rows[user_id][0], lat, lon)
+        elif south <= lat <= north and west <= lon <= east:
+            arrivals[user_id] = (lat, lon)
+
+    if arrivals:
+        for user_id, username in User.objects.filter(id__in=arrivals).values_list("id", "username"):
+            rows[user_id] = (username, *arrivals[user_id])
+
+    points = [
+        {"id": user_id, "username": username, "latitude": lat, "longitude": lon}
+        for user_id, (username, lat, lon) in rows.items()
+        if south <= lat <= north and west <= lon <= east
+    ]
+    return points if len(points) <= limit else None
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        location_buffer.flush()
+    except Exception:
+        logger.exception("Location flush at exit failed")
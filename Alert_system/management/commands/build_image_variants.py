@@ -0,0 +1,51 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from Alert_system.images import InvalidImage, build_variants, store_image
+from Alert_system.models import PolicePublicAlert, StoredImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move broadcast photos uploaded before the image pipeline into content-addressed "
+        "storage and build any missing WebP/JPEG variants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prune", action="store_true",
+            help="Delete the old upload once no broadcast refers to it any more."
+        )
+
+    def handle(self, *args, **options):
+        legacy = PolicePublicAlert.objects.filter(image__isnull=True).exclude(photo="").exclude(photo=None)
+        moved = 0
+
+        for broadcast in legacy.iterator():
+            old_name = broadcast.photo.name
+            try:
+                with default_storage.open(old_name, "rb") as f:
+                    image = store_image(f, background=False)
+            except (InvalidImage, OSError) as e:
+                self.stderr.write(f"Broadcast #{broadcast.id}: {old_name}: {e}")
+                continue
+
+            broadcast.photo = image.original.name
+            broadcast.image = image
+            broadcast.save(update_fields=["photo", "image"])
+            moved += 1
+
+            still_used = PolicePublicAlert.objects.filter(photo=old_name).exists()
+            if options["prune"] and old_name != image.original.name and not still_used:
+                default_storage.delete(old_name)
+
+        built = 0
+        for image in StoredImage.objects.exclude(status="ready").iterator():
+            try:
+                build_variants(image)
+                built += 1
+            except Exception as e:
+                self.stderr.write(f"{image.original.name}: {e}")
+                StoredImage.objects.filter(id=image.id).update(status="failed")
+
+        self.stdout.write(f"{moved} photos moved to content-addressed storage, {built} images resized")
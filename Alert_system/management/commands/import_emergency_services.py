@@ -0,0 +1,162 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from Alert_system.emergency import SERVICE_KINDS, service_from_element
+from Alert_system.models import EmergencyCoverage, EmergencyService
+from Alert_system.utils import grid_cell
+
+
+def _feature_point(geometry):
+    """(lat, lon) of a GeoJSON geometry; polygons collapse to their vertex mean."""
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates")
+
+    if kind == "Point":
+        return coords[1], coords[0]
+    if kind == "Polygon":
+        ring = coords[0]
+    elif kind == "MultiPolygon":
+        ring = coords[0][0]
+    else:
+        return None, None
+
+    return (
+        sum(point[1] for point in ring) / len(ring),
+        sum(point[0] for point in ring) / len(ring),
+    )
+
+
+def read_geojson(data):
+    for feature in data.get("features", []):
+        props = feature.get("properties") or {}
+        tags = props.get("tags", props)  # osmtogeojson nests tags, most exports don't
+        lat, lon = _feature_point(feature.get("geometry") or {})
+        yield (
+            str(feature.get("id") or props.get("@id") or props.get("osm_id") or ""),
+            tags.get("amenity"),
+            tags.get("name", "Unknown"),
+            tags.get("addr:full", ""),
+            lat,
+            lon,
+        )
+
+
+def read_overpass(data):
+    for element in data.get("elements", []):
+        service = service_from_element(element)
+        yield (
+            f"{element.get('type', 'node')}/{element['id']}" if "id" in element else "",
+            service["type"],
+            service["name"],
+            service["address"],
+            service["latitude"],
+            service["longitude"],
+        )
+
+
+def parse_bbox(value):
+    """"south,west,north,east" (Overpass order) -> (lat_min, lat_max, lon_min, lon_max)."""
+    try:
+        south, west, north, east = (float(part) for part in value.split(","))
+    except ValueError:
+        raise CommandError(f"Invalid --bbox {value!r}, expected south,west,north,east")
+    return south, north, west, east
+
+
+def extract_bbox(data, rows):
+    """Area the extract claims to cover, else the extent of its points."""
+    bbox = data.get("bbox")
+    if bbox and len(bbox) >= 4:
+        # GeoJSON order: west, south, east, north
+        return bbox[1], bbox[3], bbox[0], bbox[2]
+
+    bounds = data.get("bounds")  # Overpass `out bb`
+    if bounds:
+        return bounds["minlat"], bounds["maxlat"], bounds["minlon"], bounds["maxlon"]
+
+    if not rows:
+        return None
+    lats = [row.latitude for row in rows]
+    lons = [row.longitude for row in rows]
+    return min(lats), max(lats), min(lons), max(lons)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import police stations and hospitals from an Overpass JSON or GeoJSON "
+        "extract so nearby-services lookups inside its area work without the network."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Overpass JSON (elements) or GeoJSON FeatureCollection file.")
+        parser.add_argument("--replace", action="store_true", help="Delete existing rows first.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--bbox",
+            help="Area the extract covers as south,west,north,east. Defaults to the "
+                 "file's bbox, else the extent of its points. Lookups outside it use Overpass."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        reader = read_geojson if data.get("type") == "FeatureCollection" else read_overpass
+
+        rows = {}
+        skipped = 0
+        for source_id, kind, name, address, lat, lon in reader(data):
+            if kind not in SERVICE_KINDS or lat is None or lon is None:
+                skipped += 1
+                continue
+
+            source_id = source_id or f"{kind}/{lat:.6f},{lon:.6f}"
+            rows[source_id] = EmergencyService(
+                source_id=source_id,
+                kind=kind,
+                name=name or "Unknown",
+                address=address or "",
+                latitude=lat,
+                longitude=lon,
+                cell=grid_cell(lat, lon)
+            )
+
+        conflict_target = (
+            {"unique_fields": ["source_id"]}
+            if connection.features.supports_update_conflicts_with_target else {}
+        )
+
+        if options["bbox"]:
+            bbox = parse_bbox(options["bbox"])
+        else:
+            bbox = extract_bbox(data, list(rows.values()))
+
+        with transaction.atomic():
+            if options["replace"]:
+                EmergencyService.objects.all().delete()
+                EmergencyCoverage.objects.all().delete()
+
+            EmergencyService.objects.bulk_create(
+                rows.values(),
+                batch_size=options["batch_size"],
+                update_conflicts=True,
+                update_fields=["kind", "name", "address", "latitude", "longitude", "cell"],
+                **conflict_target
+            )
+
+            if bbox is not None:
+                lat_min, lat_max, lon_min, lon_max = bbox
+                EmergencyCoverage.objects.create(
+                    source=options["path"][-255:],
+                    lat_min=lat_min,
+                    lat_max=lat_max,
+                    lon_min=lon_min,
+                    lon_max=lon_max
+                )
+
+        self.stdout.write(f"Imported {len(rows)} emergency services ({skipped} skipped)")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from Alert_system.models import Notification, UserProfile
+from Alert_system.services import unread_broadcast_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every UserProfile.unread_notifications counter from unread "
+        "notifications and broadcasts still inside the lookback window."
+    )
+
+    def handle(self, *args, **options):
+        counts = dict(
+            Notification.objects.filter(is_read=False)
+            .values("user_id")
+            .annotate(unread=Count("id"))
+            .values_list("user_id", "unread")
+        )
+        broadcasts = (
+            unread_broadcast_rows()
+            .values("user_id")
+            .annotate(unread=Count("id"))
+            .values_list("user_id", "unread")
+        )
+        for user_id, unread in broadcasts:
+            counts[user_id] = counts.get(user_id, 0) + unread
+
+        stale = []
+        for profile in UserProfile.objects.only("id", "user_id", "unread_notifications"):
+            actual = counts.get(profile.user_id, 0)
+            if profile.unread_notifications != actual:
+                profile.unread_notifications = actual
+                stale.append(profile)
+
+        UserProfile.objects.bulk_update(stale, ["unread_notifications"], batch_size=500)
+        self.stdout.write(f"Fixed {len(stale)} unread counters")
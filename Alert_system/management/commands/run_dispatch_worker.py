@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from Alert_system.dispatch import claim_next_job, process_job
+
+
+class Command(BaseCommand):
+    help = "Process queued alerts: assign the nearest police/hospital and notify nearby users."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs."
+        )
+        parser.add_argument(
+            "--interval", type=float, default=settings.DISPATCH_POLL_INTERVAL,
+            help="Seconds to wait between polls when the queue is empty."
+        )
+        parser.add_argument(
+            "--allow-in-memory-layer", action="store_true",
+            help="Run even though live events can't leave this process (tests, single-process setups)."
+        )
+
+    def handle(self, *args, **options):
+        # The in-memory layer only reaches sockets in this process, so
+        # nobody connected to the web server would see the live alerts
+        backend = settings.CHANNEL_LAYERS["default"]["BACKEND"]
+        if backend.endswith("InMemoryChannelLayer") and not options["allow_in_memory_layer"]:
+            raise CommandError(
+                "The channel layer is in-memory, so live alerts from this worker would never "
+                "reach the web server. Set REDIS_URL, or pass --allow-in-memory-layer."
+            )
+
+        self.stdout.write("Dispatch worker started")
+
+        while True:
+            job = claim_next_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            if process_job(job):
+                self.stdout.write(f"Alert #{job.alert_id} dispatched to {job.recipients} nearby users")
+            else:
+                self.stderr.write(f"Alert #{job.alert_id} {job.status}: {job.error}")
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Alert_system.push import claim_next_push_job, process_push_job
+
+
+class Command(BaseCommand):
+    help = "Deliver queued Web Push notifications to subscribed browsers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs."
+        )
+        parser.add_argument(
+            "--interval", type=float, default=settings.PUSH_POLL_INTERVAL,
+            help="Seconds to wait between polls when the queue is empty."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Push worker started")
+
+        while True:
+            job = claim_next_push_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            if process_push_job(job):
+                self.stdout.write(
+                    f"Push #{job.id}: {job.sent} sent, {job.failed} failed, {job.expired} expired"
+                )
+            else:
+                self.stderr.write(f"Push #{job.id} {job.status}: {job.error}")
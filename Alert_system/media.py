@@ -0,0 +1,141 @@
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .images import is_content_addressed
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_etag(name, stat):
+    """Strong ETag: the content hash when the name carries one, else mtime+size."""
+    if is_content_addressed(name):
+        return '"%s"' % name.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header, size):
+    """(start, end) of a single ``bytes=`` range, inclusive.
+
+    Returns None when the header should be ignored (missing, malformed,
+    several ranges, or an empty file, which has no bytes to address) and
+    raises ValueError when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or match.group(1) == match.group(2) == "" or size == 0:
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range outside the file")
+    return start, end
+
+
+def _read_range(f, start, length, block_size=FileResponse.block_size):
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(block_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        return "*" in if_none_match or etag in parse_etags(if_none_match)
+
+    since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return since is not None and int(mtime) <= since
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file with validators, byte ranges and long caching.
+
+    Content-addressed files (see Alert_system.images) never change, so they
+    are marked immutable for a year. With MEDIA_SENDFILE set the body is
+    left to the front server: "x-accel-redirect" (nginx, internal location
+    at MEDIA_ACCEL_REDIRECT_PREFIX) or "x-sendfile" (Apache, lighttpd).
+    Otherwise FileResponse lets a WSGI server use sendfile() for whole files.
+    """
+    name = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, name))
+        stat = fullpath.stat()
+    except (OSError, ValueError):
+        raise Http404("No such file")
+    if not fullpath.is_file():
+        raise Http404("No such file")
+
+    etag = media_etag(name, stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+    }
+    if is_content_addressed(name):
+        headers["Cache-Control"] = f"public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        headers["Cache-Control"] = f"public, max-age={settings.MEDIA_MAX_AGE}"
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return HttpResponseNotModified(headers=headers)
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    if settings.MEDIA_SENDFILE == "x-accel-redirect":
+        # nginx serves the bytes (and ranges) from its internal location
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + name
+        return response
+    if settings.MEDIA_SENDFILE == "x-sendfile":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["X-Sendfile"] = str(fullpath)
+        return response
+
+    byte_range = None
+    # If-Range: only send part of the file if it's still the version the client has
+    if request.META.get("HTTP_IF_RANGE", etag) == etag:
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["Content-Length"] = stat.st_size
+        return response
+
+    if byte_range is None:
+        return FileResponse(fullpath.open("rb"), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_range(fullpath.open("rb"), start, length),
+        status=206, content_type=content_type, headers=headers
+    )
+    response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    response["Content-Length"] = length
+    return response
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+from Alert_system.utils import grid_cell
+
+
+def populate_cells(apps, schema_editor):
+    UserLocation = apps.get_model("Alert_system", "UserLocation")
+
+    locations = list(UserLocation.objects.exclude(latitude=None).exclude(longitude=None))
+    for loc in locations:
+        loc.cell = grid_cell(loc.latitude, loc.longitude)
+
+    UserLocation.objects.bulk_update(locations, ["cell"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0007_notification_public_alert_alter_notification_address_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlocation',
+            name='cell',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=32),
+        ),
+        migrations.RunPython(populate_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 10:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0009_dispatchjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policepublicalert',
+            name='fan_out_on_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='policepublicalert',
+            name='radius_km',
+            field=models.FloatField(default=5),
+        ),
+        migrations.AddField(
+            model_name='policepublicalert',
+            name='title',
+            field=models.CharField(default='🚔 Police Public Alert', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='BroadcastReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_through', models.BigIntegerField(default=0)),
+                ('cleared_through', models.BigIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 10:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_unread_counts(apps, schema_editor):
+    Notification = apps.get_model("Alert_system", "Notification")
+    UserProfile = apps.get_model("Alert_system", "UserProfile")
+
+    counts = (
+        Notification.objects.filter(is_read=False)
+        .values("user_id")
+        .annotate(unread=Count("id"))
+        .values_list("user_id", "unread")
+    )
+    for user_id, unread in counts:
+        UserProfile.objects.filter(user_id=user_id).update(unread_notifications=unread)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0011_resourceversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_unread_counts, migrations.RunPython.noop),
+    ]
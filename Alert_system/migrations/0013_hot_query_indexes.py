@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 10:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0012_userprofile_unread_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userlocation',
+            name='cell',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at'], name='alert_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertassignment',
+            index=models.Index(fields=['police', '-created_at'], name='assign_police_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertassignment',
+            index=models.Index(fields=['hospital', '-created_at'], name='assign_hospital_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notif_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['user', '-created_at'], name='notif_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlocation',
+            index=models.Index(fields=['cell', 'user', 'latitude', 'longitude'], name='userloc_cell_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlocation',
+            index=models.Index(fields=['updated_at'], name='userloc_updated_idx'),
+        ),
+    ]
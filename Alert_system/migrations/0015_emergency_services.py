@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0014_geocodecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmergencyTile',
+            fields=[
+                ('key', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('services', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmergencyService',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.CharField(max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('police', 'Police'), ('hospital', 'Hospital')], max_length=20)),
+                ('name', models.CharField(default='Unknown', max_length=255)),
+                ('address', models.TextField(blank=True, default='')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('cell', models.CharField(blank=True, default='', max_length=32)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cell'], name='emergency_service_cell_idx')],
+            },
+        ),
+    ]
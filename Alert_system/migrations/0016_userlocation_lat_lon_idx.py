@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 10:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0015_emergency_services'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userlocation',
+            index=models.Index(fields=['latitude', 'longitude', 'user'], name='userloc_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 10:41
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    AlertAssignment = apps.get_model("Alert_system", "AlertAssignment")
+    AlertAssignment.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0017_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertassignment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alertassignment',
+            index=models.Index(fields=['police', 'status', '-created_at'], name='assign_police_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertassignment',
+            index=models.Index(fields=['hospital', 'status', '-created_at'], name='assign_hospital_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertassignment',
+            index=models.Index(fields=['police', 'updated_at'], name='assign_police_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertassignment',
+            index=models.Index(fields=['hospital', 'updated_at'], name='assign_hospital_updated_idx'),
+        ),
+    ]
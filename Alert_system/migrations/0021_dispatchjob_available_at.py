@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0020_stored_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dispatchjob',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='dispatchjob',
+            index=models.Index(fields=['status', 'available_at', 'id'], name='dispatch_due_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def cover_existing_import(apps, schema_editor):
+    # Tables imported before coverage was recorded keep answering for their extent
+    EmergencyService = apps.get_model("Alert_system", "EmergencyService")
+    EmergencyCoverage = apps.get_model("Alert_system", "EmergencyCoverage")
+
+    extent = EmergencyService.objects.aggregate(
+        lat_min=Min("latitude"), lat_max=Max("latitude"),
+        lon_min=Min("longitude"), lon_max=Max("longitude")
+    )
+    if extent["lat_min"] is not None:
+        EmergencyCoverage.objects.create(source="existing rows", **extent)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0021_dispatchjob_available_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmergencyCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(blank=True, default='', max_length=255)),
+                ('lat_min', models.FloatField()),
+                ('lat_max', models.FloatField()),
+                ('lon_min', models.FloatField()),
+                ('lon_max', models.FloatField()),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(cover_existing_import, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+import math
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copies of the values this migration was written against, so later
+# changes to settings or Alert_system.utils can't change what it does
+LOOKBACK_DAYS = 30
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1)))
+
+
+def record_recipients(apps, schema_editor):
+    # Older broadcasts were matched against the reader's location on every
+    # read; freeze what that gives today so they stay in the same inboxes
+    PolicePublicAlert = apps.get_model("Alert_system", "PolicePublicAlert")
+    BroadcastRecipient = apps.get_model("Alert_system", "BroadcastRecipient")
+    UserLocation = apps.get_model("Alert_system", "UserLocation")
+
+    since = timezone.now() - timedelta(days=LOOKBACK_DAYS)
+    broadcasts = PolicePublicAlert.objects.filter(fan_out_on_read=True, created_at__gte=since)
+
+    for broadcast in broadcasts.select_related("police"):
+        dlat = broadcast.radius_km / KM_PER_DEGREE
+        dlon = min(broadcast.radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(broadcast.latitude)), 0.01)), 180)
+        candidates = UserLocation.objects.filter(
+            latitude__range=(broadcast.latitude - dlat, broadcast.latitude + dlat),
+            longitude__range=(broadcast.longitude - dlon, broadcast.longitude + dlon),
+            user__date_joined__lte=broadcast.created_at,
+        ).exclude(user_id=broadcast.police.user_id).values_list("user_id", "latitude", "longitude")
+
+        BroadcastRecipient.objects.bulk_create(
+            [
+                BroadcastRecipient(broadcast_id=broadcast.id, user_id=user_id)
+                for user_id, lat, lon in candidates
+                if _distance_km(broadcast.latitude, broadcast.longitude, lat, lon) <= broadcast.radius_km
+            ],
+            batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0022_emergencycoverage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='broadcastrecipient',
+            name='broadcast',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='Alert_system.policepublicalert'),
+        ),
+        migrations.AddField(
+            model_name='broadcastrecipient',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='broadcastrecipient',
+            constraint=models.UniqueConstraint(fields=('user', 'broadcast'), name='broadcast_recipient_unique'),
+        ),
+        migrations.RunPython(record_recipients, migrations.RunPython.noop),
+    ]
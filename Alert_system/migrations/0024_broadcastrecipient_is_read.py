@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+def copy_watermarks(apps, schema_editor):
+    # The old read_through watermark marked every lower id as read, seen or
+    # not; keep what it said so nothing turns unread again
+    BroadcastReadState = apps.get_model("Alert_system", "BroadcastReadState")
+    BroadcastRecipient = apps.get_model("Alert_system", "BroadcastRecipient")
+
+    for state in BroadcastReadState.objects.filter(read_through__gt=0).iterator():
+        BroadcastRecipient.objects.filter(
+            user_id=state.user_id, broadcast_id__lte=state.read_through
+        ).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0023_broadcastrecipient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastrecipient',
+            name='is_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(copy_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='broadcastreadstate',
+            name='read_through',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Alert_system', '0024_broadcastrecipient_is_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushjob',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='pushjob',
+            name='delivered',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddIndex(
+            model_name='pushjob',
+            index=models.Index(fields=['status', 'available_at', 'id'], name='push_due_idx'),
+        ),
+    ]
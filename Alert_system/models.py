@@ -1,5 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .utils import grid_cell
 
 class UserProfile(models.Model):
     ROLE_CHOICES = [
@@ -11,6 +16,10 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
 
+    # Maintained alongside Notification writes; rebuild with
+    # `python manage.py rebuild_unread_counts`
+    unread_notifications = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return f"{self.user.username} ({self.role})"
 
@@ -19,8 +28,28 @@ class UserLocation(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    cell = models.CharField(max_length=32, blank=True, default="")
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # users_within: cell lookup answered from the index alone
+            models.Index(fields=["cell", "user", "latitude", "longitude"], name="userloc_cell_cover_idx"),
+            models.Index(fields=["updated_at"], name="userloc_updated_idx"),
+            # live map viewport: latitude range, longitude filtered from the index
+            models.Index(fields=["latitude", "longitude", "user"], name="userloc_lat_lon_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the grid cell in step with the coordinates on every write
+        self.cell = grid_cell(self.latitude, self.longitude)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"cell"}
+
+        super().save(*args, **kwargs)
+
 class Alert(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     latitude = models.FloatField()
@@ -29,10 +58,53 @@ class Alert(models.Model):
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at"], name="alert_created_idx"),
+        ]
+
     def __str__(self):
         return f"Alert #{self.id} - {self.address}"
 
 
+class DispatchJob(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    STAGE_CHOICES = [
+        ("pending", "Pending"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    alert = models.OneToOneField(Alert, on_delete=models.CASCADE, related_name="dispatch")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True)
+
+    # Progress of each pipeline stage, so a retried job skips finished work
+    assignment_status = models.CharField(max_length=20, choices=STAGE_CHOICES, default="pending")
+    facility_status = models.CharField(max_length=20, choices=STAGE_CHOICES, default="pending")
+    fanout_status = models.CharField(max_length=20, choices=STAGE_CHOICES, default="pending")
+
+    recipients = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Not claimed before this time; pushed back after each failure
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at", "id"], name="dispatch_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"Dispatch #{self.id} - {self.status}"
+
+
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
     title = models.CharField(max_length=255)
@@ -53,6 +125,19 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Inbox pages: user's notifications newest first
+            models.Index(fields=["user", "-created_at", "-id"], name="notif_user_created_idx"),
+            # Unread lookups; partial where supported (ignored on MySQL,
+            # which falls back to notif_user_created_idx)
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(is_read=False),
+                name="notif_user_unread_idx",
+            ),
+        ]
+
 
 class PoliceStation(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -95,18 +180,237 @@ class AlertAssignment(models.Model):
         default="assigned"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["police", "-created_at"], name="assign_police_created_idx"),
+            models.Index(fields=["hospital", "-created_at"], name="assign_hospital_created_idx"),
+            # dashboards: status filter first, then newest first
+            models.Index(fields=["police", "status", "-created_at"], name="assign_police_status_idx"),
+            models.Index(fields=["hospital", "status", "-created_at"], name="assign_hospital_status_idx"),
+            # dashboard change feeds
+            models.Index(fields=["police", "updated_at"], name="assign_police_updated_idx"),
+            models.Index(fields=["hospital", "updated_at"], name="assign_hospital_updated_idx"),
+        ]
 
     def __str__(self):
         return f"Assignment #{self.id} - {self.status}"
 
+class StoredImage(models.Model):
+    """An uploaded image, stored once per content hash, and its resized copies.
+
+    ``variants`` maps a size name to the storage names of its encodings,
+    e.g. ``{"thumb": {"webp": "...", "jpeg": "...", "width": 320, ...}}``.
+    It is filled in the background by Alert_system.images.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    original = models.ImageField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    variants = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.original.name
+
+    @cached_property
+    def urls(self):
+        """``{"thumb": {"webp": url, "jpeg": url}, ...}`` for templates."""
+        return {
+            name: {fmt: default_storage.url(variant[fmt]) for fmt in ("webp", "jpeg")}
+            for name, variant in self.variants.items()
+        }
+
+    @property
+    def is_ready(self):
+        return self.status == "ready"
+
+
 class PolicePublicAlert(models.Model):
     police = models.ForeignKey(PoliceStation, on_delete=models.CASCADE)
+    title = models.CharField(max_length=255, default="🚔 Police Public Alert")
     message = models.TextField()
     address = models.TextField()
-    photo = models.ImageField(upload_to="missing_persons/", null=True, blank=True)
+    # Same file as image.original; kept for the admin and older rows
+    photo = models.ImageField(upload_to="missing_persons/", max_length=255, null=True, blank=True)
+    image = models.ForeignKey(
+        StoredImage, null=True, blank=True, on_delete=models.SET_NULL, related_name="broadcasts"
+    )
     latitude = models.FloatField()
     longitude = models.FloatField()
+    radius_km = models.FloatField(default=5)
+
+    # True when recipients are listed in BroadcastRecipient and read the
+    # broadcast itself instead of getting their own Notification row
+    fan_out_on_read = models.BooleanField(default=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Police Alert - {self.address}"
+
+    @property
+    def public_alert(self):
+        # Lets a broadcast be rendered anywhere a Notification is
+        return self
+
+
+class BroadcastRecipient(models.Model):
+    """A user who was inside a fan-out-on-read broadcast's area when it was sent.
+
+    Only the pair and its read flag are stored; title and message come
+    from the broadcast.
+    """
+    broadcast = models.ForeignKey(PolicePublicAlert, on_delete=models.CASCADE, related_name="recipients")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "broadcast"], name="broadcast_recipient_unique"),
+        ]
+
+
+class BroadcastReadState(models.Model):
+    """Per-user watermark over fan-out-on-read broadcasts.
+
+    Broadcast ids increase monotonically, so clearing the inbox hides
+    everything up to ``cleared_through`` without touching every row.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="broadcast_state")
+    cleared_through = models.BigIntegerField(default=0)
+
+
+class ResourceVersion(models.Model):
+    """Change counter for a cacheable resource (e.g. "alerts", "notifications:7").
+
+    Bumped whenever the resource changes so views can answer conditional
+    GETs from this small table without reading the data itself.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class GeocodeCache(models.Model):
+    """Reverse-geocoding results keyed by quantized "lat,lon"."""
+    key = models.CharField(max_length=64, primary_key=True)
+    address = models.TextField()
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class EmergencyService(models.Model):
+    """Police station or hospital imported from an OSM/GeoJSON extract.
+
+    Filled by ``python manage.py import_emergency_services``; lookups inside
+    an imported EmergencyCoverage box are answered from it without Overpass.
+    """
+    KIND_CHOICES = (
+        ("police", "Police"),
+        ("hospital", "Hospital"),
+    )
+
+    source_id = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    name = models.CharField(max_length=255, default="Unknown")
+    address = models.TextField(blank=True, default="")
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    cell = models.CharField(max_length=32, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cell"], name="emergency_service_cell_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.cell = grid_cell(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
+
+
+class EmergencyCoverage(models.Model):
+    """Bounding box of one imported extract: the table is complete inside it."""
+    source = models.CharField(max_length=255, blank=True, default="")
+    lat_min = models.FloatField()
+    lat_max = models.FloatField()
+    lon_min = models.FloatField()
+    lon_max = models.FloatField()
+    imported_at = models.DateTimeField(auto_now_add=True)
+
+
+class EmergencyTile(models.Model):
+    """Overpass results for one map tile ("zoom/x/y"), kept past expiry for stale reads."""
+    key = models.CharField(max_length=32, primary_key=True)
+    services = models.JSONField(default=list)
+    fetched_at = models.DateTimeField(db_index=True)
+
+
+class Tombstone(models.Model):
+    """Marks a deleted alert or user location so delta feeds can report it."""
+    KIND_CHOICES = (
+        ("alert", "Alert"),
+        ("location", "User location"),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()  # Alert id, or the user id for a location
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "id"], name="tombstone_kind_id_idx"),
+        ]
+
+
+class PushSubscription(models.Model):
+    """A browser's Web Push endpoint and the keys its payloads are encrypted with."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="push_subscriptions")
+    endpoint = models.URLField(max_length=500, unique=True)
+    p256dh = models.CharField(max_length=128)
+    auth = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def subscription_info(self):
+        return {"endpoint": self.endpoint, "keys": {"p256dh": self.p256dh, "auth": self.auth}}
+
+
+class PushJob(models.Model):
+    """One notification to deliver by Web Push to every subscription of ``user_ids``."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    payload = models.JSONField()
+    user_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", db_index=True)
+
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    expired = models.PositiveIntegerField(default=0)   # subscriptions removed after 404/410
+    # Subscriptions already pushed, given up on or removed; a retry skips them
+    delivered = models.JSONField(default=list)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Not claimed before this time; pushed back after each failure
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at", "id"], name="push_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"Push #{self.id} - {self.status}"
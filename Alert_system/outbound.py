@@ -0,0 +1,235 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class OutboundError(requests.RequestException):
+    """Raised without contacting the upstream; callers should degrade."""
+
+
+class CircuitOpen(OutboundError):
+    pass
+
+
+class UpstreamBusy(OutboundError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open every call fails fast. After ``reset_timeout`` seconds one
+    trial call is let through (half-open); its outcome closes the circuit
+    or opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Return the state the call is let through in, or None to refuse it."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return state
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return state
+            return None
+
+    def release_trial(self):
+        # The trial call never reached the upstream; let another caller try
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """Per-host policy and state: timeouts, concurrency slots, breaker."""
+
+    def __init__(self, host, policy):
+        self.host = host
+        self.timeout = tuple(policy["timeout"])
+        self.retries = policy["retries"]
+        self.backoff = policy["backoff"]
+        self.queue_timeout = policy["queue_timeout"]
+        self.slots = threading.BoundedSemaphore(policy["max_concurrency"])
+        self.breaker = CircuitBreaker(policy["failure_threshold"], policy["reset_timeout"])
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def count(self, name):
+        # Worker threads share the upstream; += on an attribute isn't atomic
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.breaker.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+
+class OutboundClient:
+    """Shared HTTP client for calls to third-party services.
+
+    One pooled ``requests.Session`` keeps connections alive across calls.
+    Each host gets its own policy from ``OUTBOUND_HTTP`` (falling back to
+    the "default" entry): connect/read timeouts, a cap on concurrent
+    requests, retries with full-jitter backoff for idempotent requests, and
+    a circuit breaker. Calls refused by the breaker or by a full host raise
+    an OutboundError subclass immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._upstreams = {}
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    pool = settings.OUTBOUND_HTTP_POOL_SIZE
+                    adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=0)
+                    session = requests.Session()
+                    session.headers["User-Agent"] = settings.OUTBOUND_USER_AGENT
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def upstream(self, host):
+        with self._lock:
+            upstream = self._upstreams.get(host)
+            if upstream is None:
+                policies = settings.OUTBOUND_HTTP
+                policy = {**policies["default"], **policies.get(host, {})}
+                upstream = self._upstreams[host] = Upstream(host, policy)
+            return upstream
+
+    def reset(self):
+        with self._lock:
+            self._upstreams.clear()
+
+    def status(self):
+        with self._lock:
+            return {host: upstream.status() for host, upstream in self._upstreams.items()}
+
+    def request(self, method, url, idempotent=None, retry_statuses=RETRY_STATUSES, **kwargs):
+        """Send a request under the host's policy and return the response.
+
+        5xx responses count as failures for the breaker but are returned to
+        the caller after the last attempt. POSTs are only retried when the
+        caller passes ``idempotent=True``; ``retry_statuses`` says which
+        responses are worth another attempt.
+        """
+        method = method.upper()
+        upstream = self.upstream(urlsplit(url).hostname)
+        kwargs.setdefault("timeout", upstream.timeout)
+
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (upstream.retries if idempotent else 0)
+
+        admitted = upstream.breaker.allow()
+        if admitted is None:
+            upstream.count("rejected")
+            raise CircuitOpen(f"Circuit open for {upstream.host}")
+
+        if not upstream.slots.acquire(timeout=upstream.queue_timeout):
+            upstream.count("rejected")
+            # Our own queue is full; that says nothing about the upstream's health
+            if admitted == "half-open":
+                upstream.breaker.release_trial()
+            raise UpstreamBusy(f"Too many concurrent requests to {upstream.host}")
+
+        try:
+            for attempt in range(attempts):
+                last = attempt == attempts - 1
+                upstream.count("calls")
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    upstream.count("failures")
+                    if last:
+                        upstream.breaker.record_failure()
+                        raise
+                else:
+                    if response.status_code < 500 and response.status_code != 429:
+                        upstream.breaker.record_success()
+                        return response
+
+                    upstream.count("failures")
+                    if last or response.status_code not in retry_statuses:
+                        upstream.breaker.record_failure()
+                        return response
+                    response.close()
+
+                time.sleep(random.uniform(0, upstream.backoff * 2 ** attempt))
+        finally:
+            upstream.slots.release()
+            # A success or failure above already ended the trial; anything
+            # else (an invalid URL, too many redirects) must not keep the
+            # circuit half-open with nobody allowed through
+            if admitted == "half-open":
+                upstream.breaker.release_trial()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    async def arequest(self, method, url, **kwargs):
+        # requests is blocking; run it off the event loop in a worker thread
+        return await sync_to_async(self.request, thread_sensitive=False)(method, url, **kwargs)
+
+    async def aget(self, url, **kwargs):
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url, **kwargs):
+        return await self.arequest("POST", url, **kwargs)
+
+
+outbound = OutboundClient()
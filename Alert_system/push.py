@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from py_vapid import Vapid
+from pywebpush import WebPusher
+
+from .models import PushJob, PushSubscription
+from .outbound import outbound
+
+# Push services answer 404/410 for subscriptions the browser dropped
+EXPIRED_STATUSES = frozenset({404, 410})
+RETRY_STATUSES = frozenset({429, *range(500, 600)})
+
+
+def enqueue_push(user_ids, title, message, url="/notifications/"):
+    """Queue one Web Push for every subscription of ``user_ids``.
+
+    Runs inside the caller's transaction, so the job only becomes visible
+    to ``run_push_worker`` once the notifications are committed.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not PushSubscription.objects.exists():
+        return None
+
+    return PushJob.objects.create(
+        payload={"title": title, "body": message, "url": url},
+        user_ids=user_ids
+    )
+
+
+def requeue_stale_push_jobs():
+    cutoff = timezone.now() - timedelta(seconds=settings.PUSH_STALE_SECONDS)
+    PushJob.objects.filter(status="running", updated_at__lt=cutoff).update(
+        status="pending", updated_at=timezone.now()
+    )
+
+
+def claim_next_push_job():
+    """Atomically move the oldest pending push job to "running" and return it."""
+    requeue_stale_push_jobs()
+
+    pending = PushJob.objects.filter(status="pending", available_at__lte=timezone.now()).order_by("id")
+    for job_id in pending.values_list("id", flat=True)[:10]:
+        claimed = PushJob.objects.filter(id=job_id, status="pending").update(
+            status="running",
+            attempts=F("attempts") + 1,
+            updated_at=timezone.now()
+        )
+        if claimed:
+            return PushJob.objects.get(id=job_id)
+
+    return None
+
+
+class _OutboundSession:
+    """Lets pywebpush post through the shared outbound client.
+
+    Connections to each push service are pooled and kept alive, and 429/5xx
+    answers are retried with backoff under that host's OUTBOUND_HTTP
+    policy, which also supplies the timeout.
+    """
+
+    def post(self, url, timeout=None, **kwargs):
+        return outbound.post(url, idempotent=True, retry_statuses=RETRY_STATUSES, **kwargs)
+
+
+class PushSender:
+    """Encrypts and sends payloads on a bounded pool of threads.
+
+    The VAPID JWT is signed once per push service and reused until close to
+    its expiry instead of once per message.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._vapid = None
+        self._vapid_headers = {}
+        self._session = _OutboundSession()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.PUSH_WORKER_THREADS, thread_name_prefix="webpush"
+                    )
+        return self._executor
+
+    def vapid_headers(self, endpoint):
+        url = urlsplit(endpoint)
+        audience = f"{url.scheme}://{url.netloc}"
+        now = int(time.time())
+
+        with self._lock:
+            cached = self._vapid_headers.get(audience)
+            if cached and cached[0] - now > settings.PUSH_VAPID_TTL // 2:
+                return cached[1]
+
+            if self._vapid is None:
+                self._vapid = Vapid.from_string(settings.VAPID_PRIVATE_KEY)
+            expires = now + settings.PUSH_VAPID_TTL
+            headers = self._vapid.sign({
+                "aud": audience,
+                "exp": expires,
+                "sub": settings.VAPID_CLAIMS_SUB,
+            })
+            self._vapid_headers[audience] = (expires, headers)
+            return headers
+
+    def send(self, subscription_info, data):
+        """Return the push service's status code, or None if nothing was sent."""
+        try:
+            response = WebPusher(subscription_info, requests_session=self._session).send(
+                data=data,
+                headers={**self.vapid_headers(subscription_info["endpoint"]), "Urgency": "high"},
+                ttl=settings.PUSH_TTL,
+                content_encoding="aes128gcm",
+            )
+        except Exception as e:
+            # Unreachable service, or keys the payload can't be encrypted with
+            print("WEB PUSH ERROR:", e)
+            return None
+
+        response.close()
+        return response.status_code
+
+    def send_many(self, subscriptions, data):
+        """Send ``data`` to every subscription; yields (subscription, status)."""
+        statuses = self.executor.map(
+            lambda subscription: self.send(subscription.subscription_info(), data),
+            subscriptions
+        )
+        return zip(subscriptions, statuses)
+
+    def reset(self):
+        with self._lock:
+            self._vapid = None
+            self._vapid_headers.clear()
+
+
+sender = PushSender()
+
+
+def deliver(job):
+    """Push ``job.payload`` to its users' subscriptions, a batch at a time.
+
+    Subscriptions the push service reports as gone are deleted. Progress is
+    saved on the job after every batch, and subscriptions in
+    ``job.delivered`` are skipped, so a retried job doesn't push to anyone
+    twice. Returns the (sent, failed, expired) counts.
+    """
+    data = json.dumps(job.payload)
+    batch_size = settings.PUSH_BATCH_SIZE
+    done = set(job.delivered)
+
+    for start in range(0, len(job.user_ids), batch_size):
+        subscriptions = [
+            subscription
+            for subscription in PushSubscription.objects.filter(user_id__in=job.user_ids[start:start + batch_size])
+            if subscription.id not in done
+        ]
+        if not subscriptions:
+            continue
+        gone = []
+
+        for subscription, status in sender.send_many(subscriptions, data):
+            if status is not None and status < 300:
+                job.sent += 1
+            elif status in EXPIRED_STATUSES:
+                gone.append(subscription.id)
+            else:
+                job.failed += 1
+            done.add(subscription.id)
+
+        if gone:
+            PushSubscription.objects.filter(id__in=gone).delete()
+            job.expired += len(gone)
+
+        job.delivered = sorted(done)
+        job.save(update_fields=["delivered", "sent", "failed", "expired", "updated_at"])
+
+    return job.sent, job.failed, job.expired
+
+
+def retry_delay(attempts):
+    """Exponential backoff before retrying a job that failed ``attempts`` times."""
+    return min(settings.PUSH_RETRY_DELAY * 2 ** (attempts - 1), settings.PUSH_RETRY_MAX_DELAY)
+
+
+def process_push_job(job):
+    """Deliver a claimed job. Returns True when it completed.
+
+    Individual deliveries that still fail after the per-host retries are
+    only counted. If delivery itself blows up, the job is retried after an
+    exponential backoff, picking up with the subscriptions not yet reached.
+    """
+    try:
+        deliver(job)
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed" if job.attempts >= settings.PUSH_MAX_ATTEMPTS else "pending"
+        job.available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        job.save(update_fields=["error", "status", "available_at", "updated_at"])
+        return False
+
+    job.status = "done"
+    job.error = ""
+    job.save(update_fields=["status", "error", "updated_at"])
+    return True
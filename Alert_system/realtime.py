@@ -0,0 +1,73 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .utils import cells_covering
+
+# Every connected client hears about new accident alerts (live map, index page)
+ALERTS_GROUP = "alerts"
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def cell_group(cell):
+    # Channel group names only allow letters, digits, "-", "_" and "."
+    return "cell_" + cell.replace(":", "_")
+
+
+def _send(groups, message):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+
+    try:
+        for group in groups:
+            async_to_sync(layer.group_send)(group, message)
+    except Exception as e:
+        # Push is best effort; clients fall back to polling
+        print("REALTIME PUBLISH ERROR:", e)
+
+
+def _publish(groups, message):
+    groups = list(groups)
+    if groups:
+        transaction.on_commit(lambda: _send(groups, message))
+
+
+def publish(groups, data):
+    """Push ``data`` to the channel groups once the current transaction commits."""
+    _publish(groups, {"type": "send_notification", "data": data})
+
+
+def publish_to_users(user_ids, data):
+    publish((user_group(user_id) for user_id in user_ids), data)
+
+
+def publish_to_area(latitude, longitude, radius_km, data, exclude_user=None):
+    """Push ``data`` to every client whose grid cell touches the circle.
+
+    One group_send per covered cell, however many users are inside. The
+    event carries the circle so clients can drop it when they are outside
+    the exact radius.
+    """
+    data = dict(data, area={
+        "lat": latitude,
+        "lon": longitude,
+        "radius_km": radius_km,
+    })
+    _publish(
+        (cell_group(cell) for cell in cells_covering(latitude, longitude, radius_km)),
+        {"type": "send_area_notification", "data": data, "exclude_user": exclude_user}
+    )
+
+
+def publish_alert(alert):
+    publish([ALERTS_GROUP], {
+        "type": "alert",
+        "id": alert.id,
+        "latitude": alert.latitude,
+        "longitude": alert.longitude,
+        "address": alert.address,
+    })
@@ -0,0 +1,159 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .locations import location_buffer
+from .models import UserLocation, Notification, UserProfile, BroadcastRecipient
+from .push import enqueue_push
+from .realtime import publish_to_users
+from .utils import cells_covering, within_radius
+from .versions import bump_versions, inbox_window_start, notifications_key
+
+ALERT_RADIUS_KM = 5
+
+
+def users_within(lat, lon, radius_km=ALERT_RADIUS_KM, exclude_user=None):
+    """Return ids of users whose last known location is within ``radius_km``.
+
+    Only the grid cells around the point are read from the database, so the
+    cost depends on how many people are nearby rather than on the table size.
+    """
+    locations = UserLocation.objects.filter(
+        cell__in=cells_covering(lat, lon, radius_km)
+    )
+    if exclude_user is not None:
+        locations = locations.exclude(user=exclude_user)
+
+    positions = {
+        user_id: (loc_lat, loc_lon)
+        for user_id, loc_lat, loc_lon in locations.values_list("user_id", "latitude", "longitude")
+    }
+
+    # Pings still waiting in the write buffer are newer than the table
+    exclude_id = getattr(exclude_user, "pk", exclude_user)
+    for user_id, position in location_buffer.snapshot().items():
+        if user_id != exclude_id:
+            positions[user_id] = position
+
+    if not positions:
+        return []
+
+    points = np.array([(user_id, *position) for user_id, position in positions.items()], dtype=float)
+    mask = within_radius(lat, lon, points[:, 1], points[:, 2], radius_km)
+    return points[mask, 0].astype(int).tolist()
+
+
+def fan_out_notifications(user_ids, title, message, latitude=None, longitude=None,
+                          address="", public_alert=None, batch_size=None, push=True):
+    """Write one Notification per recipient with batched INSERTs.
+
+    All rows go in a single transaction, ``batch_size`` rows per statement
+    (``NOTIFICATION_BATCH_SIZE`` by default). Returns the number of rows written.
+    Pass ``push=False`` when the caller announces the notification to the
+    whole area with ``publish_to_area`` instead of per recipient. Web Push
+    to closed tabs is queued as one PushJob for ``run_push_worker``.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+
+    user_ids = list(user_ids)
+    rows = [
+        Notification(
+            user_id=user_id,
+            title=title,
+            message=message,
+            latitude=latitude,
+            longitude=longitude,
+            address=address,
+            public_alert=public_alert,
+        )
+        for user_id in user_ids
+    ]
+    if not rows:
+        return 0
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(rows, batch_size=batch_size)
+        bump_versions(notifications_key(user_id) for user_id in user_ids)
+
+        for start in range(0, len(user_ids), batch_size):
+            UserProfile.objects.filter(user_id__in=user_ids[start:start + batch_size]).update(
+                unread_notifications=F("unread_notifications") + 1
+            )
+
+        if push:
+            publish_to_users(user_ids, notification_event(
+                title, message, latitude, longitude, address, public_alert
+            ))
+
+        enqueue_push(user_ids, title, message)
+
+    return len(rows)
+
+
+def notification_event(title, message, latitude=None, longitude=None, address="", public_alert=None):
+    """Payload pushed to WebSocket clients for a new notification."""
+    return {
+        "type": "notification",
+        "title": title,
+        "message": message,
+        "lat": latitude,
+        "lon": longitude,
+        "address": address,
+        "public_alert": public_alert.id if public_alert else None,
+    }
+
+
+def notify_user(user_id, title, message, latitude=None, longitude=None, address="", public_alert=None):
+    return fan_out_notifications(
+        [user_id], title, message,
+        latitude=latitude, longitude=longitude, address=address, public_alert=public_alert
+    )
+
+
+def unread_broadcast_rows():
+    """Unread broadcast deliveries still inside the inbox lookback window."""
+    return BroadcastRecipient.objects.filter(
+        is_read=False, broadcast__created_at__gte=inbox_window_start()
+    )
+
+
+def unread_count(user):
+    """Unread notifications and broadcasts, read from the profile counter.
+
+    Falls back to counting rows for users without a profile.
+    """
+    count = UserProfile.objects.filter(user=user).values_list("unread_notifications", flat=True).first()
+    if count is None:
+        count = user.notifications.filter(is_read=False).count()
+        count += unread_broadcast_rows().filter(user=user).count()
+    return count
+
+
+def mark_notifications_read(user, notification_ids=None):
+    """Mark the given notifications (default: all of them) as read."""
+    unread = user.notifications.filter(is_read=False)
+    if notification_ids is not None:
+        unread = unread.filter(id__in=notification_ids)
+
+    with transaction.atomic():
+        updated = unread.update(is_read=True)
+
+        if notification_ids is None:
+            UserProfile.objects.filter(user=user).update(unread_notifications=0)
+        elif updated:
+            UserProfile.objects.filter(user=user).update(
+                unread_notifications=Greatest(F("unread_notifications") - updated, 0)
+            )
+
+        if updated:
+            bump_versions([notifications_key(user.id)])
+
+    return updated
+
+
+def clear_notifications_for(user):
+    with transaction.atomic():
+        user.notifications.all().delete()
+        UserProfile.objects.filter(user=user).update(unread_notifications=0)
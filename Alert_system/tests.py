@@ -1,3 +1,1565 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
+
+import numpy as np
+import requests
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from .models import (
+    Alert,
+    AlertAssignment,
+    DispatchJob,
+    EmergencyCoverage,
+    EmergencyService,
+    Hospital,
+    Notification,
+    PolicePublicAlert,
+    PoliceStation,
+    PushJob,
+    PushSubscription,
+    ResourceVersion,
+    StoredImage,
+    UserLocation,
+    UserProfile,
+)
+from .broadcasts import (
+    clear_broadcasts,
+    inbox_page,
+    mark_broadcasts_read,
+    publish_broadcast,
+)
+from .consumer import NotificationConsumer
+from .dashboards import changes_cursor
+from .dispatch import claim_next_job, enqueue_alert, process_job, retry_delay
+from .emergency import TileCache, nearby_services, table_covers, tile_cache
+from .facilities import (
+    FacilityIndex,
+    KDTree,
+    NoFacilityAvailable,
+    chord_to_km,
+    get_nearest_police_and_hospital,
+    hospital_index,
+    police_index,
+    to_unit_vectors,
+)
+from .geocoding import GeocodeCacheLookup, NominatimGeocoder
+from .images import build_variants
+from .locations import LocationBuffer, viewport_points
+from .outbound import CircuitOpen, OutboundClient, UpstreamBusy, outbound
+from .push import claim_next_push_job, enqueue_push, process_push_job, sender
+from .realtime import cell_group, publish_to_area, publish_to_users
+from .services import (
+    fan_out_notifications,
+    mark_notifications_read,
+    notification_event,
+    notify_user,
+    unread_count,
+    users_within,
+)
+from .utils import calculate_distances, cells_covering, grid_cell
+from .versions import notifications_key
+
+# Plan line for a table read without any index, e.g.
+# "SCAN Alert_system_notification" (but not "SCAN ... USING INDEX ...")
+FULL_SCAN = re.compile(r"SCAN (Alert_system_\w+)")
+
+
+def query_plans(queries):
+    """Run EXPLAIN QUERY PLAN for every captured SELECT on the app's tables."""
+    plans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or "Alert_system_" not in sql:
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+    return plans
+
+
+class QueryPlanTests(TestCase):
+    """The hot views must reach the app's tables through an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="citizen", password="pw")
+        UserProfile.objects.create(user=cls.user, role="user")
+        UserLocation.objects.create(user=cls.user, latitude=17.40, longitude=78.50)
+
+        police_user = User.objects.create_user(username="station", password="pw")
+        UserProfile.objects.create(user=police_user, role="police")
+        cls.police_user = police_user
+        police = PoliceStation.objects.create(
+            user=police_user, station_name="Central", latitude=17.41, longitude=78.49, phone="100"
+        )
+
+        hospital_user = User.objects.create_user(username="clinic", password="pw")
+        UserProfile.objects.create(user=hospital_user, role="hospital")
+        cls.hospital_user = hospital_user
+        hospital = Hospital.objects.create(
+            user=hospital_user, hospital_name="General", latitude=17.39, longitude=78.51, phone="108"
+        )
+
+        for i in range(5):
+            alert = Alert.objects.create(
+                user=cls.user, latitude=17.40, longitude=78.50, address=f"Road {i}", description=""
+            )
+            AlertAssignment.objects.create(alert=alert, police=police, hospital=hospital)
+            Notification.objects.create(user=cls.user, title="Alert", message="Nearby")
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN is SQLite specific")
+
+    def assertIndexed(self, queries, label):
+        for sql, plan in query_plans(queries):
+            for line in plan:
+                self.assertIsNone(
+                    FULL_SCAN.fullmatch(line),
+                    f"{label} scans a whole table:\n{sql}\n{plan}"
+                )
+
+    def assertNoFullScans(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIndexed(captured.captured_queries, url)
+
+    def test_notifications_page(self):
+        self.assertNoFullScans(self.user, reverse("notifications"))
+
+    def test_notifications_api(self):
+        self.assertNoFullScans(self.user, reverse("notifications_api"))
+
+    def test_unread_count(self):
+        self.assertNoFullScans(self.user, reverse("unread_notifications_count"))
+
+    def test_alerts_api(self):
+        self.assertNoFullScans(self.user, reverse("alerts_api"))
+
+    def test_police_dashboard(self):
+        self.assertNoFullScans(self.police_user, reverse("police_dashboard"))
+
+    def test_hospital_dashboard(self):
+        self.assertNoFullScans(self.hospital_user, reverse("hospital_dashboard"))
+
+    def test_dashboard_changes(self):
+        url = reverse("dashboard_changes") + "?cursor=" + changes_cursor()
+        self.assertNoFullScans(self.police_user, url)
+        self.assertNoFullScans(self.hospital_user, url)
+
+    def test_users_within(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(users_within(17.40, 78.50, 5), [self.user.id])
+
+        self.assertIndexed(captured.captured_queries, "users_within")
+
+    def test_live_locations(self):
+        cache.clear()
+        for zoom in (16, 11):
+            self.assertNoFullScans(
+                self.user, reverse("live_locations") + f"?bbox=17.3,78.4,17.5,78.6&zoom={zoom}"
+            )
+
+
+class SQLiteProfileTests(TestCase):
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite connection profile")
+
+    def test_pragmas_applied_to_new_connections(self):
+        with override_settings(SQLITE_PRAGMAS={"cache_size": -1234, "temp_store": "MEMORY"}):
+            fresh = connections.create_connection("default")
+            self.addCleanup(fresh.close)
+            with fresh.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size")
+                self.assertEqual(cursor.fetchone()[0], -1234)
+                cursor.execute("PRAGMA temp_store")
+                self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    @override_settings(LOCATION_BUFFER_ENABLED=False)
+    def test_direct_location_write(self):
+        user = User.objects.create(username="citizen")
+        self.client.force_login(user)
+
+        response = self.client.post(reverse("update_location"), {"lat": 17.4, "lon": 78.5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserLocation.objects.get(user=user).cell, grid_cell(17.4, 78.5))
+
+        locked = OperationalError("database is locked")
+        with mock.patch.object(UserLocation.objects, "update_or_create", side_effect=locked):
+            response = self.client.post(reverse("update_location"), {"lat": 17.5, "lon": 78.5})
+        self.assertEqual(response.status_code, 503)
+
+
+class LocationBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="citizen")
+        cls.other = User.objects.create(username="neighbour")
+        UserLocation.objects.create(user=cls.other, latitude=28.6, longitude=77.2)
+
+    def setUp(self):
+        self.buffer = LocationBuffer()
+        self.buffer._ensure_flusher = lambda: None  # flushed by hand below
+
+    def test_pings_coalesce_into_one_upsert(self):
+        self.buffer.put(self.user.id, 17.0, 78.0)
+        self.buffer.put(self.user.id, 17.4, 78.5)
+        self.buffer.put(self.other.id, 17.41, 78.5)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(len([q for q in captured.captured_queries if q["sql"].startswith("INSERT")]), 1)
+
+        location = UserLocation.objects.get(user=self.user)
+        self.assertEqual((location.latitude, location.longitude), (17.4, 78.5))
+        self.assertEqual(location.cell, grid_cell(17.4, 78.5))
+        self.assertEqual(UserLocation.objects.get(user=self.other).cell, grid_cell(17.41, 78.5))
+        self.assertEqual(self.buffer.snapshot(), {})
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_is_merged_back_under_newer_pings(self):
+        self.buffer.put(self.user.id, 17.0, 78.0)
+        self.buffer.put(self.other.id, 17.1, 78.1)
+
+        def fail_after_a_newer_ping(*args, **kwargs):
+            self.buffer.put(self.user.id, 17.4, 78.5)
+            raise OperationalError("database is locked")
+
+        with mock.patch.object(UserLocation.objects, "bulk_create", side_effect=fail_after_a_newer_ping):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+
+        # The newer ping wins; the failed one for the other user is kept
+        self.assertEqual(self.buffer.snapshot(), {self.user.id: (17.4, 78.5), self.other.id: (17.1, 78.1)})
+        self.buffer.flush()
+        self.assertEqual(UserLocation.objects.get(user=self.other).latitude, 17.1)
+
+    def test_pending_pings_overlay_the_table(self):
+        self.buffer.put(self.user.id, 17.40, 78.50)
+        self.buffer.put(self.other.id, 17.41, 78.50)  # stored far away, pending nearby
+
+        with mock.patch("Alert_system.services.location_buffer", self.buffer):
+            found = users_within(17.40, 78.50, 5, exclude_user=self.user.id)
+        self.assertEqual(found, [self.other.id])
+        self.assertEqual(self.buffer.get(self.user.id), (17.40, 78.50))
+        self.assertIsNone(self.buffer.get(12345))
+
+    def test_pending_pings_move_users_into_the_viewport(self):
+        self.buffer.put(self.other.id, 17.41, 78.50)  # stored far away, pending nearby
+
+        with mock.patch("Alert_system.locations.location_buffer", self.buffer):
+            points = viewport_points(17.3, 78.4, 17.5, 78.6, limit=10)
+            self.assertEqual(
+                points, [{"id": self.other.id, "username": "neighbour", "latitude": 17.41, "longitude": 78.50}]
+            )
+            self.assertEqual(viewport_points(28.5, 77.1, 28.7, 77.3, limit=10), [])
+
+
+class UsersWithinTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(7)
+        cls.points = {}
+        # Dense around the query point so many users sit near the 5 km edge
+        # and across several grid cells
+        for i, (lat, lon) in enumerate(zip(rng.uniform(17.30, 17.50, 400), rng.uniform(78.40, 78.60, 400))):
+            user = User.objects.create(username=f"user{i}")
+            UserLocation.objects.create(user=user, latitude=lat, longitude=lon)
+            cls.points[user.id] = (lat, lon)
+        UserLocation.objects.create(user=User.objects.create(username="unknown"))
+
+    def brute_force(self, lat, lon, radius_km, exclude=None):
+        ids = [user_id for user_id in self.points if user_id != exclude]
+        distances = calculate_distances(
+            lat, lon, [self.points[i][0] for i in ids], [self.points[i][1] for i in ids]
+        )
+        return sorted(user_id for user_id, d in zip(ids, distances) if d <= radius_km)
+
+    def test_matches_brute_force(self):
+        for lat, lon, radius_km in [(17.40, 78.50, 5), (17.45, 78.45, 2), (17.50, 78.60, 8), (17.30, 78.55, 0.5)]:
+            self.assertEqual(
+                sorted(users_within(lat, lon, radius_km)), self.brute_force(lat, lon, radius_km),
+                (lat, lon, radius_km)
+            )
+
+    def test_excludes_the_sender(self):
+        sender = next(iter(self.points))
+        lat, lon = self.points[sender]
+        found = users_within(lat, lon, 5, exclude_user=sender)
+        self.assertNotIn(sender, found)
+        self.assertEqual(sorted(found), self.brute_force(lat, lon, 5, exclude=sender))
+
+
+class LiveLocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create(username="viewer")
+        UserLocation.objects.create(user=cls.viewer)  # no coordinates yet
+        for i in range(3):
+            user = User.objects.create(username=f"near{i}")
+            UserLocation.objects.create(user=user, latitude=17.4 + i * 0.0001, longitude=78.5)
+        far = User.objects.create(username="far")
+        UserLocation.objects.create(user=far, latitude=28.6, longitude=77.2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.viewer)
+
+    def fetch(self, zoom):
+        url = reverse("live_locations") + f"?bbox=17.3,78.4,17.5,78.6&zoom={zoom}"
+        return self.client.get(url).json()
+
+    def test_zoomed_in_returns_users_in_view(self):
+        data = self.fetch(16)
+        self.assertEqual(data["mode"], "points")
+        self.assertEqual(sorted(u["username"] for u in data["locations"]), ["near0", "near1", "near2"])
+
+    @override_settings(LIVE_MAP_MAX_POINTS=2)
+    def test_crowded_view_is_clustered(self):
+        data = self.fetch(16)
+        self.assertEqual(data["mode"], "clusters")
+        self.assertEqual(sum(c["count"] for c in data["clusters"]), 3)
+
+    def test_zoomed_out_returns_cached_clusters(self):
+        data = self.fetch(10)
+        self.assertEqual(data["mode"], "clusters")
+        self.assertEqual([c["count"] for c in data["clusters"]], [3])
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.fetch(10), data)
+        self.assertFalse([q for q in captured.captured_queries if "Alert_system_userlocation" in q["sql"]])
+
+
+class DeltaFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="watcher")
+        cls.mover = User.objects.create(username="mover")
+        UserLocation.objects.create(user=cls.mover, latitude=17.4, longitude=78.5)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def new_alert(self, address):
+        return Alert.objects.create(user=self.user, latitude=17.4, longitude=78.5, address=address, description="")
+
+    def test_alerts_since_cursor(self):
+        old = self.new_alert("Old road")
+        first = self.client.get(reverse("alerts_api")).json()
+        self.assertTrue(first["reset"])
+
+        new = self.new_alert("New road")
+        old_id = old.id
+        old.delete()
+        delta = self.client.get(reverse("alerts_api"), {"since": first["cursor"]}).json()
+
+        self.assertFalse(delta["reset"])
+        self.assertEqual([a["id"] for a in delta["alerts"]], [new.id])
+        self.assertEqual(delta["removed"], [old_id])
+
+        idle = self.client.get(reverse("alerts_api"), {"since": delta["cursor"]}).json()
+        self.assertEqual((idle["alerts"], idle["removed"], idle["cursor"]), ([], [], delta["cursor"]))
+
+    def test_locations_since_cursor(self):
+        url = reverse("live_locations")
+        box = {"bbox": "17.3,78.4,17.5,78.6", "zoom": 16}
+        first = self.client.get(url, box).json()
+        self.assertEqual([u["username"] for u in first["locations"]], ["mover"])
+
+        # Rows stamped after the watermark are changes; this one left the box
+        UserLocation.objects.filter(user=self.mover).update(
+            latitude=17.55, longitude=78.5, updated_at=timezone.now() + timedelta(seconds=10)
+        )
+        delta = self.client.get(url, {**box, "since": first["cursor"]}).json()
+
+        self.assertFalse(delta["reset"])
+        self.assertEqual(delta["locations"], [])
+        self.assertEqual(delta["removed"], [self.mover.id])
+
+    def test_deleted_location_leaves_tombstone(self):
+        url = reverse("live_locations")
+        box = {"bbox": "17.3,78.4,17.5,78.6", "zoom": 16}
+        first = self.client.get(url, box).json()
+
+        UserLocation.objects.filter(user=self.mover).delete()
+        delta = self.client.get(url, {**box, "since": first["cursor"]}).json()
+        self.assertEqual(delta["removed"], [self.mover.id])
+
+
+@override_settings(DASHBOARD_PAGE_SIZE=2, FEED_WATERMARK_LAG=0)
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        reporter = User.objects.create(username="reporter")
+        cls.police_user = User.objects.create(username="station")
+        UserProfile.objects.create(user=cls.police_user, role="police")
+        police = PoliceStation.objects.create(
+            user=cls.police_user, station_name="Central", latitude=17.41, longitude=78.49, phone="100"
+        )
+
+        cls.assignments = []
+        for status in ("assigned", "resolved", "assigned", "assigned"):
+            alert = Alert.objects.create(
+                user=reporter, latitude=17.40, longitude=78.50, address=status, description=""
+            )
+            cls.assignments.append(AlertAssignment.objects.create(alert=alert, police=police, status=status))
+
+    def setUp(self):
+        self.client.force_login(self.police_user)
+
+    def test_first_page_shows_active_cases_newest_first(self):
+        response = self.client.get(reverse("police_dashboard"))
+        page = response.context["assignments"]
+
+        self.assertEqual([a.id for a in page], [self.assignments[3].id, self.assignments[2].id])
+        self.assertEqual(response.context["stats"]["active"], 3)
+
+        older = self.client.get(reverse("police_dashboard"), {"cursor": response.context["next_cursor"]})
+        self.assertEqual([a.id for a in older.context["assignments"]], [self.assignments[0].id])
+
+    def test_status_filter(self):
+        response = self.client.get(reverse("police_dashboard"), {"status": "resolved"})
+        self.assertEqual([a.id for a in response.context["assignments"]], [self.assignments[1].id])
+
+    def test_changes_report_resolved_case(self):
+        cursor = self.client.get(reverse("police_dashboard")).context["changes_cursor"]
+
+        assignment = self.assignments[3]
+        AlertAssignment.objects.filter(id=assignment.id).update(
+            status="resolved", updated_at=timezone.now() + timedelta(seconds=10)
+        )
+        data = self.client.get(reverse("dashboard_changes"), {"cursor": cursor}).json()
+
+        self.assertFalse(data["reset"])
+        self.assertEqual([(c["id"], c["matches"]) for c in data["assignments"]], [(assignment.id, False)])
+        self.assertIn(f'id="assignment-{assignment.id}"', data["assignments"][0]["html"])
+
+
+class ActorTests(TestCase):
+    """request.actor replaces the per-request profile and facility lookups."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.police_user = User.objects.create(username="station")
+        UserProfile.objects.create(user=cls.police_user, role="police")
+        cls.police = PoliceStation.objects.create(
+            user=cls.police_user, station_name="Central", latitude=17.41, longitude=78.49, phone="100"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.police_user)
+
+    def actor_queries(self, method, url, **data):
+        with CaptureQueriesContext(connection) as captured:
+            getattr(self.client, method)(url, data)
+        return [
+            q["sql"] for q in captured.captured_queries
+            if "Alert_system_userprofile" in q["sql"] or "Alert_system_policestation" in q["sql"]
+        ]
+
+    def test_dashboard_reads_profile_and_station_once(self):
+        url = reverse("police_dashboard")
+        self.assertEqual(len(self.actor_queries("get", url)), 2)  # cold cache
+        self.assertEqual(self.actor_queries("get", url), [])
+
+        # session + user, the page and its 3 stats counts, then the
+        # session save (SESSION_SAVE_EVERY_REQUEST: savepoint, update, release)
+        with self.assertNumQueries(9):
+            self.client.get(url)
+
+    def test_broadcast_uses_cached_station(self):
+        self.client.get(reverse("police_dashboard"))  # warm the cache
+
+        queries = self.actor_queries("post", reverse("police_general_broadcast"), message="Road closed")
+        self.assertEqual(queries, [])
+
+    def test_saving_station_invalidates_actor(self):
+        self.client.get(reverse("police_dashboard"))
+
+        self.police.station_name = "Renamed"
+        self.police.save()
+
+        response = self.client.get(reverse("police_dashboard"))
+        self.assertEqual(response.wsgi_request.actor.facility.station_name, "Renamed")
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        time.sleep(0.05)
+        body = json.dumps({"display_name": "Stub Road"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GeocodeCacheTests(TransactionTestCase):
+    """Reverse geocoding against a local stub Nominatim server."""
+
+    def setUp(self):
+        StubGeocoderHandler.calls = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGeocoderHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.geocoder = GeocodeCacheLookup()
+        self.geocoder.set_backend(NominatimGeocoder(
+            url=f"http://127.0.0.1:{self.server.server_port}/reverse", timeout=2
+        ))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @override_settings(GEOCODE_PRECISION=4)
+    def test_nearby_lookups_share_one_upstream_call(self):
+        self.assertEqual(self.geocoder.lookup(17.40001, 78.50001), "Stub Road")
+        self.assertEqual(self.geocoder.lookup(17.40002, 78.50002), "Stub Road")
+
+        self.geocoder.clear()  # next lookup must come from the table
+        self.assertEqual(self.geocoder.lookup(17.40001, 78.50001), "Stub Road")
+
+        self.assertEqual(StubGeocoderHandler.calls, 1)
+        stats = self.geocoder.stats.as_dict()
+        self.assertEqual((stats["memory_hits"], stats["db_hits"]), (1, 1))
+
+    def test_concurrent_misses_are_coalesced(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.geocoder.lookup(12.3, 45.6)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ["Stub Road"] * 5)
+        self.assertEqual(StubGeocoderHandler.calls, 1)
+
+
+class FakeOverpass:
+    def __init__(self):
+        self.calls = 0
+
+    def fetch(self, lat_min, lat_max, lon_min, lon_max):
+        self.calls += 1
+        return [
+            {"name": "Near", "type": "police", "latitude": 17.401, "longitude": 78.501, "address": ""},
+            {"name": "Far", "type": "hospital", "latitude": 17.5, "longitude": 78.6, "address": ""},
+        ]
+
+
+class EmergencyServiceTests(TestCase):
+    def test_tile_is_fetched_once_and_filtered_per_point(self):
+        tiles = TileCache()
+        tiles.set_client(FakeOverpass())
+
+        first = tiles.services(17.4, 78.5)
+        tiles.clear()  # second lookup comes from the EmergencyTile table
+        second = tiles.services(17.4001, 78.5001)
+
+        self.assertEqual(first, second)
+        self.assertEqual(tiles.client.calls, 1)
+
+    def test_expired_tile_is_served_stale(self):
+        tiles = TileCache()
+        tiles.set_client(FakeOverpass())
+        tiles.services(17.4, 78.5)
+
+        key = tiles.tile_key(17.4, 78.5)
+        tiles._remember(key, [], (timezone.now() - timedelta(days=5)).timestamp())
+        refreshed = []
+        tiles._refresh_in_background = refreshed.append
+
+        self.assertEqual(tiles.services(17.4, 78.5), [])
+        self.assertEqual(refreshed, [key])
+
+    def test_imported_dataset_answers_without_network(self):
+        extract = {
+            "type": "FeatureCollection",
+            "bbox": [78.0, 17.0, 79.0, 18.0],
+            "features": [
+                {"id": "node/1", "type": "Feature",
+                 "geometry": {"type": "Point", "coordinates": [78.501, 17.401]},
+                 "properties": {"amenity": "police", "name": "Near"}},
+                {"id": "node/2", "type": "Feature",
+                 "geometry": {"type": "Point", "coordinates": [78.6, 17.5]},
+                 "properties": {"amenity": "hospital", "name": "Far"}},
+                {"id": "node/3", "type": "Feature",
+                 "geometry": {"type": "Point", "coordinates": [78.5, 17.4]},
+                 "properties": {"amenity": "school"}},
+            ],
+        }
+        with tempfile.NamedTemporaryFile("w", suffix=".geojson", delete=False) as f:
+            json.dump(extract, f)
+        self.addCleanup(os.unlink, f.name)
+
+        call_command("import_emergency_services", f.name, stdout=io.StringIO())
+
+        services = nearby_services(17.4, 78.5)
+        self.assertEqual([s["name"] for s in services], ["Near"])
+        self.assertEqual(services[0]["type"], "police")
+
+    def test_outside_the_imported_area_uses_overpass(self):
+        EmergencyService.objects.create(
+            source_id="node/1", kind="police", name="Imported", latitude=17.401, longitude=78.501
+        )
+        EmergencyCoverage.objects.create(lat_min=17.0, lat_max=17.42, lon_min=78.0, lon_max=79.0)
+
+        overpass = FakeOverpass()
+        tile_cache.clear()
+        self.addCleanup(tile_cache.clear)
+        with mock.patch.object(tile_cache, "_client", overpass):
+            # The 5 km circle pokes out of the box's northern edge
+            services = nearby_services(17.4, 78.5)
+
+        self.assertEqual(overpass.calls, 1)
+        self.assertEqual([s["name"] for s in services], ["Near"])
+        self.assertTrue(table_covers(17.3, 78.5))
+
+
+class StatusSequenceHandler(BaseHTTPRequestHandler):
+    statuses = []
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        status = type(self).statuses.pop(0) if type(self).statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(OUTBOUND_HTTP={
+    "default": {
+        "timeout": (1, 1),
+        "max_concurrency": 2,
+        "queue_timeout": 1,
+        "retries": 2,
+        "backoff": 0.01,
+        "failure_threshold": 2,
+        "reset_timeout": 60,
+    },
+})
+class OutboundClientTests(TestCase):
+    def setUp(self):
+        StatusSequenceHandler.calls = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StatusSequenceHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.client = OutboundClient()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_transient_errors(self):
+        StatusSequenceHandler.statuses = [503, 502, 200]
+
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(StatusSequenceHandler.calls, 3)
+        self.assertEqual(self.client.status()["127.0.0.1"]["state"], "closed")
+
+    def test_breaker_opens_and_fails_fast(self):
+        StatusSequenceHandler.statuses = [500, 500]
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        with self.assertRaises(CircuitOpen):
+            self.client.get(self.url)
+        self.assertEqual(StatusSequenceHandler.calls, 2)
+
+    def test_full_queue_does_not_trip_breaker(self):
+        upstream = self.client.upstream("127.0.0.1")
+        upstream.queue_timeout = 0.01
+        upstream.slots.acquire()
+        upstream.slots.acquire()
+
+        for _ in range(3):
+            with self.assertRaises(UpstreamBusy):
+                self.client.get(self.url)
+        self.assertEqual(upstream.breaker.state, "closed")
+
+        upstream.slots.release()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_unexpected_error_releases_the_half_open_trial(self):
+        StatusSequenceHandler.statuses = [500, 500]
+        self.client.get(self.url)
+        self.client.get(self.url)
+        breaker = self.client.upstream("127.0.0.1").breaker
+        breaker.opened_at -= breaker.reset_timeout
+
+        with mock.patch.object(self.client.session, "request", side_effect=requests.TooManyRedirects):
+            with self.assertRaises(requests.TooManyRedirects):
+                self.client.get(self.url)
+
+        # The next caller gets the trial instead of finding the circuit stuck
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(breaker.state, "closed")
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def browser_keys():
+    """p256dh/auth pair like the one a browser puts in its subscription."""
+    public = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return {"p256dh": b64url(public), "auth": b64url(os.urandom(16))}
+
+
+class StubPushHandler(BaseHTTPRequestHandler):
+    """Push service stand-in: the path picks the status sequence."""
+    statuses = {}
+    requests = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        type(self).requests.append((self.path, self.headers, body))
+        sequence = type(self).statuses.get(self.path, [])
+        status = sequence.pop(0) if sequence else 201
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+VAPID_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+@override_settings(
+    VAPID_PRIVATE_KEY=b64url(VAPID_KEY.private_numbers().private_value.to_bytes(32, "big")),
+    OUTBOUND_HTTP={
+        "default": {
+            "timeout": (1, 1),
+            "max_concurrency": 8,
+            "queue_timeout": 1,
+            "retries": 2,
+            "backoff": 0.01,
+            "failure_threshold": 5,
+            "reset_timeout": 60,
+        },
+    },
+)
+class WebPushTests(TestCase):
+    def setUp(self):
+        StubPushHandler.requests = []
+        StubPushHandler.statuses = {"/flaky": [500], "/gone": [410]}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubPushHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        outbound.reset()
+        sender.reset()
+
+        self.user = User.objects.create(username="subscriber")
+        for path in ("/ok", "/flaky", "/gone"):
+            PushSubscription.objects.create(user=self.user, endpoint=self.base + path, **browser_keys())
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_subscribe_endpoint(self):
+        self.client.force_login(self.user)
+        subscription = {"endpoint": "https://push.example.com/abc", "keys": browser_keys()}
+
+        response = self.client.post(
+            reverse("push_subscribe"), json.dumps(subscription), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(PushSubscription.objects.filter(user=self.user, endpoint=subscription["endpoint"]).exists())
+
+        response = self.client.post(reverse("push_subscribe"), "{}", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_worker_delivers_retries_and_prunes(self):
+        notify_user(self.user.id, "🚨 New Emergency Alert", "Emergency reported nearby")
+        job = PushJob.objects.get()
+        self.assertEqual(job.user_ids, [self.user.id])
+
+        call_command("run_push_worker", "--once", stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent, job.failed, job.expired), ("done", 2, 0, 1))
+        self.assertFalse(PushSubscription.objects.filter(endpoint=self.base + "/gone").exists())
+
+        paths = sorted(path for path, _, _ in StubPushHandler.requests)
+        self.assertEqual(paths, ["/flaky", "/flaky", "/gone", "/ok"])
+        for _, headers, body in StubPushHandler.requests:
+            self.assertEqual(headers["Content-Encoding"], "aes128gcm")
+            self.assertTrue(headers["Authorization"].startswith("vapid t="))
+            self.assertNotIn(b"Emergency", body)
+
+    def test_retry_after_partial_failure_skips_delivered(self):
+        other = User.objects.create(username="second")
+        PushSubscription.objects.create(user=other, endpoint=self.base + "/other", **browser_keys())
+        enqueue_push([self.user.id, other.id], "🚨 New Emergency Alert", "Emergency reported nearby")
+
+        send_many = sender.send_many
+        batches = []
+
+        def dies_on_second_batch(subscriptions, data):
+            batches.append(subscriptions)
+            if len(batches) == 2:
+                raise RuntimeError("worker pool shut down")
+            return send_many(subscriptions, data)
+
+        with override_settings(PUSH_BATCH_SIZE=1):
+            with mock.patch.object(sender, "send_many", side_effect=dies_on_second_batch):
+                self.assertFalse(process_push_job(claim_next_push_job()))
+
+            job = PushJob.objects.get()
+            self.assertEqual(job.status, "pending")
+            self.assertGreater(job.available_at, timezone.now())
+            self.assertIsNone(claim_next_push_job())
+
+            PushJob.objects.update(available_at=timezone.now())
+            self.assertTrue(process_push_job(claim_next_push_job()))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent, job.failed, job.expired), ("done", 3, 0, 1))
+        paths = sorted(path for path, _, _ in StubPushHandler.requests)
+        self.assertEqual(paths, ["/flaky", "/flaky", "/gone", "/ok", "/other"])
+
+    def test_no_job_without_subscriptions(self):
+        PushSubscription.objects.all().delete()
+        notify_user(self.user.id, "🚨 New Emergency Alert", "Emergency reported nearby")
+        self.assertFalse(PushJob.objects.exists())
+
+
+def png_bytes(size=(2000, 1400)):
+    # Noise, so the PNG is photo-sized rather than compressing to nothing
+    from PIL import Image
+    out = io.BytesIO()
+    Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).save(out, "PNG")
+    return out.getvalue()
+
+
+class ImagePipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.police_user = User.objects.create(username="station")
+        UserProfile.objects.create(user=cls.police_user, role="police")
+        cls.police = PoliceStation.objects.create(
+            user=cls.police_user, station_name="Central", latitude=17.41, longitude=78.49, phone="100"
+        )
+        cls.viewer = User.objects.create(username="viewer")
+        UserLocation.objects.create(user=cls.viewer, latitude=17.41, longitude=78.49)
+        cls.photo = png_bytes()
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client.force_login(self.police_user)
+
+    def broadcast(self, data):
+        return self.client.post(reverse("police_missing_person_broadcast"), {
+            "message": "Missing since Monday",
+            "address": "Central",
+            "photo": SimpleUploadedFile("intern.png", data, content_type="image/png"),
+        })
+
+    def test_duplicate_uploads_stored_once(self):
+        self.broadcast(self.photo)
+        self.broadcast(self.photo)
+
+        image = StoredImage.objects.get()
+        first, second = PolicePublicAlert.objects.order_by("id")
+        self.assertEqual(first.image_id, image.id)
+        self.assertEqual(first.photo.name, second.photo.name)
+        self.assertEqual(default_storage.listdir(f"missing_persons/{image.sha256[:2]}")[1], [first.photo.name.rsplit("/", 1)[1]])
+
+    def test_variants_are_a_fraction_of_the_original(self):
+        self.broadcast(self.photo)
+        image = build_variants(StoredImage.objects.get())
+
+        thumb = image.variants["thumb"]
+        self.assertEqual((thumb["width"], thumb["height"]), (320, 224))
+        self.assertLess(default_storage.size(thumb["webp"]) * 10, len(self.photo))
+        self.assertLess(default_storage.size(image.variants["mobile"]["jpeg"]), len(self.photo))
+
+        self.client.force_login(self.viewer)
+        html = self.client.get(reverse("notifications")).content.decode()
+        self.assertIn(image.urls["thumb"]["webp"], html)
+
+    def test_rejects_non_images(self):
+        self.broadcast(b"not an image")
+        self.assertFalse(PolicePublicAlert.objects.exists())
+
+    def test_rejects_decompression_bombs(self):
+        from PIL import Image
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            response = self.broadcast(self.photo)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(StoredImage.objects.exists())
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        self.data = os.urandom(5000)
+        self.hashed = f"missing_persons/ab/{'ab' * 32}.png"
+        default_storage.save(self.hashed, io.BytesIO(self.data))
+        default_storage.save("missing_persons/intern.png", io.BytesIO(self.data))
+
+    def test_content_addressed_file_is_immutable(self):
+        response = self.client.get("/media/" + self.hashed)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["ETag"], f'"{"ab" * 32}"')
+
+        again = self.client.get("/media/" + self.hashed, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        legacy = self.client.get("/media/missing_persons/intern.png")
+        self.assertEqual(legacy["Cache-Control"], "public, max-age=3600")
+
+    def test_byte_ranges(self):
+        response = self.client.get("/media/" + self.hashed, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 100-199/5000")
+        self.assertEqual(b"".join(response.streaming_content), self.data[100:200])
+
+        tail = self.client.get("/media/" + self.hashed, HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(tail.streaming_content), self.data[-10:])
+
+        outside = self.client.get("/media/" + self.hashed, HTTP_RANGE="bytes=6000-")
+        self.assertEqual(outside.status_code, 416)
+
+        # A stale If-Range gets the whole (new) file
+        stale = self.client.get("/media/" + self.hashed, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_range_on_an_empty_file(self):
+        default_storage.save("missing_persons/empty.png", io.BytesIO(b""))
+
+        for header in ("bytes=0-", "bytes=-10"):
+            response = self.client.get("/media/missing_persons/empty.png", HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("Content-Range", response)
+            self.assertEqual(b"".join(response.streaming_content), b"")
+
+    @override_settings(MEDIA_SENDFILE="x-accel-redirect")
+    def test_hands_body_to_front_server(self):
+        response = self.client.get("/media/" + self.hashed)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/" + self.hashed)
+        self.assertEqual(response.content, b"")
+
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 400)
+
+
+class ServiceWorkerTests(TestCase):
+    def test_served_from_root_with_etag(self):
+        response = self.client.get("/serviceworker.js")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertIn('"/static/sounds/emergency.mp3"', response.content.decode())
+        self.assertNotIn("{{", response.content.decode())
+
+        again = self.client.get("/serviceworker.js", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+
+def add_station(name, lat, lon):
+    user = User.objects.create(username=f"police-{name}")
+    return PoliceStation.objects.create(user=user, station_name=name, latitude=lat, longitude=lon, phone="100")
+
+
+def add_hospital(name, lat, lon):
+    user = User.objects.create(username=f"hospital-{name}")
+    return Hospital.objects.create(user=user, hospital_name=name, latitude=lat, longitude=lon, phone="108")
+
+
+class FacilityIndexTests(TestCase):
+    def setUp(self):
+        police_index.invalidate()
+        hospital_index.invalidate()
+
+    def test_kdtree_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        lats, lons = rng.uniform(-60, 60, 500), rng.uniform(-180, 180, 500)
+        tree = KDTree(to_unit_vectors(lats, lons))
+
+        for lat, lon in rng.uniform((-60, -180), (60, 180), (50, 2)):
+            distances = calculate_distances(lat, lon, lats, lons)
+            expected = list(np.argsort(distances)[:3])
+
+            found = tree.query(to_unit_vectors([lat], [lon])[0], k=3)
+            self.assertEqual([i for _, i in found], expected)
+            self.assertAlmostEqual(chord_to_km(found[0][0]), distances[expected[0]], places=6)
+
+    def test_nearest_facilities(self):
+        add_station("far", 17.60, 78.70)
+        near = add_station("near", 17.41, 78.49)
+        hospital = add_hospital("general", 17.45, 78.45)
+
+        self.assertEqual(get_nearest_police_and_hospital(17.40, 78.50), (near, hospital))
+
+        # A row deleted behind the index's back is skipped, not returned
+        with mock.patch("Alert_system.facilities.bump_versions"):
+            PoliceStation.objects.filter(id=near.id).delete()
+        self.assertEqual(get_nearest_police_and_hospital(17.40, 78.50)[0].station_name, "far")
+
+    def test_no_facility_registered(self):
+        add_station("only", 17.41, 78.49)
+        with self.assertRaises(NoFacilityAvailable):
+            get_nearest_police_and_hospital(17.40, 78.50)
+
+
+class DispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create(username="reporter")
+        cls.far = add_station("far", 17.60, 78.70)
+        cls.hospital = add_hospital("general", 17.45, 78.45)
+
+    def setUp(self):
+        police_index.invalidate()
+        hospital_index.invalidate()
+
+    def dispatch(self, lat=17.40, lon=78.50):
+        alert, _ = enqueue_alert(self.reporter, lat, lon, "Main Road", "Collision")
+        job = claim_next_job()
+        self.assertTrue(process_job(job))
+        return AlertAssignment.objects.get(alert=alert)
+
+    def test_station_registered_after_index_is_built(self):
+        self.assertEqual(self.dispatch().police, self.far)
+
+        # Saved by the web process: nothing in this process is told directly
+        with mock.patch.object(FacilityIndex, "invalidate"):
+            near = add_station("near", 17.41, 78.49)
+        self.assertEqual(self.dispatch().police, near)
+
+    def test_stages_notify_facilities_and_neighbours(self):
+        neighbour = User.objects.create(username="neighbour")
+        UserLocation.objects.create(user=neighbour, latitude=17.41, longitude=78.50)
+        UserLocation.objects.create(user=self.reporter, latitude=17.40, longitude=78.50)
+
+        assignment = self.dispatch()
+        job = assignment.alert.dispatch
+
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.recipients, 1)
+        self.assertEqual(assignment.hospital, self.hospital)
+        notified = set(Notification.objects.values_list("user_id", flat=True))
+        self.assertEqual(notified, {self.far.user_id, self.hospital.user_id, neighbour.id})
+
+    def test_failed_stage_backs_off_and_resumes(self):
+        alert, _ = enqueue_alert(self.reporter, 17.40, 78.50)
+        job = claim_next_job()
+        with mock.patch("Alert_system.dispatch.fan_out_notifications", side_effect=RuntimeError("db down")):
+            self.assertFalse(process_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.assignment_status, job.fanout_status), ("pending", "done", "failed"))
+        self.assertGreater(job.available_at, timezone.now())
+        # Not due yet, so nobody picks it up
+        self.assertIsNone(claim_next_job())
+
+        DispatchJob.objects.filter(id=job.id).update(available_at=timezone.now())
+        job = claim_next_job()
+        self.assertEqual(job.attempts, 2)
+        self.assertTrue(process_job(job))
+        self.assertEqual(AlertAssignment.objects.filter(alert=alert).count(), 1)
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with self.settings(DISPATCH_RETRY_DELAY=5, DISPATCH_RETRY_MAX_DELAY=30):
+            self.assertEqual([retry_delay(n) for n in range(1, 6)], [5, 10, 20, 30, 30])
+
+    def test_gives_up_after_max_attempts(self):
+        enqueue_alert(self.reporter, 17.40, 78.50)
+        job = claim_next_job()
+        job.attempts = 3
+        with mock.patch("Alert_system.dispatch.notify_user", side_effect=RuntimeError("boom")):
+            self.assertFalse(process_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+    def test_stale_running_job_is_requeued(self):
+        enqueue_alert(self.reporter, 17.40, 78.50)
+        job = claim_next_job()
+        DispatchJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        again = claim_next_job()
+        self.assertEqual(again.id, job.id)
+        self.assertEqual(again.attempts, 2)
+
+    def test_deferred_without_using_an_attempt_when_no_facility(self):
+        PoliceStation.objects.all().delete()
+        Hospital.objects.all().delete()
+        enqueue_alert(self.reporter, 17.40, 78.50)
+        job = claim_next_job()
+        self.assertFalse(process_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.assignment_status), ("pending", 0, "pending"))
+        self.assertGreater(job.available_at, timezone.now() + timedelta(seconds=30))
+
+    def test_worker_refuses_an_in_memory_channel_layer(self):
+        with self.assertRaises(CommandError):
+            call_command("run_dispatch_worker", "--once", stdout=io.StringIO())
+
+        enqueue_alert(self.reporter, 17.40, 78.50)
+        call_command("run_dispatch_worker", "--once", "--allow-in-memory-layer", stdout=io.StringIO())
+        self.assertEqual(DispatchJob.objects.get().status, "done")
+
+
+class BroadcastInboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.station = add_station("central", 17.40, 78.50)
+        cls.viewer = User.objects.create(username="viewer")
+        UserProfile.objects.create(user=cls.viewer, role="user")
+        UserLocation.objects.create(user=cls.viewer, latitude=17.41, longitude=78.50)
+        cls.outsider = User.objects.create(username="outsider")
+        UserLocation.objects.create(user=cls.outsider, latitude=28.6, longitude=77.2)
+
+    def send(self, title="Road closed"):
+        return publish_broadcast(self.station, title, "Avoid the flyover", 17.40, 78.50, "Flyover")
+
+    def inbox(self, user, **kwargs):
+        return inbox_page(user, **kwargs)[0]
+
+    def test_recipients_fixed_at_send_time(self):
+        PushSubscription.objects.create(user=self.viewer, endpoint="https://push.example/1", p256dh="k", auth="a")
+        with self.captureOnCommitCallbacks(execute=True):
+            broadcast = self.send()
+
+        # The push and the inbox both go to whoever was in range when it was sent
+        self.assertEqual(PushJob.objects.get().user_ids, [self.viewer.id])
+        self.assertEqual([b.id for b in self.inbox(self.viewer)], [broadcast.id])
+
+        UserLocation.objects.filter(user=self.viewer).update(latitude=28.6, longitude=77.2)
+        UserLocation.objects.filter(user=self.outsider).update(latitude=17.41, longitude=78.50)
+        self.assertEqual([b.id for b in self.inbox(self.viewer)], [broadcast.id])
+        self.assertEqual(self.inbox(self.outsider), [])
+
+    def test_pages_merge_both_kinds_without_gaps(self):
+        sent_at = timezone.now() - timedelta(minutes=5)
+        for i in range(3):
+            notify_user(self.viewer.id, f"note {i}", "Nearby")
+            self.send(f"broadcast {i}")
+        # A tie on created_at across the two tables must not drop or repeat rows
+        Notification.objects.update(created_at=sent_at)
+        PolicePublicAlert.objects.update(created_at=sent_at)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = inbox_page(self.viewer, cursor=cursor, limit=2)
+            self.assertLessEqual(len(page), 2)
+            seen += [(type(item).__name__, item.id) for item in page]
+            if cursor is None:
+                break
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+        # Newest first; on a tie notifications sort ahead of broadcasts, then by id
+        self.assertEqual([kind for kind, _ in seen[:3]], ["Notification"] * 3)
+        self.assertEqual([kind for kind, _ in seen[3:]], ["PolicePublicAlert"] * 3)
+
+    def test_last_page_has_no_cursor(self):
+        self.send()
+        page, cursor = inbox_page(self.viewer, limit=1)
+        self.assertEqual(len(page), 1)
+        self.assertIsNone(cursor)
+
+    def test_broadcast_limit_is_applied_in_sql(self):
+        for i in range(5):
+            self.send(f"broadcast {i}")
+
+        with CaptureQueriesContext(connection) as captured:
+            page, cursor = inbox_page(self.viewer, limit=2)
+        self.assertEqual(len(page), 2)
+        self.assertIsNotNone(cursor)
+        broadcast_queries = [q["sql"] for q in captured.captured_queries if "broadcastrecipient" in q["sql"]]
+        self.assertTrue(broadcast_queries)
+        self.assertTrue(all("LIMIT 3" in sql for sql in broadcast_queries), broadcast_queries)
+
+    def test_malformed_cursor(self):
+        with self.assertRaises(ValueError):
+            inbox_page(self.viewer, cursor="not-a-cursor")
+
+    def test_viewing_page_one_leaves_page_two_unread(self):
+        older = self.send("older")
+        newer = self.send("newer")
+        self.client.force_login(self.viewer)
+
+        with self.settings(NOTIFICATIONS_PAGE_SIZE=1):
+            self.assertEqual(self.client.get(reverse("notifications")).status_code, 200)
+
+        read = {b.id: b.is_read for b in self.inbox(self.viewer)}
+        self.assertEqual(read, {newer.id: True, older.id: False})
+        self.assertEqual(unread_count(self.viewer), 1)
+
+    def test_unread_broadcasts_kept_on_the_profile_counter(self):
+        first = self.send("first")
+        self.send("second")
+        self.assertEqual(unread_count(self.viewer), 2)
+
+        mark_broadcasts_read(self.viewer, [first])
+        mark_broadcasts_read(self.viewer, [first])  # already read: no double decrement
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_count(self.viewer), 1)
+
+        clear_broadcasts(self.viewer)
+        self.assertEqual(unread_count(self.viewer), 0)
+        self.assertEqual(self.inbox(self.viewer), [])
+
+        out = io.StringIO()
+        call_command("rebuild_unread_counts", stdout=out)
+        self.assertIn("Fixed 0", out.getvalue())
+
+    def test_only_recipients_lose_their_cached_inbox(self):
+        self.client.force_login(self.viewer)
+        url = reverse("unread_notifications_count")
+        etag = self.client.get(url)["ETag"]
+
+        elsewhere = add_station("elsewhere", 28.6, 77.3)
+        publish_broadcast(elsewhere, "Far away", "Not here", 28.6, 77.3, "Delhi")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.send()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_moves_with_the_lookback_window(self):
+        self.send()
+        self.client.force_login(self.viewer)
+        url = reverse("notifications_api")
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Moving doesn't change the inbox, so the cached copy stays valid
+        UserLocation.objects.filter(user=self.viewer).update(latitude=28.6, longitude=77.2)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Next day, broadcasts may have dropped out of the window
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch("Alert_system.versions.timezone", mock.Mock(now=lambda: tomorrow)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="citizen")
+        UserProfile.objects.create(user=cls.user, role="user")
+
+    def unread(self):
+        return UserProfile.objects.get(user=self.user).unread_notifications
+
+    def test_counter_follows_writes_and_reads(self):
+        for i in range(3):
+            notify_user(self.user.id, f"Alert {i}", "Nearby")
+        self.assertEqual(self.unread(), 3)
+        self.assertEqual(unread_count(self.user), 3)
+
+        note = self.user.notifications.first()
+        mark_notifications_read(self.user, [note.id])
+        mark_notifications_read(self.user, [note.id])  # already read: no double decrement
+        self.assertEqual(self.unread(), 2)
+
+        mark_notifications_read(self.user)
+        self.assertEqual(self.unread(), 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        notify_user(self.user.id, "Alert", "Nearby")
+        UserProfile.objects.filter(user=self.user).update(unread_notifications=40)
+
+        out = io.StringIO()
+        call_command("rebuild_unread_counts", stdout=out)
+        self.assertEqual(self.unread(), 1)
+        self.assertIn("Fixed 1", out.getvalue())
+
+
+class FanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([User(username=f"user{i}") for i in range(25)])
+        UserProfile.objects.bulk_create([UserProfile(user=user, role="user") for user in cls.users])
+        cls.user_ids = [user.id for user in cls.users]
+
+    def test_rows_counters_and_versions_in_batches(self):
+        with CaptureQueriesContext(connection) as captured:
+            written = fan_out_notifications(
+                self.user_ids, "Alert", "Nearby", latitude=17.4, longitude=78.5, batch_size=10, push=False
+            )
+
+        self.assertEqual(written, 25)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("user_id", flat=True)), sorted(self.user_ids)
+        )
+        self.assertEqual(
+            set(UserProfile.objects.values_list("unread_notifications", flat=True)), {1}
+        )
+        self.assertEqual(
+            ResourceVersion.objects.filter(key__in=[notifications_key(i) for i in self.user_ids]).count(), 25
+        )
+
+        statements = [q["sql"].split("(")[0].replace('"', "").replace("`", "") for q in captured.captured_queries]
+        inserts = [sql for sql in statements if sql.startswith("INSERT INTO Alert_system_notification ")]
+        counters = [sql for sql in statements if sql.startswith("UPDATE Alert_system_userprofile ")]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(len(counters), 3)
+        # Independent of the recipient count
+        self.assertLess(len(captured.captured_queries), 15)
+
+    def test_push_job_queued_once(self):
+        PushSubscription.objects.create(user=self.users[0], endpoint="https://push.example/1", p256dh="k", auth="a")
+        fan_out_notifications(self.user_ids, "Alert", "Nearby")
+        self.assertEqual(PushJob.objects.get().user_ids, self.user_ids)
+
+    def test_no_recipients(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(fan_out_notifications([], "Alert", "Nearby"), 0)
+
+
+class RealtimeTests(TransactionTestCase):
+    """NotificationConsumer over the in-memory channel layer."""
+
+    def setUp(self):
+        async_to_sync(get_channel_layer().flush)()
+        self.user = User.objects.create(username="citizen")
+        UserLocation.objects.create(user=self.user, latitude=17.41, longitude=78.50)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def publish_area(self, lat, lon, title="Road closed", exclude_user=None):
+        await sync_to_async(publish_to_area)(
+            lat, lon, 1, notification_event(title, "Avoid the flyover"), exclude_user=exclude_user
+        )
+
+    def test_area_event_targets_covering_cells_only(self):
+        sent = []
+        with mock.patch("Alert_system.realtime._send", lambda groups, message: sent.append((groups, message))):
+            # Autocommit here, so the on_commit hook runs straight away
+            publish_to_area(17.41, 78.50, 5, notification_event("Road closed", "Avoid"), exclude_user=7)
+
+        (groups, message), = sent
+        self.assertEqual(groups, [cell_group(cell) for cell in cells_covering(17.41, 78.50, 5)])
+        self.assertIn(cell_group(grid_cell(17.41, 78.50)), groups)
+        self.assertNotIn(cell_group(grid_cell(28.6, 77.2)), groups)
+        self.assertEqual(message["type"], "send_area_notification")
+        self.assertEqual(message["exclude_user"], 7)
+        self.assertEqual(message["data"]["area"], {"lat": 17.41, "lon": 78.50, "radius_km": 5})
+
+    async def test_joins_stored_cell_and_follows_location_messages(self):
+        communicator = await self.connect(self.user)
+
+        await self.publish_area(17.41, 78.50, "here")
+        self.assertEqual(json.loads(await communicator.receive_from())["title"], "here")
+
+        await communicator.send_json_to({"type": "location", "lat": 28.6, "lon": 77.2})
+        await communicator.send_json_to({"type": "location", "lat": "bad"})  # ignored
+        # The location message is handled before the next publish is read
+        await communicator.receive_nothing(0.05)
+
+        await self.publish_area(17.41, 78.50, "left behind")
+        await self.publish_area(28.6, 77.2, "new cell")
+        self.assertEqual(json.loads(await communicator.receive_from())["title"], "new cell")
+        self.assertTrue(await communicator.receive_nothing(0.05))
+
+        await communicator.disconnect()
+
+    async def test_sender_excluded_and_user_group_delivered(self):
+        communicator = await self.connect(self.user)
+
+        await self.publish_area(17.41, 78.50, exclude_user=self.user.id)
+        self.assertTrue(await communicator.receive_nothing(0.05))
+
+        await sync_to_async(publish_to_users)([self.user.id], {"type": "notification", "title": "direct"})
+        self.assertEqual(json.loads(await communicator.receive_from())["title"], "direct")
+        await communicator.disconnect()
+
+    def test_cell_group_names_are_valid_channel_groups(self):
+        layer = get_channel_layer()
+        for lat, lon in [(17.41, 78.50), (-33.87, -70.65), (0.0, -0.01), (89.99, 179.99)]:
+            self.assertTrue(layer.valid_group_name(cell_group(grid_cell(lat, lon))), (lat, lon))
+
+    async def test_neighbouring_cell_inside_the_radius_hears_the_event(self):
+        # 17.449 and 17.451 sit on either side of a cell edge, ~220 m apart
+        await sync_to_async(UserLocation.objects.filter(user=self.user).update)(
+            latitude=17.451, longitude=78.50, cell=grid_cell(17.451, 78.50)
+        )
+        self.assertNotEqual(grid_cell(17.449, 78.50), grid_cell(17.451, 78.50))
+        communicator = await self.connect(self.user)
+
+        await self.publish_area(17.449, 78.50, "next door")
+        self.assertEqual(json.loads(await communicator.receive_from())["title"], "next door")
+        await communicator.disconnect()
+
+    async def test_disconnect_leaves_the_cell_group(self):
+        group = cell_group(grid_cell(17.41, 78.50))
+        communicator = await self.connect(self.user)
+        self.assertEqual(len(get_channel_layer().groups[group]), 1)
+
+        await communicator.disconnect()
+        self.assertFalse(get_channel_layer().groups.get(group))
+
+    async def test_anonymous_socket_rejected(self):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+        communicator.scope["user"] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+# Runs static/js/realtime.js under node with fake timers and a fake
+# WebSocket, and counts how often the fallback poller hits the server
+REALTIME_HARNESS = r"""
+const fs = require("fs");
+const vm = require("vm");
+
+let now = 0, seq = 0;
+const timers = new Map();
+const schedule = (fn, ms, every) => { timers.set(++seq, { at: now + ms, fn, every }); return seq; };
+const sandbox = {
+    console,
+    setTimeout: (fn, ms) => schedule(fn, ms, null),
+    setInterval: (fn, ms) => schedule(fn, ms, ms),
+    clearInterval: id => timers.delete(id),
+    location: { protocol: "https:", host: "example.test" },
+    navigator: {},
+};
+
+let serverUp = true;
+const sockets = new Set();
+class FakeWebSocket {
+    constructor() {
+        this.readyState = 0;
+        sockets.add(this);
+        schedule(() => serverUp ? this.accept() : this.drop(), 10, null);
+    }
+    accept() { this.readyState = 1; this.onopen(); }
+    drop() { this.readyState = 3; sockets.delete(this); this.onclose(); }
+    send() {}
+}
+FakeWebSocket.OPEN = 1;
+sandbox.WebSocket = FakeWebSocket;
+sandbox.window = { WebSocket: FakeWebSocket };
+vm.createContext(sandbox);
+vm.runInContext(fs.readFileSync(process.argv[2], "utf8"), sandbox);
+
+function runUntil(t) {
+    for (;;) {
+        let next = null;
+        for (const [id, timer] of timers) {
+            if (timer.at <= t && (!next || timer.at < next[1].at)) next = [id, timer];
+        }
+        if (!next) break;
+        const [id, timer] = next;
+        now = timer.at;
+        if (timer.every) timer.at += timer.every; else timers.delete(id);
+        timer.fn();
+    }
+    now = t;
+}
+
+const clients = Number(process.argv[3]);
+let polls = 0;
+for (let i = 0; i < clients; i++) {
+    sandbox.connectRealtime({ onMessage() {}, poll: () => polls++, pollInterval: 5000 });
+}
+
+const counts = {};
+runUntil(10 * 60 * 1000);
+counts.connected = polls;
+
+// A one-minute outage: every socket drops and reconnects fail until it ends
+serverUp = false;
+for (const socket of [...sockets]) socket.drop();
+runUntil(now + 60 * 1000);
+serverUp = true;
+counts.outage = polls - counts.connected;
+
+runUntil(now + 10 * 60 * 1000);
+counts.after = polls - counts.connected - counts.outage;
+counts.open = [...sockets].filter(s => s.readyState === 1).length;
+console.log(JSON.stringify(counts));
+"""
+
+
+@skipUnless(shutil.which("node"), "needs node to run static/js/realtime.js")
+class RealtimeClientTests(SimpleTestCase):
+    def test_poll_volume_per_thousand_idle_clients(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".js", delete=False) as f:
+            f.write(REALTIME_HARNESS)
+        self.addCleanup(os.unlink, f.name)
+
+        script = os.path.join(settings.BASE_DIR, "static", "js", "realtime.js")
+        result = subprocess.run(
+            ["node", f.name, script, "1000"], capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        counts = json.loads(result.stdout)
+
+        # Ten idle minutes with the socket up: no HTTP at all (polling every
+        # 5 s would be 120,000 requests)
+        self.assertEqual(counts["connected"], 0)
+        # A one-minute outage costs each client about one poll per 5 s, and
+        # polling stops once the socket is back
+        self.assertLessEqual(counts["outage"], 1000 * 13)
+        self.assertLessEqual(counts["after"], 1000 * 7)
+        self.assertEqual(counts["open"], 1000)
 
-# Create your tests here.
@@ -17,22 +17,27 @@ urlpatterns = [
     # 🏢 DASHBOARDS
     path("dashboard/police/", views.police_dashboard, name="police_dashboard"),
     path("dashboard/hospital/", views.hospital_dashboard, name="hospital_dashboard"),
+    path("dashboard/changes/", views.dashboard_changes, name="dashboard_changes"),
 
     # 🚨 ALERT SYSTEM
     path("send-alert/", views.send_alert, name="send_alert"),
     path("alerts/", views.alerts_api, name="alerts_api"),
+    path("alerts/<int:alert_id>/status/", views.alert_status, name="alert_status"),
 
     # 🔔 NOTIFICATIONS
     path("notifications/", views.notifications, name="notifications"),
     path("notifications/unread-count/", views.unread_notifications_count, name="unread_notifications_count"),
     path("notifications/clear/", views.clear_notifications, name="clear_notifications"),
     path("api/notifications/", views.notifications_api, name="notifications_api"),
+    path("push/subscribe/", views.push_subscribe, name="push_subscribe"),
+    path("push/unsubscribe/", views.push_unsubscribe, name="push_unsubscribe"),
 
     # 📍 LOCATION & MAP
     path("update-location/", views.update_location, name="update_location"),
     path("live-locations/", views.get_live_locations, name="live_locations"),
     path("map/", views.map_view, name="map"),
     path("reverse-geocode/", views.reverse_geocode, name="reverse_geocode"),
+    path("metrics/geocode/", views.geocode_metrics, name="geocode_metrics"),
     path("nearby-services/", views.nearby_emergency_services, name="nearby_services"),
 
     # 🚔 POLICE ACTIONS
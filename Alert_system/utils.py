@@ -1,7 +1,16 @@
 import math
 
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.32
+
+# Size of one UserLocation grid cell in degrees (~5.5 km of latitude)
+GRID_CELL_DEGREES = 0.05
+
+
 def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # Earth radius in KM
+    R = EARTH_RADIUS_KM  # Earth radius in KM
 
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
@@ -13,3 +22,104 @@ def calculate_distance(lat1, lon1, lat2, lon2):
 
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
+
+
+def calculate_distances(lat, lon, lats, lons):
+    """Vectorized haversine from one origin to arrays of points, in KM."""
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+    lat = math.radians(lat)
+    lon = math.radians(lon)
+
+    a = (np.sin((lats - lat) / 2) ** 2 +
+         math.cos(lat) * np.cos(lats) *
+         np.sin((lons - lon) / 2) ** 2)
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def within_radius(lat, lon, lats, lons, radius_km):
+    """Boolean mask of the points lying within ``radius_km`` of the origin."""
+    return calculate_distances(lat, lon, lats, lons) <= radius_km
+
+
+def distance_matrix(lats_a, lons_a, lats_b, lons_b):
+    """Pairwise distances in KM, shaped ``(len(a), len(b))``.
+
+    Used to match many origins (e.g. alerts) against many targets
+    (e.g. police stations) in a single pass.
+    """
+    lats_a = np.radians(np.asarray(lats_a, dtype=float))[:, None]
+    lons_a = np.radians(np.asarray(lons_a, dtype=float))[:, None]
+    lats_b = np.radians(np.asarray(lats_b, dtype=float))[None, :]
+    lons_b = np.radians(np.asarray(lons_b, dtype=float))[None, :]
+
+    a = (np.sin((lats_b - lats_a) / 2) ** 2 +
+         np.cos(lats_a) * np.cos(lats_b) *
+         np.sin((lons_b - lons_a) / 2) ** 2)
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def grid_cell(lat, lon, size=GRID_CELL_DEGREES):
+    if lat is None or lon is None:
+        return ""
+
+    row = math.floor(lat / size)
+    col = math.floor(lon / size)
+    return f"{row}:{col}"
+
+
+def bounding_box(lat, lon, radius_km):
+    """Return ``(lat_min, lat_max, lon_min, lon_max)`` enclosing the circle."""
+    dlat = radius_km / KM_PER_DEGREE
+    # Clamp near the poles so the longitude span never blows up
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180)
+
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def cells_covering(lat, lon, radius_km, size=GRID_CELL_DEGREES):
+    """Return every grid cell that intersects the bounding box of the circle."""
+    lat_min, lat_max, lon_min, lon_max = bounding_box(lat, lon, radius_km)
+
+    row_min = math.floor(lat_min / size)
+    row_max = math.floor(lat_max / size)
+    col_min = math.floor(lon_min / size)
+    col_max = math.floor(lon_max / size)
+
+    return [
+        f"{row}:{col}"
+        for row in range(row_min, row_max + 1)
+        for col in range(col_min, col_max + 1)
+    ]
+
+
+def tile_for(lat, lon, zoom):
+    """Slippy-map (Web Mercator) tile ``(x, y)`` containing the point."""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """Return ``(lat_min, lat_max, lon_min, lon_max)`` of a slippy-map tile."""
+    n = 2 ** zoom
+
+    def lat_at(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat_at(y + 1), lat_at(y), x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+
+
+def tiles_for(lats, lons, zoom):
+    """Vectorized ``tile_for``: integer arrays ``(xs, ys)``."""
+    n = 2 ** zoom
+    lats = np.radians(np.clip(np.asarray(lats, dtype=float), -85.0511, 85.0511))
+    lons = np.asarray(lons, dtype=float)
+    xs = ((lons + 180.0) / 360.0 * n).astype(np.int64)
+    ys = ((1.0 - np.arcsinh(np.tan(lats)) / math.pi) / 2.0 * n).astype(np.int64)
+    return np.clip(xs, 0, n - 1), np.clip(ys, 0, n - 1)
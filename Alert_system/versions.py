@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import Alert, ResourceVersion
+
+ALERTS = "alerts"
+
+
+def notifications_key(user_id):
+    return f"notifications:{user_id}"
+
+
+def bump_versions(keys):
+    """Advance the version of every key, creating missing ones."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+
+    with transaction.atomic():
+        ResourceVersion.objects.filter(key__in=keys).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        ResourceVersion.objects.bulk_create(
+            [ResourceVersion(key=key, version=1) for key in keys],
+            ignore_conflicts=True
+        )
+
+
+def resource_state(request, keys):
+    """Return ``(etag, last_modified)`` for the keys in one query.
+
+    The result is kept on the request, because Django's ``condition``
+    decorator asks for the ETag and the Last-Modified date separately.
+    """
+    cache = request.__dict__.setdefault("_resource_state", {})
+    cache_key = tuple(keys)
+
+    if cache_key not in cache:
+        rows = {
+            key: (version, updated_at)
+            for key, version, updated_at in ResourceVersion.objects.filter(
+                key__in=keys
+            ).values_list("key", "version", "updated_at")
+        }
+        etag = "-".join(str(rows.get(key, (0, None))[0]) for key in keys)
+        dates = [updated_at for _, updated_at in rows.values()]
+        cache[cache_key] = (etag, max(dates) if dates else None)
+
+    return cache[cache_key]
+
+
+def conditional_on(keys_for, moved_at=None):
+    """Conditional GET support driven by version stamps.
+
+    ``keys_for(request)`` names the resources a view depends on; a request
+    whose If-None-Match / If-Modified-Since still matches gets a 304 before
+    the view runs. ``moved_at()``, when given, is the last time the response
+    changed on its own (e.g. a time window advancing) and is folded into
+    both validators.
+    """
+    def etag(request, *args, **kwargs):
+        tag = resource_state(request, keys_for(request))[0]
+        if moved_at is not None:
+            tag += "-%d" % moved_at().timestamp()
+        return tag
+
+    def last_modified(request, *args, **kwargs):
+        modified = resource_state(request, keys_for(request))[1]
+        if moved_at is not None:
+            modified = max(filter(None, [modified, moved_at()]))
+        return modified
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def inbox_window_moved():
+    """Midnight UTC today: the broadcast lookback window only moves then."""
+    return timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def inbox_window_start():
+    """Oldest broadcast the inbox and the unread count still include."""
+    return inbox_window_moved() - timedelta(days=settings.BROADCAST_LOOKBACK_DAYS)
+
+
+def notification_keys(request):
+    return [notifications_key(request.user.id)]
+
+
+def alert_keys(request):
+    return [ALERTS]
+
+
+@receiver([post_save, post_delete], sender=Alert)
+def bump_alerts_version(sender, **kwargs):
+    bump_versions([ALERTS])
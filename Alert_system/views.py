@@ -1,36 +1,75 @@
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.db import transaction, OperationalError
-import requests, json, time
+from django.views.decorators.cache import cache_control
+from django.db import OperationalError
+import requests, json
 from django.conf import settings
-from django.db.models import Q
 
 
 from .models import (
-    Alert,
     UserLocation,
-    Notification,
     UserProfile,
     PoliceStation,
     Hospital,
     AlertAssignment,
-    PolicePublicAlert
+    PolicePublicAlert,
+    PushSubscription,
+    DispatchJob
+)
+from .dispatch import enqueue_alert
+from .locations import location_buffer, viewport_clusters, viewport_points
+from .feeds import alerts_feed, location_cursor, locations_feed
+from .dashboards import (
+    STATUS_FILTERS,
+    apply_filters,
+    assignments_for,
+    changes_cursor,
+    changes_since,
+    dashboard_page,
+    dashboard_stats,
+    matches_filters,
+    parse_filters,
+)
+from .geocoding import geocoder
+from .images import InvalidImage, photo_urls
+from .emergency import OverpassError, nearby_services
+from .outbound import OutboundError, outbound
+from .versions import (
+    conditional_on,
+    inbox_window_moved,
+    notification_keys,
+    alert_keys
+)
+from .services import (
+    notify_user,
+    unread_count as unread_notification_count,
+    mark_notifications_read,
+    clear_notifications_for
+)
+from .broadcasts import (
+    publish_broadcast,
+    inbox_page,
+    mark_broadcasts_read,
+    clear_broadcasts
 )
-from .utils import calculate_distance
 
 def home(request):
     return render(request,"landing.html")
 
 @login_required
 def user(request):
-    unread_count = request.user.notifications.filter(is_read=False).count()
+    unread_count = unread_notification_count(request.user)
     return render(request, "index.html", {
-        "unread_count": unread_count
+        "unread_count": unread_count,
+        "VAPID_PUBLIC_KEY": settings.VAPID_PUBLIC_KEY
     })
 
 
@@ -46,22 +85,30 @@ def login_view(request):
         if user:
             login(request, user)
 
-            UserProfile.objects.get_or_create(
-                user=user, defaults={"role": "user"}
-            )
+            # One query tells whether the profile and location rows exist
+            role, location_id = User.objects.filter(pk=user.pk).values_list(
+                "userprofile__role", "userlocation__id"
+            ).get()
+
+            if role is None:
+                profile, _ = UserProfile.objects.get_or_create(
+                    user=user, defaults={"role": "user"}
+                )
+                role = profile.role
 
             # ✅ CREATE USER LOCATION IF MISSING (NO 0,0 SKIP ISSUE)
-            UserLocation.objects.get_or_create(
-                user=user,
-                defaults={
-                    "latitude": None,
-                    "longitude": None
-                }
-            )
+            if location_id is None:
+                UserLocation.objects.get_or_create(
+                    user=user,
+                    defaults={
+                        "latitude": None,
+                        "longitude": None
+                    }
+                )
 
-            if user.userprofile.role == "police":
+            if role == "police":
                 return redirect("police_dashboard")
-            elif user.userprofile.role == "hospital":
+            elif role == "hospital":
                 return redirect("hospital_dashboard")
             else:
                 return redirect("user")
@@ -114,139 +161,126 @@ def send_alert(request):
     try:
         lat = float(request.POST.get("latitude"))
         lon = float(request.POST.get("longitude"))
-        address = request.POST.get("address", "")
-        description = request.POST.get("description", "")
-
-        # 1️⃣ Create alert
-        alert = Alert.objects.create(
-            user=request.user,
-            latitude=lat,
-            longitude=lon,
-            address=address,
-            description=description
-        )
-
-        # 2️⃣ Assign nearest police & hospital
-        police, hospital = get_nearest_police_and_hospital(lat, lon)
-
-        AlertAssignment.objects.create(
-            alert=alert,
-            police=police,
-            hospital=hospital,
-            status="assigned"
-        )
-
-        # 3️⃣ Notify police
-        Notification.objects.create(
-            user=police.user,
-            title="🚨 New Emergency Alert",
-            message=description or "Emergency reported nearby",
-            latitude=lat,
-            longitude=lon,
-            address=address
-        )
-
-        # 4️⃣ Notify hospital
-        Notification.objects.create(
-            user=hospital.user,
-            title="🏥 Emergency Case Nearby",
-            message="Medical assistance required",
-            latitude=lat,
-            longitude=lon,
-            address=address
-        )
-
-        nearby_users = UserLocation.objects.exclude(user=request.user)
-        print("===== NEARBY USER DEBUG =====")
-        print("Total nearby user locations:", nearby_users.count())
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Invalid coordinates"}, status=400)
 
-        for loc in nearby_users:
-            print("User:", loc.user.username)
-            print("Lat/Lon:", loc.latitude, loc.longitude)
+    address = request.POST.get("address", "")
+    description = request.POST.get("description", "")
 
-            # ✅ CRITICAL FIX
-            if loc.latitude is None or loc.longitude is None:
-                continue
+    # Assignment and fan-out run in the dispatch worker
+    alert, job = enqueue_alert(request.user, lat, lon, address, description)
 
-            distance = calculate_distance(
-                lat, lon, loc.latitude, loc.longitude
-            )
-
-            if distance <= 5:
-                Notification.objects.create(
-                    user=loc.user,
-                    title="🚨 Emergency Nearby",
-                    message="An emergency occurred within 5 km of your location",
-                    latitude=lat,
-                    longitude=lon,
-                    address=address
-                )
+    return JsonResponse({
+        "status": "queued",
+        "alert_id": alert.id,
+        "status_url": reverse("alert_status", args=[alert.id])
+    }, status=202)
 
-        # 6️⃣ Return response
-        return JsonResponse({"status": "success"})
 
-    except Exception as e:
-        print("SEND ALERT ERROR:", e)
-        return JsonResponse({"error": str(e)}, status=500)
+@login_required
+def alert_status(request, alert_id):
+    job = DispatchJob.objects.filter(alert_id=alert_id, alert__user=request.user).first()
+
+    if job is None:
+        return JsonResponse({"error": "Alert not found"}, status=404)
+
+    return JsonResponse({
+        "alert_id": alert_id,
+        "status": job.status,
+        "stages": {
+            "assignment": job.assignment_status,
+            "facilities": job.facility_status,
+            "fanout": job.fanout_status,
+        },
+        "recipients": job.recipients,
+        "attempts": job.attempts,
+        "error": job.error,
+    })
 
 
 
 @login_required
 def reverse_geocode(request):
-    lat = request.GET.get("lat")
-    lon = request.GET.get("lon")
-
-    url = "https://nominatim.openstreetmap.org/reverse"
-    params = {
-        "format": "json",
-        "lat": lat,
-        "lon": lon
-    }
-
-    headers = {
-        "User-Agent": "AccidentAlertSystem/1.0"
-    }
+    try:
+        lat = float(request.GET.get("lat"))
+        lon = float(request.GET.get("lon"))
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Invalid coordinates"}, status=400)
 
-    response = requests.get(url, params=params, headers=headers)
+    address = geocoder.lookup(lat, lon)
 
-    if response.status_code == 200:
-        data = response.json()
+    if address is not None:
         return JsonResponse({
-            "address": data.get("display_name", "Unknown location")
+            "address": address
         })
 
-    return JsonResponse({"error": "Unable to fetch location"}, status=400)
+    # Geocoder unavailable: the coordinates still locate the alert
+    return JsonResponse({
+        "address": f"{lat:.5f}, {lon:.5f}",
+        "degraded": True
+    })
+
+
+@staff_member_required
+def geocode_metrics(request):
+    return JsonResponse({**geocoder.stats.as_dict(), "upstreams": outbound.status()})
 
 @login_required
 def notifications(request):
-    notes = request.user.notifications.order_by("-created_at")
-    request.user.notifications.filter(is_read=False).update(is_read=True)
+    try:
+        notes, next_cursor = inbox_page(
+            request.user,
+            cursor=request.GET.get("cursor"),
+            limit=settings.NOTIFICATIONS_PAGE_SIZE
+        )
+    except ValueError:
+        return redirect("notifications")
+
+    # Only what is on this page counts as read
+    mark_notifications_read(
+        request.user, [n.id for n in notes if not isinstance(n, PolicePublicAlert)]
+    )
+    mark_broadcasts_read(request.user, [n for n in notes if isinstance(n, PolicePublicAlert)])
+
     return render(request, "notifications.html", {
-        "notifications": notes
+        "notifications": notes,
+        "next_cursor": next_cursor
     })
 @login_required
+@cache_control(private=True, no_cache=True)
+@conditional_on(notification_keys, moved_at=inbox_window_moved)
 def notifications_api(request):
-    notes = request.user.notifications.order_by("-created_at")[:50]
+    try:
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 100)
+        notes, next_cursor = inbox_page(
+            request.user, cursor=request.GET.get("cursor"), limit=limit
+        )
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
 
     data = []
     for n in notes:
         data.append({
             "id": n.id,
+            "kind": "broadcast" if isinstance(n, PolicePublicAlert) else "notification",
             "title": n.title,
             "message": n.message,
             "address": n.address,
             "lat": n.latitude,
             "lon": n.longitude,
             "is_read": n.is_read,
+            "photo": photo_urls(n.public_alert) if n.public_alert else None,
             "created_at": n.created_at.strftime("%Y-%m-%d %H:%M:%S")
         })
 
-    return JsonResponse({"notifications": data})
+    return JsonResponse({"notifications": data, "next": next_cursor})
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@conditional_on(notification_keys, moved_at=inbox_window_moved)
 def unread_notifications_count(request):
-    count = request.user.notifications.filter(is_read=False).count()
+    count = unread_notification_count(request.user)
     return JsonResponse({"count": count})
 
 @login_required
@@ -272,21 +306,24 @@ def update_location(request):
         lat = float(lat)
         lon = float(lon)
 
-        for _ in range(3):  # retry to avoid sqlite lock
-            try:
-                with transaction.atomic():
-                    UserLocation.objects.update_or_create(
-                        user=request.user,
-                        defaults={
-                            "latitude": lat,
-                            "longitude": lon,
-                        },
-                    )
-                return JsonResponse({"status": "ok"})
-            except OperationalError:
-                time.sleep(0.2)
-
-        return JsonResponse({"error": "db locked"}, status=500)
+        if settings.LOCATION_BUFFER_ENABLED:
+            # Written by the background flusher in the next batch
+            location_buffer.put(request.user.id, lat, lon)
+            return JsonResponse({"status": "ok"})
+
+        try:
+            UserLocation.objects.update_or_create(
+                user=request.user,
+                defaults={
+                    "latitude": lat,
+                    "longitude": lon,
+                },
+            )
+        except OperationalError:
+            # Busy timeout exceeded; the client simply reports again later
+            return JsonResponse({"error": "db busy"}, status=503)
+
+        return JsonResponse({"status": "ok"})
 
     except Exception as e:
         print("Update location error:", e)
@@ -295,50 +332,116 @@ def update_location(request):
 
 @login_required
 def get_live_locations(request):
-    locations = UserLocation.objects.select_related("user")
-
-    data = []
-    for loc in locations:
-        data.append({
-            "username": loc.user.username,
-            "latitude": loc.latitude,
-            "longitude": loc.longitude
-        })
+    """Users inside ``bbox=south,west,north,east`` at map ``zoom``.
 
-    return JsonResponse({"locations": data})
+    Zoomed in, individual users are returned; zoomed out (or when the box
+    holds more than LIVE_MAP_MAX_POINTS users) they are aggregated into
+    grid clusters with a count and centroid. Individual results carry a
+    ``cursor``; passing it back as ``since`` (same box) returns only users
+    that changed, with ``removed`` listing ids to drop.
+    """
+    try:
+        south, west, north, east = (float(v) for v in request.GET["bbox"].split(","))
+        zoom = int(request.GET.get("zoom", settings.LIVE_MAP_POINTS_ZOOM))
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "bbox=south,west,north,east and zoom are required"}, status=400)
+
+    south, north = max(min(south, north), -90), min(max(south, north), 90)
+    west, east = max(west, -180), min(east, 180)
+    zoom = max(0, min(zoom, 20))
+    if west > east:
+        return JsonResponse({"error": "Invalid bbox"}, status=400)
+
+    if zoom >= settings.LIVE_MAP_POINTS_ZOOM:
+        limit = settings.LIVE_MAP_MAX_POINTS
+        try:
+            delta = locations_feed(south, west, north, east, request.GET.get("since"), limit)
+        except ValueError:
+            return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+        if delta is not None:
+            points, removed, cursor = delta
+            return JsonResponse({
+                "mode": "points", "reset": False, "locations": points,
+                "removed": removed, "clusters": [], "cursor": cursor
+            })
+
+        cursor = location_cursor()  # taken before the read so nothing slips between
+        points = viewport_points(south, west, north, east, limit)
+        if points is not None:
+            return JsonResponse({
+                "mode": "points", "reset": True, "locations": points,
+                "removed": [], "clusters": [], "cursor": cursor
+            })
+
+    return JsonResponse({
+        "mode": "clusters",
+        "reset": True,
+        "locations": [],
+        "removed": [],
+        "clusters": viewport_clusters(south, west, north, east, zoom),
+        "cursor": None
+    })
 
 @login_required
 def map_view(request):
     return render(request, "map.html")
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@conditional_on(alert_keys)
 def alerts_api(request):
-    alerts = Alert.objects.all().order_by("-created_at")[:50]
+    """Latest alerts; with ``since=<cursor>`` only new ones and removed ids."""
+    try:
+        alerts, removed, cursor, reset = alerts_feed(request.GET.get("since"))
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    return JsonResponse({"alerts": alerts, "removed": removed, "cursor": cursor, "reset": reset})
+
 
-    data = []
-    for alert in alerts:
-        data.append({
-            "id": alert.id,
-            "latitude": alert.latitude,
-            "longitude": alert.longitude,
-            "address": alert.address,
-        })
 
-    return JsonResponse({"alerts": data})
 
+@require_POST
+@login_required
+def push_subscribe(request):
+    """Store the browser's PushSubscription (``subscription.toJSON()``)."""
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        endpoint = data["endpoint"]
+        keys = data["keys"]
+        p256dh, auth = keys["p256dh"], keys["auth"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Invalid subscription"}, status=400)
+
+    if not endpoint.startswith("https://") or len(endpoint) > 500:
+        return JsonResponse({"error": "Invalid subscription"}, status=400)
+
+    # The same browser may be signed in as someone else now
+    PushSubscription.objects.update_or_create(
+        endpoint=endpoint,
+        defaults={"user": request.user, "p256dh": p256dh, "auth": auth}
+    )
+    return JsonResponse({"status": "ok"}, status=201)
 
 
+@require_POST
+@login_required
+def push_unsubscribe(request):
+    try:
+        endpoint = json.loads(request.body.decode("utf-8"))["endpoint"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Invalid subscription"}, status=400)
+
+    PushSubscription.objects.filter(user=request.user, endpoint=endpoint).delete()
+    return JsonResponse({"status": "ok"})
 
-def send_push(user, title, message):
-    payload = {
-        "title": title,
-        "body": message
-    }
 
 @require_POST
 @login_required
 def clear_notifications(request):
-    request.user.notifications.all().delete()
+    clear_notifications_for(request.user)
+    clear_broadcasts(request.user)  # also bumps the notifications version
     return redirect('notifications')
 
 
@@ -350,98 +453,89 @@ def nearby_emergency_services(request):
     if not lat or not lon:
         return JsonResponse({"error": "Missing coordinates"}, status=400)
 
-    query = f"""
-    [out:json];
-    (
-      node["amenity"="police"](around:5000,{lat},{lon});
-      node["amenity"="hospital"](around:5000,{lat},{lon});
-    );
-    out body;
-    """
-
-    headers = {
-        "User-Agent": "AccidentAlertSystem/1.0 (contact@example.com)"
-    }
-
-    response = requests.post(
-        "https://overpass-api.de/api/interpreter",
-        data=query,
-        headers=headers,
-        timeout=15
-    )
+    try:
+        lat, lon = float(lat), float(lon)
+    except ValueError:
+        return JsonResponse({"error": "Invalid coordinates"}, status=400)
 
-    # ✅ CHECK STATUS FIRST
-    if response.status_code != 200:
+    try:
+        results = nearby_services(lat, lon)
+    except OverpassError as e:
         return JsonResponse({
-            "error": "Overpass API failed",
-            "status": response.status_code,
-            "response": response.text[:500]
+            "services": [],
+            "error": str(e),
+            "status": e.status,
+            "response": e.body
         }, status=500)
+    except OutboundError as e:
+        # Circuit open or Overpass saturated: fail fast, the map shows nothing
+        return JsonResponse({"services": [], "degraded": True, "error": str(e)}, status=503)
+    except requests.RequestException as e:
+        return JsonResponse({"services": [], "error": "Overpass API failed", "response": str(e)}, status=500)
+
+    return JsonResponse({"services": results})
+
 
-    # ✅ SAFE JSON PARSE
+
+def _dashboard_context(request, role, facility):
     try:
-        data = response.json()
+        filters = parse_filters(request.GET)
     except ValueError:
-        return JsonResponse({
-            "error": "Invalid JSON from Overpass API",
-            "raw": response.text[:500]
-        }, status=500)
-
-    results = []
-    for item in data.get("elements", []):
-        results.append({
-            "name": item.get("tags", {}).get("name", "Unknown"),
-            "type": item.get("tags", {}).get("amenity"),
-            "latitude": item.get("lat"),
-            "longitude": item.get("lon"),
-            "address": item.get("tags", {}).get("addr:full", "")
-        })
+        messages.error(request, "Invalid filter, showing active cases")
+        filters = parse_filters({})
 
-    return JsonResponse({"services": results})
+    assignments = assignments_for(role, facility)
+    # Issued before the page is read so the first poll cannot miss a change
+    cursor = changes_cursor()
 
+    try:
+        page, next_cursor = dashboard_page(apply_filters(assignments, filters), request.GET.get("cursor"))
+    except ValueError:
+        page, next_cursor = dashboard_page(apply_filters(assignments, filters))
+
+    query = request.GET.copy()
+    query.pop("cursor", None)
+
+    return {
+        "assignments": page,
+        "next_cursor": next_cursor,
+        "first_page": not request.GET.get("cursor"),
+        "filters": filters,
+        "filter_query": query.urlencode(),
+        "status_filters": STATUS_FILTERS,
+        "stats": dashboard_stats(assignments),
+        "changes_cursor": cursor,
+    }
 
 
 @login_required
 def police_dashboard(request):
-    if request.user.userprofile.role != "police":
+    if not request.actor.is_police:
         return redirect("home")
 
-    police = PoliceStation.objects.get(user=request.user)
-
-    alerts = AlertAssignment.objects.select_related(
-        "alert", "alert__user"
-    ).filter(
-        Q(police=police) | Q(police__isnull=True)
-    ).order_by("-created_at")
+    police = request.actor.facility
 
-    return render(request, "police_dashboard.html", {
-        "alerts": alerts
-    })
+    return render(request, "police_dashboard.html", _dashboard_context(request, "police", police))
 
 
 @login_required
 def police_broadcast(request, assignment_id):
     assignment = AlertAssignment.objects.select_related("alert").get(id=assignment_id)
 
-    if request.user.userprofile.role != "police":
+    if not request.actor.is_police:
         return redirect("home")
 
     message = request.POST.get("message")
-    lat = assignment.alert.latitude
-    lon = assignment.alert.longitude
-
-    nearby_users = UserLocation.objects.exclude(user=request.user)
-
-    for loc in nearby_users:
-        if calculate_distance(lat, lon, loc.latitude, loc.longitude) <= 5:
-            Notification.objects.create(
-                user=loc.user,
-                title="🚔 Police Alert",
-                message=message,
-                latitude=lat,
-                longitude=lon,
-                address=assignment.alert.address
-            )
+    police = request.actor.facility
+
+    publish_broadcast(
+        police,
+        title="🚔 Police Alert",
+        message=message,
+        latitude=assignment.alert.latitude,
+        longitude=assignment.alert.longitude,
+        address=assignment.alert.address
+    )
 
     messages.success(request, "Alert broadcast sent")
     return redirect("police_dashboard")
@@ -450,7 +544,7 @@ def police_broadcast(request, assignment_id):
 def resolve_alert(request, assignment_id):
     assignment = AlertAssignment.objects.get(id=assignment_id)
 
-    if request.user.userprofile.role != "police":
+    if not request.actor.is_police:
         return redirect("home")
 
     assignment.status = "resolved"
@@ -459,8 +553,8 @@ def resolve_alert(request, assignment_id):
     assignment.alert.status = "resolved"
     assignment.alert.save()
 
-    Notification.objects.create(
-        user=assignment.alert.user,
+    notify_user(
+        assignment.alert.user_id,
         title="✅ Case Resolved",
         message="Police have resolved your complaint",
         latitude=assignment.alert.latitude,
@@ -473,41 +567,45 @@ def resolve_alert(request, assignment_id):
 
 @login_required
 def hospital_dashboard(request):
-    profile = request.user.userprofile
-
-    if profile.role != "hospital":
+    if not request.actor.is_hospital:
         return redirect("home")
 
-    hospital = Hospital.objects.get(user=request.user)
-
-    assignments = AlertAssignment.objects.select_related(
-        "alert", "alert__user"
-    ).filter(hospital=hospital).order_by("-created_at")
-
-    return render(request, "hospital_dashboard.html", {
-        "assignments": assignments,
-        "hospital": hospital
-    })
+    hospital = request.actor.facility
 
+    context = _dashboard_context(request, "hospital", hospital)
+    context["hospital"] = hospital
+    return render(request, "hospital_dashboard.html", context)
 
-def get_nearest_police_and_hospital(lat, lon):
-    police_list = PoliceStation.objects.all()
-    hospital_list = Hospital.objects.all()
 
-    if not police_list.exists() or not hospital_list.exists():
-        raise Exception("No police or hospital registered")
+@login_required
+def dashboard_changes(request):
+    """Assignments changed since ``cursor``, as rendered rows for the open dashboard."""
+    role, facility = request.actor.role, request.actor.facility
+    if facility is None:
+        return JsonResponse({"error": "Not allowed"}, status=403)
 
-    nearest_police = min(
-        police_list,
-        key=lambda p: calculate_distance(lat, lon, p.latitude, p.longitude)
-    )
+    try:
+        filters = parse_filters(request.GET)
+        changed, cursor, reset = changes_since(
+            assignments_for(role, facility), request.GET.get("cursor")
+        )
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor or filter"}, status=400)
 
-    nearest_hospital = min(
-        hospital_list,
-        key=lambda h: calculate_distance(lat, lon, h.latitude, h.longitude)
-    )
+    row_template = f"{role}_assignment.html"
+    data = []
+    for a in changed:
+        data.append({
+            "id": a.id,
+            "status": a.status,
+            "latitude": a.alert.latitude,
+            "longitude": a.alert.longitude,
+            "address": a.alert.address,
+            "matches": matches_filters(a, filters),
+            "html": render_to_string(row_template, {"a": a}, request=request)
+        })
 
-    return nearest_police, nearest_hospital
+    return JsonResponse({"assignments": data, "cursor": cursor, "reset": reset})
 
 
 def hospital_register(request):
@@ -584,7 +682,7 @@ def police_register(request):
 
 @login_required
 def police_general_broadcast(request):
-    if request.user.userprofile.role != "police":
+    if not request.actor.is_police:
         return redirect("home")
 
     if request.method != "POST":
@@ -592,39 +690,27 @@ def police_general_broadcast(request):
 
     message = request.POST.get("message")
 
-    police = PoliceStation.objects.get(user=request.user)
-    lat = police.latitude
-    lon = police.longitude
-
-    nearby_users = UserLocation.objects.exclude(user=request.user)
-
-    sent = 0
-    for loc in nearby_users:
-        if loc.latitude is None or loc.longitude is None:
-            continue
-
-        if calculate_distance(lat, lon, loc.latitude, loc.longitude) <= 5:
-            Notification.objects.create(
-                user=loc.user,
-                title="🚔 Police Public Alert",
-                message=message,
-                latitude=lat,
-                longitude=lon,
-                address=f"Near {police.station_name}"
-                
-            )
-            sent += 1
+    police = request.actor.facility
+
+    publish_broadcast(
+        police,
+        title="🚔 Police Public Alert",
+        message=message,
+        latitude=police.latitude,
+        longitude=police.longitude,
+        address=f"Near {police.station_name}"
+    )
 
     messages.success(
         request,
-        f"Broadcast sent to {sent} users within 5 km"
+        "Broadcast sent to users within 5 km"
     )
 
     return redirect("police_dashboard")
 
 @login_required
 def police_missing_person_broadcast(request):
-    if request.user.userprofile.role != "police":
+    if not request.actor.is_police:
         return redirect("home")
 
     if request.method != "POST":
@@ -634,36 +720,22 @@ def police_missing_person_broadcast(request):
     address = request.POST.get("address")
     photo = request.FILES.get("photo")
 
-    police = PoliceStation.objects.get(user=request.user)
-    lat, lon = police.latitude, police.longitude
+    police = request.actor.facility
 
-    # Save alert
-    alert = PolicePublicAlert.objects.create(
-        police=police,
-        message=message,
-        address=address,
-        photo=photo,
-        latitude=lat,
-        longitude=lon
-    )
-
-    # Notify users within 5 KM
-    nearby_users = UserLocation.objects.exclude(user=request.user)
-
-    for loc in nearby_users:
-        if loc.latitude is None or loc.longitude is None:
-            continue
-
-        if calculate_distance(lat, lon, loc.latitude, loc.longitude) <= 5:
-            Notification.objects.create(
-                user=loc.user,
-                title="🚔 Missing Person Alert",
-                message=message,
-                latitude=lat,
-                longitude=lon,
-                address=address,
-                public_alert=alert
-            )
+    # Save alert and notify users within 5 KM
+    try:
+        publish_broadcast(
+            police,
+            title="🚔 Missing Person Alert",
+            message=message,
+            latitude=police.latitude,
+            longitude=police.longitude,
+            address=address,
+            photo=photo
+        )
+    except InvalidImage:
+        messages.error(request, "❌ The photo must be a JPEG, PNG, WebP or GIF image")
+        return redirect("police_dashboard")
 
     messages.success(request, "🚨 Missing person alert sent successfully")
     return redirect("police_dashboard")
@@ -0,0 +1,40 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup(database=True):
+    """Configure Django on a fresh copy of the schema and an empty MEDIA_ROOT.
+
+    Both are removed at exit. Pass ``database=False`` to skip the schema.
+    """
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix="accident-bench-media-")
+    atexit.register(shutil.rmtree, settings.MEDIA_ROOT, ignore_errors=True)
+    if not database:
+        return
+
+    from django.db import connection
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    atexit.register(connection.creation.destroy_test_db, old_name, verbosity=0)
+
+
+def timed(fn, repeat=1):
+    """Mean wall time of ``fn()`` over ``repeat`` runs, in seconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
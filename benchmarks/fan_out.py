@@ -0,0 +1,43 @@
+"""Writing one Notification per recipient: per-row create vs fan_out_notifications.
+
+    python -m benchmarks.fan_out
+"""
+from benchmarks.common import setup, timed
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from Alert_system.models import Notification, UserProfile  # noqa: E402
+from Alert_system.services import fan_out_notifications  # noqa: E402
+
+
+def per_row(user_ids):
+    # What the views did before fan_out_notifications
+    for user_id in user_ids:
+        Notification.objects.create(
+            user_id=user_id, title="🚨 Emergency Nearby", message="Nearby", latitude=17.4, longitude=78.5
+        )
+
+
+def main():
+    for n in (1_000, 10_000):
+        User.objects.all().delete()
+        users = User.objects.bulk_create([User(username=f"user{i}") for i in range(n)], batch_size=1000)
+        UserProfile.objects.bulk_create([UserProfile(user=user, role="user") for user in users], batch_size=1000)
+        user_ids = [user.id for user in users]
+
+        slow = timed(lambda: per_row(user_ids))
+        Notification.objects.all().delete()
+
+        bulk = timed(lambda: fan_out_notifications(
+            user_ids, "🚨 Emergency Nearby", "Nearby", latitude=17.4, longitude=78.5, push=False
+        ))
+        assert Notification.objects.count() == n
+
+        print(f"{n:>6} recipients: per-row create {slow:6.2f} s   fan_out_notifications {bulk:5.2f} s")
+        Notification.objects.all().delete()
+
+
+if __name__ == "__main__":
+    main()
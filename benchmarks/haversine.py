@@ -0,0 +1,38 @@
+"""Vectorized haversine vs calling calculate_distance in a loop.
+
+    python -m benchmarks.haversine
+
+One origin to N random points. Needs no database.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Alert_system.utils import calculate_distance, calculate_distances  # noqa: E402
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    for n in (1_000, 100_000, 1_000_000):
+        lats, lons = rng.uniform(10, 25, n), rng.uniform(70, 85, n)
+        lat_list, lon_list = lats.tolist(), lons.tolist()
+
+        start = time.perf_counter()
+        scalar = [calculate_distance(17.4, 78.5, lat, lon) for lat, lon in zip(lat_list, lon_list)]
+        loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vector = calculate_distances(17.4, 78.5, lats, lons)
+        vectorized = time.perf_counter() - start
+
+        assert np.allclose(scalar, vector)
+        print(f"{n:>9} points: loop {loop * 1000:8.1f} ms   vectorized {vectorized * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
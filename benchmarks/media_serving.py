@@ -0,0 +1,61 @@
+"""Serving an uploaded photo: django.views.static.serve vs serve_media.
+
+    python -m benchmarks.media_serving
+
+In-process (RequestFactory, no network), so it measures the view's own
+cost per request and the bytes it would put on the wire.
+"""
+import hashlib
+import os
+
+from benchmarks.common import setup, timed
+
+setup(database=False)
+
+from django.conf import settings  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.views.static import serve  # noqa: E402
+
+from Alert_system.media import serve_media  # noqa: E402
+
+REQUESTS = 400
+
+
+def body_size(response):
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    response.close()
+    return size
+
+
+def main():
+    # ~512 KB, the size of a typical missing-person photo upload
+    data = os.urandom(512 * 1024)
+    sha256 = hashlib.sha256(data).hexdigest()
+    name = f"missing_persons/{sha256[:2]}/{sha256}.png"
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+    factory = RequestFactory()
+    etag = serve_media(factory.get("/media/" + name), name)["ETag"]
+
+    cases = [
+        ("static.serve, full GET", lambda: serve(factory.get("/"), name, document_root=settings.MEDIA_ROOT)),
+        ("serve_media, full GET", lambda: serve_media(factory.get("/"), name)),
+        ("serve_media, If-None-Match", lambda: serve_media(factory.get("/", HTTP_IF_NONE_MATCH=etag), name)),
+        ("serve_media, 64 KB Range", lambda: serve_media(factory.get("/", HTTP_RANGE="bytes=0-65535"), name)),
+    ]
+    for label, request in cases:
+        for _ in range(20):  # warm the page cache
+            body_size(request())
+        sizes = []
+        seconds = timed(lambda: sizes.append(body_size(request())), repeat=REQUESTS)
+        print(f"{label:28s} {1 / seconds:8.0f} req/s   {sizes[0] / 1024:6.1f} KB per response")
+
+
+if __name__ == "__main__":
+    main()
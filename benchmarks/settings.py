@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+from Accedent_alert.settings import *  # noqa: F401,F403
+from Accedent_alert.settings import DATABASES
+
+# Benchmarks run against a throwaway database (see benchmarks.common.setup),
+# kept on disk so several connections can share it
+DATABASES["default"]["TEST"] = {"NAME": os.path.join(tempfile.gettempdir(), "accident_bench.sqlite3")}
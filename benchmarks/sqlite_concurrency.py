@@ -0,0 +1,105 @@
+"""Location writes under a concurrent notification fan-out, on SQLite.
+
+    python -m benchmarks.sqlite_concurrency
+
+8 threads each upsert 150 UserLocation rows while another thread fans out
+1,000 notifications in a loop. Run once with SQLite's defaults (rollback
+journal, 0.2 s lock timeout, a connection per request) and once with the
+project's profile (SQLITE_PRAGMAS, 20 s timeout, IMMEDIATE transactions,
+persistent connections).
+"""
+import threading
+import time
+
+from benchmarks.common import setup
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import OperationalError, connection, connections  # noqa: E402
+
+from Alert_system.models import Notification, UserLocation  # noqa: E402
+from Alert_system.services import fan_out_notifications  # noqa: E402
+
+THREADS = 8
+WRITES = 150
+
+DEFAULTS = {
+    "pragmas": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "options": {"timeout": 0.2},
+    "persistent": False,
+}
+PROFILE = {
+    "pragmas": settings.SQLITE_PRAGMAS,
+    "options": settings.DATABASES["default"]["OPTIONS"],
+    "persistent": True,
+}
+
+
+def configure(profile):
+    connections.close_all()
+    settings.SQLITE_PRAGMAS = profile["pragmas"]
+    connection.settings_dict["OPTIONS"] = profile["options"]
+
+
+def run(profile, user_ids):
+    configure(profile)
+    UserLocation.objects.all().delete()
+
+    latencies, errors = [], [0]
+    stop = threading.Event()
+
+    def writer(k):
+        for user_id in user_ids[k * WRITES:(k + 1) * WRITES]:
+            start = time.perf_counter()
+            try:
+                UserLocation.objects.update_or_create(
+                    user_id=user_id, defaults={"latitude": 17.4, "longitude": 78.5}
+                )
+            except OperationalError:
+                errors[0] += 1
+            latencies.append(time.perf_counter() - start)
+            if not profile["persistent"]:
+                connection.close()
+        connection.close()
+
+    def fan_out():
+        while not stop.is_set():
+            try:
+                fan_out_notifications(user_ids[:1000], "Alert", "Nearby", push=False)
+            except OperationalError:
+                errors[0] += 1
+        connection.close()
+
+    background = threading.Thread(target=fan_out)
+    background.start()
+    writers = [threading.Thread(target=writer, args=(k,)) for k in range(THREADS)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    background.join()
+
+    Notification.objects.all().delete()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], errors[0]
+
+
+def main():
+    if connection.vendor != "sqlite":
+        raise SystemExit("This benchmark needs the SQLite database (DEBUG settings)")
+
+    users = User.objects.bulk_create(
+        [User(username=f"user{i}") for i in range(THREADS * WRITES)], batch_size=1000
+    )
+    user_ids = [user.id for user in users]
+
+    for label, profile in (("sqlite defaults", DEFAULTS), ("project profile", PROFILE)):
+        p50, p99, errors = run(profile, user_ids)
+        print(f"{label}: p50 {p50 * 1000:6.1f} ms   p99 {p99 * 1000:6.1f} ms   lock errors {errors}")
+
+
+if __name__ == "__main__":
+    main()
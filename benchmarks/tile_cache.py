@@ -0,0 +1,76 @@
+"""Nearby emergency services answered from the tile cache.
+
+    python -m benchmarks.tile_cache
+
+Overpass is replaced by a fake client that returns a few hundred services
+per tile, so this measures the cache and the view, not the network: a hit
+in the in-process LRU, a hit in the EmergencyTile table after a restart,
+and the whole view on a warm tile.
+"""
+import numpy as np
+
+from benchmarks.common import setup, timed
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from Alert_system.emergency import nearby_services, tile_cache  # noqa: E402
+from Alert_system.views import nearby_emergency_services  # noqa: E402
+
+SERVICES_PER_TILE = 300
+REQUESTS = 500
+LAT, LON = 17.40, 78.50
+
+
+class FakeOverpass:
+    def __init__(self):
+        self.fetches = 0
+
+    def fetch(self, lat_min, lat_max, lon_min, lon_max):
+        self.fetches += 1
+        rng = np.random.default_rng(self.fetches)
+        return [
+            {
+                "name": f"Service {i}",
+                "type": "police" if i % 2 else "hospital",
+                "latitude": float(lat),
+                "longitude": float(lon),
+                "address": "",
+            }
+            for i, (lat, lon) in enumerate(zip(
+                rng.uniform(lat_min, lat_max, SERVICES_PER_TILE),
+                rng.uniform(lon_min, lon_max, SERVICES_PER_TILE),
+            ))
+        ]
+
+
+def main():
+    client = FakeOverpass()
+    tile_cache.set_client(client)
+    nearby_services(LAT, LON)  # fetch and store the tile once
+
+    def from_table():
+        tile_cache.clear()
+        nearby_services(LAT, LON)
+
+    request = RequestFactory().get("/nearby/", {"lat": LAT, "lon": LON})
+    request.user = User.objects.create(username="bench")
+
+    cases = [
+        ("memory LRU hit", lambda: nearby_services(LAT, LON)),
+        ("EmergencyTile row hit", from_table),
+        ("view, warm tile", lambda: nearby_emergency_services(request)),
+    ]
+    for label, run in cases:
+        for _ in range(20):
+            run()
+        seconds = timed(run, repeat=REQUESTS)
+        print(f"{label:24s} {seconds * 1000:6.2f} ms per lookup")
+
+    assert client.fetches == 1, "a cached lookup reached Overpass"
+
+
+if __name__ == "__main__":
+    main()
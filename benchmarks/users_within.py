@@ -0,0 +1,49 @@
+"""users_within: grid-cell lookup vs scanning every UserLocation.
+
+    python -m benchmarks.users_within
+
+Users are spread uniformly over a 15x15 degree area; one 5 km query.
+"""
+import random
+
+from benchmarks.common import setup, timed
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from Alert_system.models import UserLocation  # noqa: E402
+from Alert_system.services import users_within  # noqa: E402
+from Alert_system.utils import calculate_distance, grid_cell  # noqa: E402
+
+
+def full_scan(lat, lon, radius_km):
+    # What send_alert did before the grid index
+    return [
+        loc.user_id for loc in UserLocation.objects.all()
+        if calculate_distance(lat, lon, loc.latitude, loc.longitude) <= radius_km
+    ]
+
+
+def main():
+    rng = random.Random(1)
+
+    for n in (1_000, 10_000, 50_000):
+        UserLocation.objects.all().delete()
+        User.objects.all().delete()
+
+        users = User.objects.bulk_create([User(username=f"user{i}") for i in range(n)], batch_size=1000)
+        locations = []
+        for user in users:
+            lat, lon = rng.uniform(10, 25), rng.uniform(70, 85)
+            locations.append(UserLocation(user=user, latitude=lat, longitude=lon, cell=grid_cell(lat, lon)))
+        UserLocation.objects.bulk_create(locations, batch_size=1000)
+
+        assert sorted(users_within(17.4, 78.5, 5)) == sorted(full_scan(17.4, 78.5, 5))
+        grid = timed(lambda: users_within(17.4, 78.5, 5), repeat=20)
+        scan = timed(lambda: full_scan(17.4, 78.5, 5), repeat=3)
+        print(f"{n:>6} users: grid {grid * 1000:6.1f} ms   full scan {scan * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
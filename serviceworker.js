@@ -1,19 +1,55 @@
+// Rendered by the `serviceworker` view: the app-shell URLs carry the
+// collectstatic content hash, so a new deploy means a new cache.
+const CACHE_NAME = "app-shell-{{ cache_version }}";
+const APP_SHELL = {{ app_shell }};
+
+self.addEventListener("install", function (event) {
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.addAll(APP_SHELL))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener("activate", function (event) {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key.startsWith("app-shell-") && key !== CACHE_NAME)
+                    .map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+// App shell: cache first. Everything else (pages, APIs) goes to the network.
+self.addEventListener("fetch", function (event) {
+    const url = new URL(event.request.url);
+    if (event.request.method !== "GET" || url.origin !== self.location.origin) return;
+    if (!APP_SHELL.includes(url.pathname)) return;
+
+    event.respondWith(
+        caches.match(url.pathname, { cacheName: CACHE_NAME })
+            .then(cached => cached || fetch(event.request))
+    );
+});
+
 self.addEventListener("push", function (event) {
     const data = event.data ? event.data.json() : {};
 
-    self.registration.showNotification(
+    event.waitUntil(self.registration.showNotification(
         data.title || "🚨 Emergency Alert",
         {
             body: data.body || "Emergency nearby!",
-            icon: "/static/images/alert.png",
-            badge: "/static/images/alert.png",
+            icon: "{{ alert_icon }}",
+            badge: "{{ alert_icon }}",
             vibrate: [500, 200, 500, 200, 800],
             requireInteraction: true,
             data: {
-                url: "/notifications/"
+                url: data.url || "/notifications/"
             }
         }
-    );
+    ));
 });
 
 self.addEventListener("notificationclick", function (event) {
@@ -0,0 +1,40 @@
+// ================= DASHBOARD LIVE UPDATES =================
+// Polls the changes feed and patches rows in place instead of reloading
+// the page. Rows that no longer match the filters are removed; new ones
+// are only inserted on the first page.
+function watchDashboard({ url, cursor, list, firstPage, interval = 10000, onChange }) {
+    const separator = url.includes("?") ? "&" : "?";
+
+    async function poll() {
+        try {
+            const res = await fetch(`${url}${separator}cursor=${encodeURIComponent(cursor)}`);
+            if (!res.ok) return;
+
+            const data = await res.json();
+            if (data.reset) {
+                location.reload();
+                return;
+            }
+            cursor = data.cursor;
+
+            data.assignments.forEach(change => {
+                const row = document.getElementById(`assignment-${change.id}`);
+
+                if (!change.matches) {
+                    row?.remove();
+                } else if (row) {
+                    row.outerHTML = change.html;
+                } else if (firstPage) {
+                    list.querySelector(".empty")?.remove();
+                    list.insertAdjacentHTML("afterbegin", change.html);
+                }
+
+                if (onChange) onChange(change);
+            });
+        } catch (err) {
+            console.error("Dashboard update error:", err);
+        }
+    }
+
+    setInterval(poll, interval);
+}
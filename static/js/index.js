@@ -142,15 +142,43 @@ function autoSubmitAlert() {
         },
         body: fd
     })
-    .then(res => res.json())
-    .then(() => {
-        alert("🚨 Emergency alert sent successfully!");
+    .then(res => {
+        if (!res.ok) throw new Error(res.status);
+        return res.json();
+    })
+    .then(data => {
+        alert("🚨 Emergency alert queued – notifying responders…");
+        watchAlertStatus(data.status_url);
     })
     .catch(() => {
         alert("❌ Failed to send emergency alert");
     });
 }
 
+// ================= ALERT DISPATCH STATUS =================
+// The server answers 202 before the alert is dispatched; poll until the
+// worker has finished with it
+function watchAlertStatus(statusUrl, triesLeft = 30) {
+    if (!statusUrl) return;
+
+    setTimeout(() => {
+        fetch(statusUrl)
+        .then(res => res.json())
+        .then(job => {
+            if (job.status === "done") {
+                alert(`✅ Emergency alert sent to responders and ${job.recipients} nearby users`);
+            } else if (job.status === "failed") {
+                alert("❌ Emergency alert could not be dispatched, please call emergency services");
+            } else if (triesLeft > 1) {
+                watchAlertStatus(statusUrl, triesLeft - 1);
+            }
+        })
+        .catch(() => {
+            if (triesLeft > 1) watchAlertStatus(statusUrl, triesLeft - 1);
+        });
+    }, 2000);
+}
+
 // ================= MANUAL FORM SUBMIT =================
 document.addEventListener("DOMContentLoaded", () => {
     const form = document.getElementById("alertForm");
@@ -169,11 +197,18 @@ document.addEventListener("DOMContentLoaded", () => {
             headers: { "X-CSRFToken": getCookie("csrftoken") },
             body: fd
         })
-        .then(r => r.json())
-        .then(() => {
-            alert("✅ Emergency alert sent!");
+        .then(r => {
+            if (!r.ok) throw new Error(r.status);
+            return r.json();
+        })
+        .then(data => {
+            alert("🚨 Emergency alert queued – notifying responders…");
             closeAlertForm();
             form.reset();
+            watchAlertStatus(data.status_url);
+        })
+        .catch(() => {
+            alert("❌ Failed to send emergency alert");
         });
     });
 });
@@ -196,11 +231,15 @@ function showEmergencyNotification(title, message) {
     }
 }
 
-// ================= POLL ALERTS =================
+// ================= POLL ALERTS (fallback) =================
+let alertsCursor = null;
+
 function checkForEmergencyAlerts() {
-    fetch("/alerts/")
-        .then(r => r.json())
+    const url = alertsCursor ? `/alerts/?since=${alertsCursor}` : "/alerts/";
+
+    fetchJsonWithValidators(url)
         .then(data => {
+            alertsCursor = data.cursor;
             if (!data.alerts?.length) return;
 
             const latest = data.alerts[0];
@@ -214,7 +253,19 @@ function checkForEmergencyAlerts() {
         });
 }
 
-setInterval(checkForEmergencyAlerts, 5000);
+// ================= PUSHED ALERTS =================
+connectRealtime({
+    onMessage: event => {
+        if (event.type === "alert" && lastAlertId !== event.id) {
+            lastAlertId = event.id;
+            showEmergencyNotification("🚨 Emergency Alert Nearby", event.address);
+        } else if (event.type === "notification") {
+            showEmergencyNotification(event.title, event.message);
+        }
+    },
+    poll: checkForEmergencyAlerts,
+    pollInterval: 5000
+});
 
 // ================= NOTIFICATION PERMISSION =================
 if ("Notification" in window && Notification.permission !== "granted") {
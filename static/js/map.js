@@ -8,7 +8,7 @@ L.tileLayer("https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png", {
 
 // ================= MARKER STORAGE =================
 let userMarkers = {};
-let alertMarkers = [];
+let alertMarkers = {};
 let serviceMarkers = [];
 
 // ================= ICONS =================
@@ -43,17 +43,70 @@ const hospitalIcon = L.divIcon({
 
 
 // ================= LIVE USER LOCATIONS =================
+// Only the visible area is requested; zoomed out, the server sends
+// clusters (count + centroid) instead of one marker per user. Zoomed in,
+// later polls pass the returned cursor and receive only what changed.
+let clusterMarkers = [];
+let locationsCursor = null;
+
+function clusterIcon(count) {
+    const size = count < 10 ? 30 : count < 100 ? 38 : 46;
+    return L.divIcon({
+        html: `<div style="width:${size}px;height:${size}px;line-height:${size}px;border-radius:50%;background:rgba(37,99,235,0.8);color:#fff;text-align:center;font-weight:bold;">${count}</div>`,
+        className: "",
+        iconSize: [size, size]
+    });
+}
+
+function removeUserMarker(id) {
+    if (userMarkers[id]) {
+        map.removeLayer(userMarkers[id]);
+        delete userMarkers[id];
+    }
+}
+
 function fetchLocations() {
-    fetch("/live-locations/")
+    const b = map.getBounds();
+    const bbox = [b.getSouth(), b.getWest(), b.getNorth(), b.getEast()]
+        .map(v => v.toFixed(5)).join(",");
+
+    let url = `/live-locations/?bbox=${bbox}&zoom=${map.getZoom()}`;
+    if (locationsCursor) url += `&since=${locationsCursor}`;
+
+    fetch(url)
         .then(res => res.json())
         .then(data => {
+            locationsCursor = data.cursor;
+
+            clusterMarkers.forEach(m => map.removeLayer(m));
+            clusterMarkers = [];
+
+            data.clusters.forEach(cluster => {
+                const marker = L.marker(
+                    [cluster.latitude, cluster.longitude],
+                    { icon: clusterIcon(cluster.count) }
+                )
+                .addTo(map)
+                .bindPopup(`👥 <b>${cluster.count}</b> users here`);
+
+                clusterMarkers.push(marker);
+            });
+
+            if (data.reset) {
+                const keep = new Set(data.locations.map(user => String(user.id)));
+                Object.keys(userMarkers).forEach(id => {
+                    if (!keep.has(id)) removeUserMarker(id);
+                });
+            }
+            data.removed.forEach(removeUserMarker);
+
             data.locations.forEach(user => {
                 const latlng = [user.latitude, user.longitude];
 
-                if (userMarkers[user.username]) {
-                    userMarkers[user.username].setLatLng(latlng);
+                if (userMarkers[user.id]) {
+                    userMarkers[user.id].setLatLng(latlng);
                 } else {
-                    userMarkers[user.username] = L.marker(latlng, {
+                    userMarkers[user.id] = L.marker(latlng, {
                         icon: userIcon
                     })
                     .addTo(map)
@@ -65,15 +118,30 @@ function fetchLocations() {
 }
 
 // ================= EMERGENCY ALERTS =================
+let alertsCursor = null;
+
 function fetchAlerts() {
-    fetch("/alerts/")
-        .then(res => res.json())
+    const url = alertsCursor ? `/alerts/?since=${alertsCursor}` : "/alerts/";
+
+    fetchJsonWithValidators(url)
         .then(data => {
-            alertMarkers.forEach(marker => map.removeLayer(marker));
-            alertMarkers = [];
+            alertsCursor = data.cursor;
+
+            if (data.reset) {
+                Object.values(alertMarkers).forEach(marker => map.removeLayer(marker));
+                alertMarkers = {};
+            }
+            data.removed.forEach(id => {
+                if (alertMarkers[id]) {
+                    map.removeLayer(alertMarkers[id]);
+                    delete alertMarkers[id];
+                }
+            });
 
             data.alerts.forEach(alert => {
-                const marker = L.marker(
+                if (alertMarkers[alert.id]) return;
+
+                alertMarkers[alert.id] = L.marker(
                     [alert.latitude, alert.longitude],
                     { icon: alertIcon }
                 )
@@ -82,8 +150,6 @@ function fetchAlerts() {
                     🚨 <b>Emergency Alert</b><br>
                     ${alert.address}
                 `);
-
-                alertMarkers.push(marker);
             });
         })
         .catch(err => console.error("Alert fetch error:", err));
@@ -147,4 +213,16 @@ fetchAlerts();
 
 // ================= AUTO REFRESH =================
 setInterval(fetchLocations, 30000);  // users every 30s
-setInterval(fetchAlerts, 15000);     // alerts every 15s
+map.on("moveend", () => {            // and whenever the viewport changes
+    locationsCursor = null;          // a cursor only covers the box it was issued for
+    fetchLocations();
+});
+
+// Alerts are pushed; poll every 15s only while the socket is down
+connectRealtime({
+    onMessage: event => {
+        if (event.type === "alert") fetchAlerts();
+    },
+    poll: fetchAlerts,
+    pollInterval: 15000
+});
@@ -1,6 +1,38 @@
-if ("serviceWorker" in navigator && "PushManager" in window) {
-    navigator.serviceWorker.register("/static/js/sw.js")
+// ================= WEB PUSH (alerts while the tab is closed) =================
+function urlBase64ToUint8Array(base64String) {
+    const padding = "=".repeat((4 - base64String.length % 4) % 4);
+    const base64 = (base64String + padding).replace(/-/g, "+").replace(/_/g, "/");
+    const raw = atob(base64);
+    return Uint8Array.from(raw, c => c.charCodeAt(0));
+}
+
+async function subscribeToPush(reg) {
+    if (!window.VAPID_PUBLIC_KEY) return;
+    if (await Notification.requestPermission() !== "granted") return;
+
+    const subscription = await reg.pushManager.getSubscription()
+        || await reg.pushManager.subscribe({
+            userVisibleOnly: true,
+            applicationServerKey: urlBase64ToUint8Array(window.VAPID_PUBLIC_KEY)
+        });
+
+    // Sent on every load so the server follows key rotation and re-logins
+    await fetch("/push/subscribe/", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": getCookie("csrftoken")
+        },
+        body: JSON.stringify(subscription.toJSON())
+    });
+}
+
+// The worker also caches the app shell, so register it even without push
+if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.register("/serviceworker.js")
         .then(reg => {
             console.log("Service Worker Registered");
-        });
+            if ("PushManager" in window) return subscribeToPush(reg);
+        })
+        .catch(err => console.log("Push subscription failed:", err));
 }
@@ -0,0 +1,116 @@
+// ================= REALTIME (WebSocket push, polling fallback) =================
+// Opens /ws/notifications/ and hands every pushed event to onMessage.
+// While the socket is down, `poll` runs every `pollInterval` ms instead.
+// The browser position is reported to the server so area broadcasts reach
+// this client, and area events outside their exact radius are dropped.
+function distanceKm(lat1, lon1, lat2, lon2) {
+    const rad = Math.PI / 180;
+    const dLat = (lat2 - lat1) * rad;
+    const dLon = (lon2 - lon1) * rad;
+    const a = Math.sin(dLat / 2) ** 2 +
+        Math.cos(lat1 * rad) * Math.cos(lat2 * rad) * Math.sin(dLon / 2) ** 2;
+    return 2 * 6371 * Math.asin(Math.sqrt(a));
+}
+
+function connectRealtime({ onMessage, poll = null, pollInterval = 5000 }) {
+    let socket = null;
+    let pollTimer = null;
+    let retryDelay = 1000;
+    let position = null;
+
+    function send(data) {
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify(data));
+        }
+    }
+
+    function reportLocation() {
+        if (position) send({ type: "location", lat: position.lat, lon: position.lon });
+    }
+
+    function outsideArea(event) {
+        if (!event.area || !position) return false;
+        return distanceKm(
+            position.lat, position.lon, event.area.lat, event.area.lon
+        ) > event.area.radius_km;
+    }
+
+    function startPolling() {
+        if (!poll || pollTimer) return;
+        poll();
+        pollTimer = setInterval(poll, pollInterval);
+    }
+
+    function stopPolling() {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+
+    function open() {
+        if (!("WebSocket" in window)) {
+            startPolling();
+            return;
+        }
+
+        const scheme = location.protocol === "https:" ? "wss" : "ws";
+        socket = new WebSocket(`${scheme}://${location.host}/ws/notifications/`);
+
+        socket.onopen = () => {
+            retryDelay = 1000;
+            stopPolling();
+            reportLocation();
+        };
+
+        socket.onmessage = e => {
+            try {
+                const event = JSON.parse(e.data);
+                if (!outsideArea(event)) onMessage(event);
+            } catch (err) {
+                console.error("Realtime message error:", err);
+            }
+        };
+
+        socket.onclose = () => {
+            startPolling();
+            setTimeout(open, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    }
+
+    if (navigator.geolocation) {
+        navigator.geolocation.watchPosition(pos => {
+            position = { lat: pos.coords.latitude, lon: pos.coords.longitude };
+            reportLocation();
+        }, () => {});
+    }
+
+    open();
+
+    return { send };
+}
+
+// ================= CONDITIONAL GET =================
+// Remembers each URL's ETag / Last-Modified and resolves with the cached
+// body when the server answers 304 Not Modified.
+const validatorCache = {};
+
+function fetchJsonWithValidators(url) {
+    const cached = validatorCache[url];
+    const headers = {};
+
+    if (cached?.etag) headers["If-None-Match"] = cached.etag;
+    if (cached?.lastModified) headers["If-Modified-Since"] = cached.lastModified;
+
+    return fetch(url, { headers }).then(res => {
+        if (res.status === 304 && cached) return cached.data;
+
+        return res.json().then(data => {
+            validatorCache[url] = {
+                etag: res.headers.get("ETag"),
+                lastModified: res.headers.get("Last-Modified"),
+                data
+            };
+            return data;
+        });
+    });
+}